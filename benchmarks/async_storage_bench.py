@@ -0,0 +1,102 @@
+""" a benchmark of the concurrent request throughput of the read only getters
+
+each simulated request counts the bookings of a user with many bookings, once with the sync
+storage called on the event loop as the routes used to, once through ThreadedDBStorage and once
+through AsyncDBStorage on aiosqlite. A ticker measures how late the event loop wakes up meanwhile.
+
+    python -m benchmarks.async_storage_bench
+"""
+
+import asyncio
+import os
+
+from benchmarks.harness import create_schema, seed_principals, seed_bookings, summary
+
+from time import perf_counter
+
+BOOKINGS = int(os.getenv("BENCH_BOOKINGS", "100000"))
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "200"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "20"))
+
+async def loop_lag(stop: asyncio.Event, lags: list):
+    """ a function to record how late a 1ms sleep wakes up until stopped """
+
+    while not stop.is_set():
+        start = perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append((perf_counter() - start - 0.001) * 1000)
+
+async def run(name: str, make_storage, close_storage, user_id: str):
+    """ a function to send the simulated requests and print the throughput
+    Args:
+        name: the name of the storage being measured
+        make_storage: a callable getting the storage of one request
+        close_storage: an async callable releasing the storage of one request
+        user_id: the user whose bookings are counted
+    """
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def request():
+        async with semaphore:
+            storage = make_storage()
+            try:
+                response = storage.get_user_bookings_info(user_id)
+                if asyncio.iscoroutine(response):
+                    response = await response
+                assert response.payload["total"] == BOOKINGS
+            finally:
+                await close_storage(storage)
+
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(loop_lag(stop, lags))
+    start = perf_counter()
+    await asyncio.gather(*(request() for _ in range(REQUESTS)))
+    elapsed = perf_counter() - start
+    stop.set()
+    await ticker
+
+    print(f"{name:<28} {REQUESTS / elapsed:8.1f} req/s   loop lag {summary(lags or [0.0])}")
+
+async def main():
+    """ a function to seed the database and measure each storage """
+
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from database.storage_engine import DBStorage, LazyDBStorage
+    from database.async_storage_engine import AsyncDBStorage, ThreadedDBStorage
+
+    session_factory = create_schema()
+    with session_factory() as session:
+        principals = seed_principals(DBStorage(session))
+    seed_bookings(session_factory, principals["user"].id, principals["celeb"].id, BOOKINGS)
+    user_id = principals["user"].id
+
+    async_engine = create_async_engine(os.environ["ASYNC_DATABASE_URL"])
+    async_session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def close_sync(storage):
+        storage.close()
+
+    async def close_async(storage):
+        await storage.close()
+
+    print(f"{BOOKINGS} bookings, {REQUESTS} requests, {CONCURRENCY} at a time")
+    await run("sync DBStorage on the loop", lambda: LazyDBStorage(session_factory), close_sync, user_id)
+
+    threaded = {}
+
+    def make_threaded():
+        lazy = LazyDBStorage(session_factory)
+        storage = ThreadedDBStorage(lazy)
+        threaded[id(storage)] = lazy
+        return storage
+
+    async def close_threaded(storage):
+        threaded.pop(id(storage)).close()
+
+    await run("ThreadedDBStorage", make_threaded, close_threaded, user_id)
+    await run("AsyncDBStorage (aiosqlite)", lambda: AsyncDBStorage(async_session_factory), close_async, user_id)
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
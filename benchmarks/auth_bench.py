@@ -0,0 +1,58 @@
+""" a benchmark of the auth overhead on /user/bookings
+
+the claims dependency the route uses is compared with verifying the token and loading the
+user from the database on every request, with the principal cache cleared so each one queries
+
+    python -m benchmarks.auth_bench
+"""
+
+import asyncio
+import os
+
+from benchmarks.harness import create_schema, seed_principals, seed_bookings
+from benchmarks.session_middleware_bench import measure
+
+BOOKINGS = int(os.getenv("BENCH_BOOKINGS", "100"))
+
+def build_app(lookup: bool, user_id: str):
+    """ a function to build an app with the user router
+    Args:
+        lookup: whether the user is loaded from the database to authorize each request
+        user_id: the id of the user making the requests
+    """
+
+    from fastapi import FastAPI, Request
+    from middlewares.get_user_from_cookies import get_user_claims, get_user_from_access_token
+    from middlewares.session_middleware import DBSessionMiddleware
+    from routes.user_route import user
+    from utils.principal_cache import principal_cache
+
+    app = FastAPI()
+    app.include_router(user)
+    app.add_middleware(DBSessionMiddleware)
+
+    if lookup:
+        def get_user_with_lookup(request: Request):
+            principal_cache.invalidate(("user", user_id))
+            return get_user_from_access_token(request)
+
+        app.dependency_overrides[get_user_claims] = get_user_with_lookup
+    return app
+
+async def main():
+    """ a function to seed a user with bookings and compare both ways of authorizing """
+
+    from database.storage_engine import DBStorage
+    from utils.cookie_token import token_manager
+
+    session_factory = create_schema()
+    with session_factory() as session:
+        principals = seed_principals(DBStorage(session))
+    seed_bookings(session_factory, principals["user"].id, principals["celeb"].id, BOOKINGS)
+    cookies = {"access_token": token_manager.create_access_token(principals["user"], "user").payload["access_token"]}
+
+    for name, lookup in (("claims only", False), ("claims and user lookup", True)):
+        print(f"/user/bookings {name:<24} {await measure(build_app(lookup, principals['user'].id), '/user/bookings', cookies):8.1f} req/s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,52 @@
+""" a benchmark of making one booking as the celebrity's booking count grows from 10 to 100k
+
+create_booking inserts the row directly, it is compared with appending to Celeb.bookings
+which loads every booking of the celebrity first
+
+    python -m benchmarks.booking_bench
+"""
+
+import os
+
+from benchmarks.harness import create_schema, seed_principals, seed_bookings, timed, summary
+
+SIZES = [int(size) for size in os.getenv("BENCH_SIZES", "10,1000,10000,100000").split(",")]
+REPEAT = int(os.getenv("BENCH_REPEAT", "20"))
+
+def main():
+    """ a function to grow the bookings of one celebrity and time both ways of booking at each size """
+
+    from sqlalchemy import func, select
+    from database.storage_engine import DBStorage
+    from models.booking_model import Booking
+
+    session_factory = create_schema()
+    with session_factory() as session:
+        principals = seed_principals(DBStorage(session))
+    user_id, celeb_id = principals["user"].id, principals["celeb"].id
+
+    def append_booking():
+        from models.celebrity_model import Celeb
+
+        with session_factory() as session:
+            booking = Booking("MONDAY", user_id, "One-Time")
+            celeb = session.get(Celeb, celeb_id)
+            celeb.bookings.append(booking)
+            session.commit()
+
+    def create_booking():
+        storage = DBStorage(session_factory())
+        assert storage.create_booking(celeb_id, user_id, "MONDAY", "One-Time").status
+        storage.close()
+
+    print(f"{REPEAT} bookings at each size")
+    for size in SIZES:
+        with session_factory() as session:
+            existing = session.scalar(select(func.count()).select_from(Booking).where(Booking.celeb_id == celeb_id))
+        if size > existing:
+            seed_bookings(session_factory, user_id, celeb_id, size - existing)
+        print(f"{size:>7} bookings  create_booking {summary(timed(create_booking, REPEAT))}"
+              f"  Celeb.bookings.append {summary(timed(append_booking, REPEAT))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+""" a module to point the application at a throw away sqlite database before a benchmark imports it
+
+every benchmark is run from the repository root, e.g python -m benchmarks.async_storage_bench
+"""
+
+import os
+import statistics
+import tempfile
+
+from datetime import datetime
+from time import perf_counter
+
+BENCH_DIR = tempfile.mkdtemp(prefix="celeb_connect_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{BENCH_DIR}/bench.db")
+os.environ.setdefault("ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{BENCH_DIR}/bench.db")
+os.environ.setdefault("MEDIA_ROOT", f"{BENCH_DIR}/media")
+os.environ.setdefault("JWT_ACCESS_KEY", "bench-access-key-for-local-runs-only-00")
+os.environ.setdefault("JWT_REFRESH_KEY", "bench-refresh-key-for-local-runs-only-0")
+os.environ.setdefault("DB_POOL_WARM", "0")
+
+def create_schema():
+    """ a function to create every table on the benchmark database and get the sessionmaker """
+
+    from utils.create_all_tables import create_tables
+    from middlewares.session_middleware import SessionLocal
+
+    create_tables()
+    return SessionLocal
+
+def seed_principals(storage):
+    """ a function to save one admin, user, agent and celebrity
+    Args:
+        storage: the DBStorage to save with
+    """
+
+    from models.admin_model import Admin
+    from models.user import User
+    from models.agent_model import Agent
+    from models.celebrity_model import Celeb
+
+    admin = Admin()
+    admin.name, admin.email, admin.password = "admin", "admin@gmail.com", "password"
+    storage.save(admin)
+    user = User("first", "last", "user@gmail.com", datetime(2000, 1, 1), "password", "08000000000")
+    storage.save(user)
+    agent = Agent("agent", "agent@gmail.com", "password")
+    agent.admin_id = admin.id
+    storage.save(agent)
+    celeb = Celeb("celeb", "lagos", "singer")
+    celeb.agent_id = agent.id
+    storage.save(celeb)
+    return {"admin": admin, "user": user, "agent": agent, "celeb": celeb}
+
+def timed(function, repeat: int):
+    """ a function to get the latencies in milliseconds of repeated calls
+    Args:
+        function: the callable to time
+        repeat: the amount of calls
+    """
+
+    latencies = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        latencies.append((perf_counter() - start) * 1000)
+    return latencies
+
+def summary(latencies: list[float]):
+    """ a function to get the median and 99th percentile of some latencies in milliseconds
+    Args:
+        latencies: the latencies to summarise
+    """
+
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"p50={statistics.median(ordered):.2f}ms p99={p99:.2f}ms"
+
+def seed_bookings(session_factory, user_id: str, celeb_id: str, count: int, batch_size: int = 10000):
+    """ a function to bulk insert bookings without going through the orm objects
+    Args:
+        session_factory: the sessionmaker of the benchmark database
+        user_id: the user of the bookings
+        celeb_id: the celebrity of the bookings
+        count: the amount of bookings
+        batch_size: the rows sent in one insert
+    """
+
+    from datetime import timedelta
+    from sqlalchemy import insert
+    from models.booking_model import Booking, Status, Type
+    from models.avalilability_model import Weekday
+    from utils.id_string import uuid
+
+    start = datetime(2020, 1, 1)
+    with session_factory() as session:
+        for offset in range(0, count, batch_size):
+            session.execute(insert(Booking), [
+                {
+                    "id": uuid(),
+                    "created_at": start + timedelta(seconds=number),
+                    "user_id": user_id,
+                    "celeb_id": celeb_id,
+                    "day": Weekday.Mo,
+                    "type": Type.ONE_TIME,
+                    "status": Status.PENDING,
+                }
+                for number in range(offset, min(count, offset + batch_size))
+            ])
+        session.commit()
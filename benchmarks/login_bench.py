@@ -0,0 +1,110 @@
+""" a benchmark of the login throughput against the latency of the reads made at the same time
+
+argon2 on the process pool of the password service is compared with verifying on the
+event loop as the login route did before
+
+    python -m benchmarks.login_bench
+"""
+
+import asyncio
+import os
+
+from time import perf_counter
+
+# every login comes from the same address so the throttle is opened up for the run
+os.environ.setdefault("LOGIN_THROTTLE_IP_LIMIT", "1000000")
+os.environ.setdefault("LOGIN_THROTTLE_EMAIL_LIMIT", "1000000")
+os.environ.setdefault("LOGIN_THROTTLE_ACCOUNT_LIMIT", "1000000")
+
+from benchmarks.harness import create_schema, seed_principals, summary
+
+LOGINS = int(os.getenv("BENCH_LOGINS", "40"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "8"))
+
+class InlinePasswordService:
+    """ the password service verifying on the event loop, as before the process pool """
+
+    async def verify(self, hashed: str, password: str):
+        from services.password_service import verify_password
+        from utils.responses import function_response
+
+        matches, new_hash = verify_password(hashed, password)
+        return function_response(matches, new_hash)
+
+def build_app():
+    """ a function to build an app with the auth and user routers """
+
+    from fastapi import FastAPI
+    from middlewares.session_middleware import DBSessionMiddleware
+    from routes.auth_route import auth
+    from routes.user_route import user
+
+    app = FastAPI()
+    app.include_router(auth)
+    app.include_router(user)
+    app.add_middleware(DBSessionMiddleware)
+    return app
+
+async def measure(app, cookies: dict):
+    """ a function to get the logins per second and the latencies of the reads sent while they run
+    Args:
+        app: the asgi app
+        cookies: the access token of the user for the reads
+    """
+
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        done = asyncio.Event()
+
+        async def login():
+            async with semaphore:
+                response = await client.post("/auth/login", json={"email": "user@gmail.com", "password": "password"})
+                assert response.status_code == 200, response.text
+
+        async def reads():
+            latencies = []
+            while not done.is_set():
+                start = perf_counter()
+                response = await client.get("/user/bookings", cookies=cookies)
+                assert response.status_code == 200, response.text
+                latencies.append((perf_counter() - start) * 1000)
+                await asyncio.sleep(0.01)
+            return latencies
+
+        await login()
+        reader = asyncio.create_task(reads())
+        start = perf_counter()
+        await asyncio.gather(*(login() for _ in range(LOGINS)))
+        elapsed = perf_counter() - start
+        done.set()
+        return LOGINS / elapsed, await reader
+
+async def main():
+    """ a function to seed a user with a hashed password and compare both ways of verifying """
+
+    import routes.auth_route
+    from database.storage_engine import DBStorage
+    from services.password_service import password_service
+    from utils.check_password import ph
+    from utils.cookie_token import token_manager
+
+    session_factory = create_schema()
+    with session_factory() as session:
+        storage = DBStorage(session)
+        user = seed_principals(storage)["user"]
+        user.password = ph.hash("password")
+        storage.save(user)
+    cookies = {"access_token": token_manager.create_access_token(user, "user").payload["access_token"]}
+
+    print(f"{LOGINS} logins, {CONCURRENCY} at a time, reads of /user/bookings alongside")
+    for name, service in (("argon2 on the event loop", InlinePasswordService()), ("argon2 on the process pool", password_service)):
+        routes.auth_route.password_service = service
+        logins, latencies = await measure(build_app(), cookies)
+        print(f"{name:<28} {logins:7.1f} logins/s  reads {summary(latencies)}")
+    password_service.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
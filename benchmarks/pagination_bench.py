@@ -0,0 +1,56 @@
+""" a benchmark of page 1 and page 10,000 of a user's bookings over a seeded 1M row bookings table
+
+the offset pages are compared with the keyset cursor pointing at the same position
+
+    python -m benchmarks.pagination_bench
+"""
+
+import os
+
+from benchmarks.harness import create_schema, seed_principals, seed_bookings, timed, summary
+
+BOOKINGS = int(os.getenv("BENCH_BOOKINGS", "1000000"))
+LIMIT = int(os.getenv("BENCH_LIMIT", "100"))
+REPEAT = int(os.getenv("BENCH_REPEAT", "20"))
+
+def main():
+    """ a function to seed the bookings and time both kinds of pages """
+
+    from sqlalchemy import select
+    from database.storage_engine import DBStorage
+    from models.booking_model import Booking
+    from utils.pagination import encode_cursor, page_offset
+
+    session_factory = create_schema()
+    with session_factory() as session:
+        principals = seed_principals(DBStorage(session))
+    user_id = principals["user"].id
+    seed_bookings(session_factory, user_id, principals["celeb"].id, BOOKINGS)
+
+    last_page = BOOKINGS // LIMIT
+    with session_factory() as session:
+        # the last row of the page before the last one, the position a client cursor would hold
+        before = session.execute(
+            select(Booking.created_at, Booking.id).where(Booking.user_id == user_id)
+            .order_by(Booking.created_at, Booking.id).offset(page_offset(last_page, LIMIT) - 1).limit(1)
+        ).one()
+    cursor = encode_cursor(before.created_at, before.id)
+
+    storage = DBStorage(session_factory())
+    cases = {
+        "offset page 1": lambda: storage.get_booking(None, LIMIT, page_offset(1, LIMIT), user_id=user_id),
+        f"offset page {last_page}": lambda: storage.get_booking(None, LIMIT, page_offset(last_page, LIMIT), user_id=user_id),
+        "cursor page 1": lambda: storage.get_booking(None, LIMIT, 0, "", user_id=user_id),
+        f"cursor page {last_page}": lambda: storage.get_booking(None, LIMIT, 0, cursor, user_id=user_id),
+    }
+
+    expected = storage.get_booking(None, LIMIT, page_offset(last_page, LIMIT), user_id=user_id).payload
+    assert storage.get_booking(None, LIMIT, 0, cursor, user_id=user_id).payload == expected
+
+    print(f"{BOOKINGS} bookings, {LIMIT} per page, {REPEAT} runs each")
+    for name, case in cases.items():
+        print(f"{name:<22} {summary(timed(case, REPEAT))}")
+    storage.close()
+
+if __name__ == "__main__":
+    main()
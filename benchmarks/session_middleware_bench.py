@@ -0,0 +1,107 @@
+""" a microbenchmark of the requests per second on /status and /user/me
+
+the pure asgi DBSessionMiddleware is compared with the BaseHTTPMiddleware it replaced, which
+opened a session for every request, both driven in process through httpx's asgi transport
+
+    python -m benchmarks.session_middleware_bench
+"""
+
+import asyncio
+import os
+
+from benchmarks.harness import create_schema, seed_principals
+
+from time import perf_counter
+
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "2000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "20"))
+
+def build_app(middleware):
+    """ a function to build an app with the status route, the user router and a session middleware
+    Args:
+        middleware: the session middleware class
+    """
+
+    from fastapi import FastAPI
+    from routes.user_route import user
+
+    app = FastAPI()
+
+    @app.get("/status")
+    def status():
+        return {"Message": "API is working correctly"}
+
+    app.include_router(user)
+    app.add_middleware(middleware)
+    return app
+
+def base_http_middleware(session_factory):
+    """ a function to get the BaseHTTPMiddleware the application used before
+    Args:
+        session_factory: the sessionmaker the session is opened with
+    """
+
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from database.storage_engine import DBStorage
+    from database.async_storage_engine import ThreadedDBStorage
+
+    class EagerSessionMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            session = session_factory()
+            try:
+                request.state.storage = DBStorage(session)
+                request.state.async_storage = ThreadedDBStorage(request.state.storage)
+                return await call_next(request)
+            finally:
+                session.close()
+
+    return EagerSessionMiddleware
+
+async def measure(app, path: str, cookies: dict):
+    """ a function to get the requests per second of a path
+    Args:
+        app: the asgi app
+        path: the path to request
+        cookies: the cookies sent with every request
+    """
+
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies=cookies) as client:
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def request():
+            async with semaphore:
+                response = await client.get(path)
+                assert response.status_code == 200, response.text
+
+        await request()
+        start = perf_counter()
+        await asyncio.gather(*(request() for _ in range(REQUESTS)))
+        return REQUESTS / (perf_counter() - start)
+
+async def main():
+    """ a function to seed a user and compare both middlewares on both paths """
+
+    from database.storage_engine import DBStorage
+    from middlewares.session_middleware import DBSessionMiddleware
+    from utils.cookie_token import token_manager
+
+    session_factory = create_schema()
+    with session_factory() as session:
+        user = seed_principals(DBStorage(session))["user"]
+    cookies = {"access_token": token_manager.create_access_token(user, "user").payload["access_token"]}
+
+    apps = {
+        "BaseHTTPMiddleware": build_app(base_http_middleware(session_factory)),
+        "pure asgi DBSessionMiddleware": build_app(DBSessionMiddleware),
+    }
+
+    print(f"{REQUESTS} requests, {CONCURRENCY} at a time")
+    for path in ("/status", "/user/me"):
+        for name, app in apps.items():
+            print(f"{path:<10} {name:<30} {await measure(app, path, cookies):8.1f} req/s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+""" a benchmark of the import time of main and the time to the first request
+
+python -X importtime is run on main and its slowest direct imports are listed with the
+services already created by the import, then uvicorn is started on main:app and /status is
+polled until the first answer, lifespan included
+
+    python -m benchmarks.startup_bench
+"""
+
+import os
+import socket
+import subprocess
+import sys
+
+from time import perf_counter, sleep
+
+from benchmarks.harness import create_schema
+
+RUNS = int(os.getenv("BENCH_RUNS", "3"))
+TOP = int(os.getenv("BENCH_TOP", "10"))
+
+def import_times():
+    """ a function to get the cumulative import time in milliseconds of every module imported by main """
+
+    script = "import main; from services.registry import services; print(services.initialized())"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], capture_output=True, text=True, check=True)
+    times = {"services created": result.stdout.strip()}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # main and the modules it imports itself, the deeper ones are counted in them
+        depth = len(name) - len(name.lstrip())
+        if depth <= 3:
+            times[name.strip()] = int(cumulative) / 1000
+    return times
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def first_request():
+    """ a function to get the milliseconds from starting uvicorn to the first answer of /status """
+
+    import httpx
+
+    port = free_port()
+    start = perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+    )
+    try:
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/status").status_code == 200:
+                    return (perf_counter() - start) * 1000
+            except httpx.TransportError:
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited before answering")
+                sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    """ a function to print the import times and the time to the first request """
+
+    create_schema()
+
+    times = import_times()
+    print(f"import main {times.pop('main'):.1f}ms, services created by the import: {times.pop('services created')}")
+    print("slowest imports of main:")
+    for name, cumulative in sorted(times.items(), key=lambda item: -item[1])[:TOP]:
+        print(f"  {cumulative:8.1f}ms  {name}")
+
+    latencies = sorted(first_request() for _ in range(RUNS))
+    print(f"uvicorn start to the first /status answer over {RUNS} runs: best {latencies[0]:.0f}ms, median {latencies[len(latencies) // 2]:.0f}ms")
+
+if __name__ == "__main__":
+    main()
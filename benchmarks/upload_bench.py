@@ -0,0 +1,115 @@
+""" a benchmark of concurrent profile image uploads against the latency of the reads made at the same time
+
+the streamed uploads of the file manager are compared with copying the whole request body
+to disk on the event loop as the routes did before, the resized copies are left out
+
+    python -m benchmarks.upload_bench
+"""
+
+import asyncio
+import contextlib
+import os
+import shutil
+
+from time import perf_counter
+
+from benchmarks.harness import create_schema, seed_principals, summary
+
+UPLOADS = int(os.getenv("BENCH_UPLOADS", "40"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "8"))
+UPLOAD_BYTES = int(os.getenv("BENCH_UPLOAD_BYTES", str(4 * 1024 * 1024)))
+
+def blocking_save_image():
+    """ a function to get a save_image which copies the upload on the event loop, like the routes before """
+
+    from services.file_management import file_manager
+    from utils.id_string import uuid
+    from utils.responses import function_response
+
+    async def save_image(file, storage):
+        location = f"{uuid()}.png"
+        with open(f"{file_manager.admin_path}/{location}", "wb") as profile_file:
+            shutil.copyfileobj(file.file, profile_file)
+        return function_response(True, {"location": location})
+
+    return save_image
+
+def build_app():
+    """ a function to build an app with the admin router and the status route """
+
+    from fastapi import FastAPI
+    from middlewares.session_middleware import DBSessionMiddleware
+    from routes.admin_route import admin
+
+    app = FastAPI()
+
+    @app.get("/status")
+    def status():
+        return {"Message": "API is working correctly"}
+
+    app.include_router(admin)
+    app.add_middleware(DBSessionMiddleware)
+    return app
+
+async def measure(app, agent_id: str, cookies: dict):
+    """ a function to get the uploads per second and the latencies of the reads sent while they run
+    Args:
+        app: the asgi app
+        agent_id: the agent whose picture is uploaded
+        cookies: the access token of the admin
+    """
+
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies=cookies) as client:
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        done = asyncio.Event()
+
+        async def upload():
+            body = b"\x89PNG\r\n\x1a\n" + os.urandom(UPLOAD_BYTES)
+            async with semaphore:
+                response = await client.put(f"/admin/agent/{agent_id}/profile/picture", files={"file": ("image.png", body)})
+                assert response.status_code == 200, response.text
+
+        async def reads():
+            latencies = []
+            while not done.is_set():
+                start = perf_counter()
+                assert (await client.get("/status")).status_code == 200
+                latencies.append((perf_counter() - start) * 1000)
+                await asyncio.sleep(0.01)
+            return latencies
+
+        reader = asyncio.create_task(reads())
+        start = perf_counter()
+        await asyncio.gather(*(upload() for _ in range(UPLOADS)))
+        elapsed = perf_counter() - start
+        done.set()
+        return UPLOADS / elapsed, await reader
+
+async def main():
+    """ a function to seed an agent and compare both ways of saving the uploads """
+
+    from database.storage_engine import DBStorage
+    from services.file_management import file_manager
+    from services.image_pipeline import image_pipeline
+    from utils.cookie_token import token_manager
+
+    session_factory = create_schema()
+    with session_factory() as session:
+        principals = seed_principals(DBStorage(session))
+    cookies = {"access_token": token_manager.create_access_token(principals["admin"], "admin").payload["access_token"]}
+    image_pipeline.submit = lambda *args: None
+
+    streamed = file_manager.save_image
+    print(f"{UPLOADS} uploads of {UPLOAD_BYTES // 1024}KB, {CONCURRENCY} at a time, reads of /status alongside")
+    for name, save_image in (("copied on the event loop", blocking_save_image()), ("streamed in chunks", streamed)):
+        file_manager.save_image = save_image
+        # the file manager prints every replaced picture it removes
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            uploads, latencies = await measure(build_app(), principals["agent"].id, cookies)
+        print(f"{name:<26} {uploads:6.1f} uploads/s  reads {summary(latencies)}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+""" a module to provide a non blocking connection to the database for the async routes """
+
+import asyncio
+
+from database.storage_engine import DBStorage
+
+def storage_method(name: str):
+    """ a function to get a public DBStorage method by name
+    Args:
+        name: the name of the DBStorage method
+    """
+
+    method = getattr(DBStorage, name, None)
+    if method is None or not callable(method) or name.startswith("_"):
+        raise AttributeError(name)
+    return method
+
+class AsyncDBStorage:
+    """ The async storage class which exposes every DBStorage method as an awaitable
+
+    Each call is run with AsyncSession.run_sync so the queries are sent through the
+    async driver and the event loop is never blocked while waiting on the database.
+    The session is only opened on the first call, like LazyDBStorage, and one DBStorage
+    is kept for the request so the reads stick to the primary after a write
+    """
+
+    def __init__(self, session_factory, replicas=None):
+        """ the class initializer
+        Args:
+            session_factory: the async_sessionmaker which creates the session when it is needed
+            replicas: the ReplicaRouter on the async replica engines passed on to DBStorage
+        """
+
+        self.__session_factory = session_factory
+        self.__replicas = replicas
+        self.__session = None
+        self.__storage = None
+
+    def __getattr__(self, name: str):
+        """ a method to get the awaitable version of a DBStorage method
+        Args:
+            name: the name of the DBStorage method
+        """
+
+        method = storage_method(name)
+
+        async def run(*args, **kwargs):
+            if self.__session is None:
+                self.__session = self.__session_factory()
+                self.__storage = DBStorage(self.__session.sync_session, self.__replicas)
+            return await self.__session.run_sync(lambda session: method(self.__storage, *args, **kwargs))
+
+        return run
+
+    async def close(self):
+        """ a method to release the async session and the replica session back to their pools if they were opened """
+
+        if self.__session is not None:
+            session, self.__session = self.__session, None
+            storage, self.__storage = self.__storage, None
+            await session.run_sync(lambda session: storage.close())
+
+class ThreadedDBStorage:
+    """ The awaitable storage used when DB_ASYNC is off
+
+    The calls are forwarded to the sync storage of the request on a worker thread so
+    the blocking driver waits there instead of on the event loop
+    """
+
+    def __init__(self, storage):
+        """ the class initializer
+        Args:
+            storage: the LazyDBStorage of the request
+        """
+
+        self.__storage = storage
+
+    def __getattr__(self, name: str):
+        """ a method to get the awaitable version of a DBStorage method
+        Args:
+            name: the name of the DBStorage method
+        """
+
+        storage_method(name)
+
+        async def run(*args, **kwargs):
+            return await asyncio.to_thread(getattr(self.__storage, name), *args, **kwargs)
+
+        return run
+
+    async def close(self):
+        """ a method kept for symmetry with AsyncDBStorage, the sync storage is closed by the middleware """
@@ -0,0 +1,150 @@
+""" a module to collect live metrics and liveness checks for the database connection pool """
+
+import threading
+
+from time import monotonic, perf_counter
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+# the upper bounds in seconds of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+class PoolStats:
+    """ a class which records how the connection pool is being used """
+
+    def __init__(self, buckets: tuple = WAIT_BUCKETS):
+        """ the class initializer
+        Args:
+            buckets: the upper bounds of the checkout wait histogram
+        """
+
+        self.__lock = threading.Lock()
+        self.__buckets = buckets
+        self.__counts = [0] * (len(buckets) + 1)
+        self.__wait_total = 0.0
+        self.__checkouts = 0
+        self.__pings = 0
+        self.__stale = 0
+
+    def observe_wait(self, seconds: float):
+        """ a method to record how long a checkout waited for a connection
+        Args:
+            seconds: the time spent waiting on the pool
+        """
+
+        index = len(self.__buckets)
+        for position, bound in enumerate(self.__buckets):
+            if seconds <= bound:
+                index = position
+                break
+
+        with self.__lock:
+            self.__counts[index] += 1
+            self.__wait_total += seconds
+            self.__checkouts += 1
+
+    def observe_ping(self, alive: bool):
+        """ a method to record the result of a liveness ping
+        Args:
+            alive: if the connection answered the ping
+        """
+
+        with self.__lock:
+            self.__pings += 1
+            if not alive:
+                self.__stale += 1
+
+    def snapshot(self, pool: QueuePool):
+        """ a method to get the current state of the pool along with the recorded metrics
+        Args:
+            pool: the pool to read the connection counts from
+        """
+
+        with self.__lock:
+            histogram = {f"le_{bound}": count for bound, count in zip(self.__buckets, self.__counts)}
+            histogram["le_inf"] = self.__counts[-1]
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow_in_use": max(pool.overflow(), 0),
+                "checkouts": self.__checkouts,
+                "checkout_wait_seconds_total": round(self.__wait_total, 6),
+                "checkout_wait_histogram": histogram,
+                "pings": self.__pings,
+                "stale_connections": self.__stale,
+            }
+
+pool_stats = PoolStats()
+
+class InstrumentedQueuePool(QueuePool):
+    """ a queue pool which records how long each checkout waits for a connection """
+
+    # the metrics the waits are recorded in, the primary pool unless set by instrumented_pool
+    stats = pool_stats
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.stats.observe_wait(perf_counter() - start)
+
+def instrumented_pool(stats: PoolStats):
+    """ a function to get a pool class recording its waits in its own metrics, used for the read replicas
+    Args:
+        stats: the metrics of the pool
+    """
+
+    return type("ReplicaInstrumentedQueuePool", (InstrumentedQueuePool,), {"stats": stats})
+
+def ping_when_idle(engine: Engine, idle_seconds: float, stats: PoolStats = pool_stats):
+    """ a function to ping a connection on checkout only when it has been idle for a while
+    this replaces pool_pre_ping which costs a round trip on every checkout
+    Args:
+        engine: the engine whose pool is checked
+        idle_seconds: how long a connection can sit in the pool before it is pinged
+        stats: the metrics the pings are recorded in
+    """
+
+    @event.listens_for(engine, "checkin")
+    def mark_last_used(dbapi_connection, connection_record):
+        connection_record.info["last_used"] = monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def ping_idle_connection(dbapi_connection, connection_record, connection_proxy):
+        last_used = connection_record.info.get("last_used")
+        if last_used is None or monotonic() - last_used < idle_seconds:
+            return
+
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            stats.observe_ping(True)
+        except Exception:
+            stats.observe_ping(False)
+            # the pool discards this connection and retries the checkout with a new one
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+def warm_pool(engine: Engine, count: int):
+    """ a function to open connections at startup so the first requests do not pay for them
+    Args:
+        engine: the engine to warm
+        count: the amount of connections to open
+    """
+
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(engine.connect())
+    except Exception as e:
+        print(f"The database pool could only be warmed with {len(connections)} connections: {e}")
+    finally:
+        for connection in connections:
+            connection.close()
@@ -0,0 +1,84 @@
+""" a module to route the read only queries to the database read replicas """
+
+import threading
+
+from itertools import count
+from time import monotonic
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+def replica_lag(connection):
+    """ a function to get how many seconds a replica is behind the primary
+    Args:
+        connection: an open connection to the replica
+    Return None when the replication is not running
+    """
+
+    if connection.dialect.name != "mysql":
+        return 0.0
+
+    row = connection.exec_driver_sql("SHOW REPLICA STATUS").mappings().first()
+    if row is None:
+        return 0.0
+    lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+    return None if lag is None else float(lag)
+
+class ReplicaRouter:
+    """ a class which hands out sessions on the read replicas which are not lagging """
+
+    def __init__(self, engines: list[Engine], max_lag: float = 5, check_interval: float = 5, lag_probe=replica_lag):
+        """ the class initializer
+        Args:
+            engines: the engines of the read replicas
+            max_lag: the seconds a replica can be behind the primary before it is skipped
+            check_interval: the seconds a lag measurement is trusted for
+            lag_probe: the function which measures the lag on a replica connection
+        """
+
+        self.__engines = engines
+        self.__sessions = [
+            sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+            for engine in engines
+        ]
+        self.__max_lag = max_lag
+        self.__check_interval = check_interval
+        self.__lag_probe = lag_probe
+        self.__checked = {}
+        self.__lock = threading.Lock()
+        self.__turn = count()
+
+    def __healthy(self, index: int):
+        """ a method to check the lag of a replica, measuring it again when the last check is old
+        Args:
+            index: the position of the replica
+        """
+
+        now = monotonic()
+        with self.__lock:
+            checked = self.__checked.get(index)
+        if checked and now - checked[0] < self.__check_interval:
+            return checked[1]
+
+        try:
+            with self.__engines[index].connect() as connection:
+                lag = self.__lag_probe(connection)
+            healthy = lag is not None and lag <= self.__max_lag
+        except Exception:
+            healthy = False
+
+        with self.__lock:
+            self.__checked[index] = (now, healthy)
+        return healthy
+
+    def session(self):
+        """ a method to open a session on the next healthy replica
+        Return None when every replica is lagging so the caller reads from the primary
+        """
+
+        start = next(self.__turn)
+        for step in range(len(self.__sessions)):
+            index = (start + step) % len(self.__sessions)
+            if self.__healthy(index):
+                return self.__sessions[index]()
+        return None
+
@@ -1,29 +1,129 @@
 """ a module to provide connection to MySql database for user storage and queries """
 
+from datetime import datetime
 from os import getenv
-from sqlalchemy import create_engine, select, delete, func
-from sqlalchemy.orm import Session
-from argon2.exceptions import VerifyMismatchError
+from sqlalchemy import create_engine, select, delete, insert, update, func, case, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 from fastapi import Depends
 
 from utils.responses import function_response
-from utils.check_password import ph
+from utils.pagination import decode_cursor
+from utils.fields import SENSITIVE_FIELDS
+from utils.principal_cache import principal_cache
 
 class DBStorage:
     """ The storage class with a connection to mysql for storage """
 
-    def __init__(self, session: Session):
-        """ a method to create the database connection string """
+    def __init__(self, session: Session, replicas=None):
+        """ a method to create the database connection string
+        Args:
+            session: the session on the primary database
+            replicas: the ReplicaRouter used for the read only getters if any
+        """
 
         self.__session = session
+        self.__replicas = replicas
+        self.__replica_session = None
+        self.__wrote = False
+
+    def __reader(self):
+        """ a method to get the session for a read only query
+        a replica is used until the storage writes, then every read sticks to the primary
+        """
+
+        if self.__wrote or not self.__replicas:
+            return self.__session
+        if self.__replica_session is None:
+            self.__replica_session = self.__replicas.session()
+        return self.__replica_session or self.__session
+
+    def __page(self, statement, model, limit: int, offset: int, cursor: str | None = None):
+        """ a method to order a listing query on (created_at, id) and limit it to one page
+        Args:
+            statement: the select statement to paginate
+            model: the model class being listed
+            limit: the amount of data on the page
+            offset: the amount of data to skip when no cursor is given
+            cursor: the opaque cursor of the previous page for keyset pagination
+        """
+
+        statement = statement.order_by(model.created_at, model.id).limit(limit)
+        if cursor is None:
+            return statement.offset(offset)
+
+        position = decode_cursor(cursor)
+        if position:
+            created_at, row_id = position
+            # the >= bound lets the (created_at, id) part of the index seek to the position, the or only breaks ties
+            statement = statement.where(
+                model.created_at >= created_at,
+                or_(model.created_at > created_at, model.id > row_id)
+            )
+        return statement
+
+    def __list(self, model, criteria: list, limit: int, offset: int, cursor: str | None = None, fields: list | None = None):
+        """ a method to get one page of a listing as dictionaries
+        when fields are given only those columns are selected and the rows skip the identity map
+        Args:
+            model: the model class being listed
+            criteria: the where clauses of the listing
+            limit: the amount of data on the page
+            offset: the amount of data to skip when no cursor is given
+            cursor: the opaque cursor of the previous page
+            fields: the column names requested by the client
+        """
+
+        if not fields:
+            statement = self.__page(select(model).where(*criteria), model, limit, offset, cursor)
+            return [item.to_dict() for item in self.__reader().scalars(statement).all()]
+
+        # id and created_at are always selected so the cursor of the page can be built
+        names = ["id", "created_at"] + [name for name in fields if name not in ("id", "created_at")]
+        columns = [
+            model.__table__.c[name] for name in names
+            if name in model.__table__.c and name not in SENSITIVE_FIELDS
+        ]
+
+        statement = self.__page(select(*columns).where(*criteria), model, limit, offset, cursor)
+        my_list = []
+        for row in self.__reader().execute(statement).mappings():
+            item = dict(row)
+            item["created_at"] = str(item["created_at"])
+            if item.get("date_of_birth"):
+                item["date_of_birth"] = str(item["date_of_birth"])
+            if item.get("quote_at"):
+                item["quote_at"] = str(item["quote_at"])
+            my_list.append(item)
+        return my_list
+
+    def __principal_keys(self, obj):
+        """ a method to get the cache keys of the principals changed by this write
+        Args:
+            obj: the object being saved or deleted
+        """
+
+        from models.user import User
+        from models.agent_model import Agent
+        from models.admin_model import Admin
+
+        roles = {User: "user", Agent: "agent", Admin: "admin"}
+        changed = {obj} | set(self.__session.dirty) | set(self.__session.deleted)
+        return [(roles[type(item)], item.id) for item in changed if type(item) in roles]
 
     def save(self, obj):
         """ a method to save the objects to the database """
+        self.__wrote = True
+        principal_keys = self.__principal_keys(obj)
         self.__session.add(obj)
         self.__session.commit()
+        for key in principal_keys:
+            principal_cache.invalidate(key)
 
-    def get_user_from_email(self, email: str, password: str | None=None):
+    def get_user_from_email(self, email: str):
         """a method to get the user using the provided email address
+        the password is checked by the caller with the password service
         Args:
             email(str): the email address of the user
 
@@ -31,11 +131,6 @@ class DBStorage:
         from models.user import User
         user = self.__session.scalars(select(User).where(User.email == email)).one_or_none()
         if user:
-            if password:
-                try:
-                    ph.verify(user.password, password)
-                except VerifyMismatchError:
-                    return function_response(False)
             return function_response(True, user)
         return function_response(False)
     
@@ -51,18 +146,61 @@ class DBStorage:
 
     def get_refresh_token(self, token: str):
         """ 
-        a method to save the token provided while associating it with the user id
+        a method to get the live refresh token object matching the token sent by the user
         Args:
-            token (str): the token to be saved
+            token (str): the refresh token from the cookies
         """
 
-        from models.refresh_token_model import RefreshToken
+        from models.refresh_token_model import RefreshToken, hash_token
 
+        if not token:
+            return function_response(False)
 
-        token_object = self.__session.scalars(select(RefreshToken).where(RefreshToken.id == token)).one_or_none()
+        token_object = self.__session.scalars(
+            select(RefreshToken)
+            .where(RefreshToken.token_hash == hash_token(token), RefreshToken.expires_at > datetime.now())
+        ).one_or_none()
         if token_object:
             return function_response(True, token_object)
         return function_response(False)
+
+    def trim_refresh_tokens(self, user_id: str, keep: int):
+        """ a method to delete the oldest refresh tokens of a user past the allowed amount of sessions
+        Args:
+            user_id: the id of the user
+            keep: the amount of the most recent refresh tokens to keep
+        """
+
+        from models.refresh_token_model import RefreshToken
+
+        stale_ids = self.__session.scalars(
+            select(RefreshToken.id)
+            .where(RefreshToken.user_id == user_id)
+            .order_by(RefreshToken.created_at.desc(), RefreshToken.id.desc())
+            .offset(keep)
+        ).all()
+        if stale_ids:
+            self.__wrote = True
+            self.__session.execute(delete(RefreshToken).where(RefreshToken.id.in_(stale_ids)))
+            self.__session.commit()
+        return len(stale_ids)
+
+    def delete_expired(self, model, batch_size: int):
+        """ a method to delete one batch of expired rows so the table is never locked for long
+        Args:
+            model: a model with an expires_at column
+            batch_size: the most rows deleted in this transaction
+        Return the amount of rows deleted
+        """
+
+        expired_ids = self.__session.scalars(
+            select(model.id).where(model.expires_at <= datetime.now()).limit(batch_size)
+        ).all()
+        if expired_ids:
+            self.__wrote = True
+            self.__session.execute(delete(model).where(model.id.in_(expired_ids)))
+        self.__session.commit()
+        return len(expired_ids)
     
     def get_otp_object(self, email_address):
         """ a method to get an otp object so that it can be updated and resaved to the database
@@ -82,26 +220,70 @@ class DBStorage:
     def delete(self, object):
         """ a method to delete otp codes from the application"""
 
+        self.__wrote = True
         self.__session.delete(object)
+        principal_keys = self.__principal_keys(object)
         self.__session.commit()
+        for key in principal_keys:
+            principal_cache.invalidate(key)
 
-    def get_otp_email(self, code: str):
-        """ a method to query the database based on the code provided
+    def get_principal(self, role: str, principal_id: str):
+        """ a method to get the user, agent or admin identified by an access token
+        the row is served from the principal cache when possible so no query is sent
         Args:
-            code (str): the code to be queried for
-        Return the otp object found with the provided code
+            role: either user, agent or admin
+            principal_id: the id of the principal
         """
 
-        from models.otp_codes_model import OtpCode
+        from models.user import User
+        from models.agent_model import Agent
+        from models.admin_model import Admin
 
+        model = {"user": User, "agent": Agent, "admin": Admin}.get(role)
+        if not model or not principal_id:
+            return function_response(False)
 
-        otp_object = self.__session.scalars(select(OtpCode).where(OtpCode.code == code)).one_or_none()
-        if otp_object:
-            return function_response(True, otp_object)
-        return function_response(False)
+        values = principal_cache.get((role, principal_id))
+        if values:
+            principal = model.__mapper__.class_manager.new_instance()
+            for key, value in values.items():
+                set_committed_value(principal, key, value)
+            make_transient_to_detached(principal)
+            # load=False attaches the cached row to this session without querying the database
+            principal = self.__session.merge(principal, load=False)
+            return function_response(True, principal)
+
+        principal = self.__session.get(model, principal_id)
+        if not principal:
+            return function_response(False)
+
+        principal_cache.set((role, principal_id), {
+            column.key: getattr(principal, column.key) for column in model.__mapper__.column_attrs
+        })
+        return function_response(True, principal)
+
+    def add_otp_attempt(self, otp_id: str, max_attempts: int):
+        """ a method to count one more check of an otp code while it is under the allowed attempts
+        Args:
+            otp_id: the id of the otp object
+            max_attempts: the most checks allowed on one code
+        Return True in the payload when the attempt was counted and the code can be checked
+        """
+
+        from models.otp_codes_model import OtpCode
+
+        self.__wrote = True
+        result = self.__session.execute(
+            update(OtpCode)
+            .where(OtpCode.id == otp_id, OtpCode.attempts < max_attempts)
+            .values(attempts=OtpCode.attempts + 1)
+        )
+        self.__session.commit()
+        return function_response(True, bool(result.rowcount))
     
-    def get_admin_from_email(self, email, password):
+    def get_admin_from_email(self, email):
         """ a method to get the admin from the database using the email address
+        the password is checked by the caller with the password service
         Args:
             email: the email of the admin in the database
         """
@@ -109,13 +291,7 @@ class DBStorage:
         from models.admin_model import Admin
 
         admin = self.__session.scalars(select(Admin).where(Admin.email == email)).one_or_none()
-        if not admin:
-            return function_response(False)
-        try:
-            ph.verify(admin.password, password)
-            return function_response(True, admin)
-        except VerifyMismatchError:
-            return function_response(False)
+        return function_response(True, admin) if admin else function_response(False)
     
     
     def get_admin_from_id(self, admin_id):
@@ -142,28 +318,18 @@ class DBStorage:
 
         return function_response(True, admin) if admin else function_response(False)
     
-    def get_agent_from_email(self, email: str, password: str | None = None):
-        """ a method to get the agent from the database and verify the password
+    def get_agent_from_email(self, email: str):
+        """ a method to get the agent from the database using the email address
+        the password is checked by the caller with the password service
         Args:
             email (str): the agent email address
-            password (str): the agent password
         """
 
         from models.agent_model import Agent
 
         agent = self.__session.scalars(select(Agent).where(Agent.email == email)).one_or_none()
 
-        if not agent:
-            return function_response(False)
-        
-        if not password:
-            return function_response(True)
-        
-        try:
-            ph.verify(agent.password, password)
-            return function_response(True, agent)
-        except VerifyMismatchError:
-            return function_response(False)
+        return function_response(True, agent) if agent else function_response(False)
         
     def get_agent_from_id(self, agent_id):
         """ a method to get the agent from the agent id provided
@@ -176,30 +342,30 @@ class DBStorage:
         agent = self.__session.scalars(select(Agent).where(Agent.id == agent_id)).one_or_none()
         return function_response(True, agent) if agent else function_response(False)
         
-    def get_agents(self, offset: int, limit: int):
+    def get_agents(self, offset: int, limit: int, cursor: str | None = None, fields: list | None = None):
         """ a method to get the agent from the agent id provided
         Args:
             agent_id: the id of the agent or none when i want to get all the agents for the admin or users
+            cursor: the cursor of the previous page, the offset is ignored when it is given
+            fields: the only columns to return for each agent
         """
 
         from models.agent_model import Agent
 
-        agents = self.__session.scalars(select(Agent).offset(offset).limit(limit)).all()
-        my_list = []
-        if len(agents) > 0:
-            for agent in agents:
-                my_list.append(agent.to_dict())
-            return function_response(True, my_list)
-        return function_response(False)
+        my_list = self.__list(Agent, [], limit, offset, cursor, fields)
+        return function_response(True, my_list) if len(my_list) > 0 else function_response(False)
 
     def get_agent_id_from_refresh(self, token):
         """ a method to get the agent refresh token
         Args:
             token (str): the token to be queried for
         """
-        from models.refresh_token_model import AgentRefresh
+        from models.refresh_token_model import AgentRefresh, hash_token
 
-        agent_id = self.__session.scalars(select(AgentRefresh.agent_id).where(AgentRefresh.id == token)).one_or_none()
+        agent_id = self.__session.scalars(
+            select(AgentRefresh.agent_id)
+            .where(AgentRefresh.token_hash == hash_token(token), AgentRefresh.expires_at > datetime.now())
+        ).one_or_none()
         return function_response(True, {"agent_id": agent_id}) if agent_id else function_response(False)
     
     def delete_agent_refresh_token(self, agent_id):
@@ -210,6 +376,7 @@ class DBStorage:
 
         from models.refresh_token_model import AgentRefresh
 
+        self.__wrote = True
         self.__session.execute(delete(AgentRefresh).where(AgentRefresh.agent_id == agent_id))
         self.__session.commit()
 
@@ -218,7 +385,9 @@ class DBStorage:
             agent_id: str,
             limit: int,
             offset: int,
-            celeb_id: str | None = None
+            celeb_id: str | None = None,
+            cursor: str | None = None,
+            fields: list | None = None
     ):
         """ a method to get the celebrities on a given agent
         Args:
@@ -226,21 +395,19 @@ class DBStorage:
             limit: the dataset limit
             offset: the amount of data to skip
             celeb_id: the id of the celebrity to get if founc
+            cursor: the cursor of the previous page, the offset is ignored when it is given
+            fields: the only columns to return for each celebrity in the list
         """
 
         from models.celebrity_model import Celeb
 
         if celeb_id:
-            celeb = self.__session.scalars(select(Celeb).where(Celeb.agent_id == agent_id).where(Celeb.id == celeb_id)).one_or_none()
+            celeb = self.__reader().scalars(select(Celeb).where(Celeb.agent_id == agent_id).where(Celeb.id == celeb_id)).one_or_none()
 
             return function_response(True, celeb.to_dict()) if celeb else function_response(False)
         
-        celeb_list = []
-        celebs = self.__session.scalars(select(Celeb).where(Celeb.agent_id == agent_id).offset(offset).limit(limit)).all()
-        if len(celebs) > 0:
-            for celeb in celebs:
-                celeb_list.append(celeb.to_dict())
-        else:
+        celeb_list = self.__list(Celeb, [Celeb.agent_id == agent_id], limit, offset, cursor, fields)
+        if len(celeb_list) == 0:
             return function_response(False)
         
         return function_response(True, celeb_list)
@@ -259,43 +426,46 @@ class DBStorage:
         celeb = self.__session.scalars(select(Celeb).where(Celeb.id == celeb_id)).one_or_none()
         return function_response(True, celeb) if celeb else function_response(False)
     
-    def get_celebrities_for_admin(self, limit: int, offset: int):
+    def get_celebrities_for_admin(self, limit: int, offset: int, cursor: str | None = None, fields: list | None = None):
         """ a method to get all the celebrities for the admin
         Args:
             limit: the limit of data to be gotten
             offset: the amount of data to be skipped
+            cursor: the cursor of the previous page, the offset is ignored when it is given
+            fields: the only columns to return for each celebrity
         """
 
         from models.celebrity_model import Celeb
 
-        celebs = self.__session.scalars(select(Celeb).limit(limit).offset(offset)).all()
-        my_list = [celeb.to_dict() for celeb in celebs]
+        my_list = self.__list(Celeb, [], limit, offset, cursor, fields)
 
         return function_response(True, my_list) if len(my_list) > 0 else function_response(False)
     
-    def get_users_for_admin(self, limit, offset):
+    def get_users_for_admin(self, limit, offset, cursor: str | None = None, fields: list | None = None):
         """ a method to get the users of the app for the admin dashboard
         Args:
             limit: the limit of the request
             offset: the amount of data to jump over in the database
+            cursor: the cursor of the previous page, the offset is ignored when it is given
+            fields: the only columns to return for each user
         """
         
         from models.user import User
 
-        users = self.__session.scalars(select(User).limit(limit).offset(offset)).all()
-
-        my_list = [user.to_dict() for user in users]
+        my_list = self.__list(User, [], limit, offset, cursor, fields)
         return function_response(True, my_list) if len(my_list) > 0 else function_response(False)
     
-    def get_celeb_availability(self, celeb_id):
+    def get_celeb_availability(self, celeb_id, readonly: bool = False):
         """a method to get the availabliity of a celebrity
         Args:
             celeb_id: the id of the celebrity
+            readonly: if the availability is only read so it can come from a replica
         """
 
         from models.avalilability_model import Availability
 
-        availability = self.__session.scalars(select(Availability).where(Availability.celeb_id == celeb_id)).one_or_none()
+        session = self.__reader() if readonly else self.__session
+        availability = session.scalars(select(Availability).where(Availability.celeb_id == celeb_id)).one_or_none()
 
         return function_response(True, availability) if availability else function_response(False)
     
@@ -305,18 +475,55 @@ class DBStorage:
             user_id: the user id of the user
         """
 
-        from models.booking_model import Booking, Status
-
-        booking_count = self.__session.execute(select(func.count()).select_from(Booking).where(Booking.user_id == user_id)).scalar()
-        successful_booking = self.__session.execute(select(func.count()).select_from(Booking).where(Booking.user_id == user_id).where(Booking.status == Status.APPROVED)).scalar()
-        pending_booking = self.__session.execute(select(func.count()).select_from(Booking).where(Booking.user_id == user_id).where(Booking.status == Status.PENDING)).scalar()
-
-        return function_response(True, {"total": booking_count, "success": successful_booking, "pending": pending_booking})
+        from models.booking_model import Booking, Status, UserBookingStats, BOOKING_STATS_COUNTERS
+
+        if BOOKING_STATS_COUNTERS:
+            stats = self.__reader().get(UserBookingStats, user_id)
+            if not stats:
+                return function_response(True, {"total": 0, "success": 0, "pending": 0})
+            return function_response(True, {"total": stats.total, "success": stats.approved, "pending": stats.pending})
+
+        counts = dict(self.__reader().execute(
+            select(Booking.status, func.count()).where(Booking.user_id == user_id).group_by(Booking.status)
+        ).all())
+
+        return function_response(True, {
+            "total": sum(counts.values()),
+            "success": counts.get(Status.APPROVED, 0),
+            "pending": counts.get(Status.PENDING, 0)
+        })
+
+    def rebuild_booking_stats(self):
+        """ a method to rebuild the user_booking_stats counters from the bookings table """
+
+        from models.booking_model import Booking, Status, UserBookingStats
+
+        def status_count(status: Status):
+            return func.sum(case((Booking.status == status, 1), else_=0))
+
+        counts = select(
+            Booking.user_id,
+            func.count(),
+            status_count(Status.APPROVED),
+            status_count(Status.PENDING),
+            status_count(Status.CANCELLED),
+            status_count(Status.PAID),
+        ).where(Booking.user_id.is_not(None)).group_by(Booking.user_id)
+
+        # the delete and the insert share one transaction so readers never see empty counters
+        self.__wrote = True
+        self.__session.execute(delete(UserBookingStats))
+        self.__session.execute(insert(UserBookingStats).from_select(
+            ["user_id", "total", "approved", "pending", "cancelled", "paid"], counts
+        ))
+        self.__session.commit()
     
-    def get_booking(self, booking_id:str = None, limit=10, offset=10, **kwargs):
+    def get_booking(self, booking_id:str = None, limit=10, offset=10, cursor: str | None = None, fields: list | None = None, **kwargs):
         """a method to get the booking from the database for either agent or user
         Args:
             booking_id: the booking id to get if none is provided all bookings made by the user or the agent is provided
+            cursor: the cursor of the previous page, the offset is ignored when it is given
+            fields: the only columns to return for each booking in the list
             kwargs: the user id or agent id should be present in kwargs
         """
 
@@ -326,17 +533,201 @@ class DBStorage:
             if booking_id:
                 booking = self.__session.scalars(select(Booking).where(Booking.id == booking_id).where(Booking.user_id == kwargs["user_id"])).one_or_none()
                 return function_response(True, booking) if booking else function_response(False)
-            bookings = self.__session.scalars(select(Booking).where(Booking.user_id == kwargs["user_id"]).limit(limit).offset(offset)).all()
+            booking_list = self.__list(Booking, [Booking.user_id == kwargs["user_id"]], limit, offset, cursor, fields)
         elif "celeb_id" in kwargs.keys():
             if booking_id:
                 booking = self.__session.scalars(select(Booking).where(Booking.id == booking_id).where(Booking.celeb_id == kwargs["celeb_id"])).one_or_none()
                 return function_response(True, booking) if booking else function_response(False)
-            bookings = self.__session.scalars(select(Booking).where(Booking.celeb_id == kwargs["celeb_id"]).limit(limit).offset(offset)).all()
+            booking_list = self.__list(Booking, [Booking.celeb_id == kwargs["celeb_id"]], limit, offset, cursor, fields)
         else:
             return function_response(False)
-        booking_list = [booking.to_dict() for booking in bookings]
         return function_response(True, booking_list) if len(booking_list) > 0 else function_response(False)
     
+    def create_booking(self, celeb_id: str, user_id: str, day, type, price: dict | None = None, celeb=None):
+        """ a method to add a booking for a celebrity without loading the celebrity bookings
+        Args:
+            celeb_id: the id of the celebrity being booked
+            user_id: the id of the user making the booking
+            day: the weekday of the booking
+            type: the type of the booking
+            price: the usd and btc prices with the time of the btc quote, stored with the booking
+            celeb: the celebrity already loaded by the caller, its id is then not looked up again
+        """
+
+        from models.celebrity_model import Celeb
+        from models.booking_model import Booking
+
+        if celeb is not None:
+            celeb_id = celeb.id
+        elif not celeb_id or not self.__session.scalar(select(Celeb.id).where(Celeb.id == celeb_id)):
+            return function_response(False)
+
+        booking = Booking(day, user_id, type)
+        booking.celeb_id = celeb_id
+        if price:
+            booking.price_usd = price.get("usd")
+            booking.price_btc = price.get("btc")
+            booking.quote_at = price.get("quoted_at")
+        self.save(booking)
+        return function_response(True, booking)
+
+    def backfill_booking_prices(self, prices: dict, btc_usd: float, quote_at, batch_size: int = 1000):
+        """ a method to price the bookings made before the prices were stored, one batch per transaction
+        Args:
+            prices: the usd price of each booking type
+            btc_usd: the bitcoin price in usd used for every booking
+            quote_at: the time of the bitcoin quote
+            batch_size: the most bookings updated in one transaction
+        Return the amount of bookings priced
+        """
+
+        from models.booking_model import Booking
+
+        priced = 0
+        while True:
+            rows = self.__session.execute(
+                select(Booking.id, Booking.type)
+                .where(Booking.price_btc.is_(None), Booking.type.in_([type for type in prices]))
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            ids_by_type = {}
+            for booking_id, booking_type in rows:
+                ids_by_type.setdefault(booking_type, []).append(booking_id)
+
+            self.__wrote = True
+            for booking_type, ids in ids_by_type.items():
+                usd = prices[booking_type]
+                self.__session.execute(
+                    update(Booking)
+                    .where(Booking.id.in_(ids))
+                    .values(price_usd=usd, price_btc=round(usd / btc_usd, 8), quote_at=quote_at)
+                )
+            self.__session.commit()
+            priced += len(rows)
+        return priced
+
+    def add_media_reference(self, key: str, size: int):
+        """ a method to count one more profile pointing at a stored image
+        Args:
+            key: the sha256 name of the image
+            size: the size of the image in bytes
+        Return True in the payload when the image was already stored
+        """
+
+        from models.media_model import MediaFile
+
+        self.__wrote = True
+        result = self.__session.execute(
+            update(MediaFile).where(MediaFile.key == key).values(refcount=MediaFile.refcount + 1)
+        )
+        if result.rowcount:
+            self.__session.commit()
+            return function_response(True, True)
+
+        try:
+            self.__session.add(MediaFile(key, size))
+            self.__session.commit()
+            return function_response(True, False)
+        except IntegrityError:
+            # another upload of the same image created the row first
+            self.__session.rollback()
+            self.__session.execute(
+                update(MediaFile).where(MediaFile.key == key).values(refcount=MediaFile.refcount + 1)
+            )
+            self.__session.commit()
+            return function_response(True, True)
+
+    def release_media_reference(self, key: str, remove=None):
+        """ a method to count one less profile pointing at a stored image
+        the row stays locked until the file is removed, so an upload of the same image waits
+        for the delete and stores the file again instead of counting on the one being removed
+        Args:
+            key: the sha256 name of the image
+            remove: the function removing the file, called when that was the last reference
+        Return True in the payload when that was the last reference
+        """
+
+        from models.media_model import MediaFile
+
+        self.__wrote = True
+        self.__session.execute(
+            update(MediaFile).where(MediaFile.key == key, MediaFile.refcount > 0).values(refcount=MediaFile.refcount - 1)
+        )
+        last = self.__session.scalar(select(MediaFile.id).where(MediaFile.key == key, MediaFile.refcount <= 0))
+        if last and remove is not None:
+            try:
+                remove()
+            except OSError as e:
+                # a file left behind takes space, a row without its file would break the profiles
+                print(f"The image {key} could not be removed: {e}")
+        result = self.__session.execute(delete(MediaFile).where(MediaFile.key == key, MediaFile.refcount <= 0))
+        self.__session.commit()
+        return function_response(True, bool(result.rowcount))
+
+    def set_profile_variants(self, model, object_id: str, key: str, variants: dict, remove=None):
+        """ a method to record the resized copies of a profile image
+        nothing is changed when the profile moved on to another image while the copies were made,
+        and the copies are removed when the last reference to the image was dropped meanwhile
+        Args:
+            model: the Celeb or Agent class
+            object_id: the id of the celebrity or agent
+            key: the sha256 name of the image the copies were made from
+            variants: the file name of each copy by variant
+            remove: the function removing the copies, called when the image is no longer stored
+        """
+
+        from models.agent_model import Agent
+        from models.media_model import MediaFile
+
+        self.__wrote = True
+        # the update changes nothing but locks the row, so a delete of the image either
+        # finished before and is seen here, or waits and removes the copies with the image
+        stored = self.__session.execute(
+            update(MediaFile).where(MediaFile.key == key).values(refcount=MediaFile.refcount)
+        )
+        if not stored.rowcount:
+            if remove is not None:
+                try:
+                    remove()
+                except OSError as e:
+                    print(f"The copies of the image {key} could not be removed: {e}")
+            self.__session.commit()
+            return function_response(False)
+
+        result = self.__session.execute(
+            update(model).where(model.id == object_id, model.profile_url == key).values(profile_variants=variants)
+        )
+        self.__session.commit()
+        if model is Agent:
+            principal_cache.invalidate(("agent", object_id))
+        return function_response(bool(result.rowcount))
+
+    def get_profiles_without_variants(self, model, after_id: str | None, limit: int):
+        """ a method to get the stored profile images of celebrities or agents without their copies
+        the images of the flat folders saved before the store are left out since they have no row
+        Args:
+            model: the Celeb or Agent class
+            after_id: the last id of the previous page, None for the first one
+            limit: the most profiles returned
+        Return the id and image key of each profile ordered by id
+        """
+
+        from models.media_model import MediaFile
+
+        query = (
+            select(model.id, model.profile_url)
+            .join(MediaFile, MediaFile.key == model.profile_url)
+            .where(model.profile_variants.is_(None))
+            .order_by(model.id)
+            .limit(limit)
+        )
+        if after_id is not None:
+            query = query.where(model.id > after_id)
+        return self.__session.execute(query).all()
+
     def get_booking_by_id(self, booking_id):
         """ a method to get the booking for an admin to approve
         Args:
@@ -349,10 +740,12 @@ class DBStorage:
 
         return function_response(True, booking) if booking else function_response(False)
     
-    def get_celeb_bookings(self, celeb_id: str, limit: int, offset: int):
+    def get_celeb_bookings(self, celeb_id: str, limit: int, offset: int, cursor: str | None = None, fields: list | None = None):
         """ a method to get the bookings of a celeb
         Args:
             celeb_id: the celebrity id
+            cursor: the cursor of the previous page, the offset is ignored when it is given
+            fields: the only columns to return for each booking
         """
 
         from models.booking_model import Booking
@@ -360,12 +753,34 @@ class DBStorage:
         if not celeb_id:
             return function_response(False)
         
-        bookings = self.__session.scalars(select(Booking).where(Booking.celeb_id == celeb_id).limit(limit).offset(offset))
-
-        my_list = [booking.to_dict() for booking in bookings]
+        my_list = self.__list(Booking, [Booking.celeb_id == celeb_id], limit, offset, cursor, fields)
 
         return function_response(True, my_list) if len(my_list) > 0 else function_response(False)
     
+    def revoke_token(self, expires_at, jti: str | None = None, subject_id: str | None = None):
+        """ a method to revoke an access token or every access token of a subject
+        Args:
+            expires_at: the time after which the revoked tokens have expired anyway
+            jti: the id of the access token to revoke
+            subject_id: the id of the principal whose current tokens are revoked
+        """
+
+        from models.revoked_token_model import RevokedToken
+
+        self.save(RevokedToken(expires_at, jti, subject_id))
+
+    def get_revocations(self, now):
+        """ a method to get the revocations which can still match an unexpired access token
+        Args:
+            now: the current time, the rows expired before it are not needed
+        """
+
+        from models.revoked_token_model import RevokedToken
+
+        return self.__session.execute(
+            select(RevokedToken.jti, RevokedToken.subject_id, RevokedToken.created_at).where(RevokedToken.expires_at > now)
+        ).all()
+
     def rollback(self):
         """
         Docstring for rollback
@@ -379,3 +794,34 @@ class DBStorage:
         self.__session.flush()
 
         self.__session.close()
+        if self.__replica_session is not None:
+            self.__replica_session.close()
+
+
+class LazyDBStorage:
+    """ a storage handle which only opens a session when a DBStorage method is called """
+
+    def __init__(self, session_factory, replicas=None):
+        """ the class initializer
+        Args:
+            session_factory: the callable which creates a new session when it is needed
+            replicas: the ReplicaRouter passed on to DBStorage
+        """
+
+        self.__session_factory = session_factory
+        self.__replicas = replicas
+        self.__storage = None
+
+    def __getattr__(self, name: str):
+        """ a method to open the session on first use and forward the call to DBStorage """
+
+        if self.__storage is None:
+            self.__storage = DBStorage(self.__session_factory(), self.__replicas)
+        return getattr(self.__storage, name)
+
+    def close(self):
+        """ a method to release the session if one was opened """
+
+        if self.__storage is not None:
+            storage, self.__storage = self.__storage, None
+            storage.close()
@@ -3,6 +3,9 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio
+
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -12,10 +15,38 @@ from routes.auth_route import auth
 from routes.user_route import user
 from routes.admin_route import admin
 from routes.agent_route import agent
-from middlewares.session_middleware import DBSessionMiddleware
+from routes.media_route import media
+from middlewares.session_middleware import DBSessionMiddleware, SessionLocal, engine, replica_pools, DB_POOL_WARM
+from database.pool_metrics import pool_stats, warm_pool
+from utils.principal_cache import principal_cache
 from utils.create_all_tables import create_tables
-
-app = FastAPI()
+from services.password_service import password_service
+from services.mail_queue import mail_queue
+from services.registry import services
+from services.http_client import http_client
+from services.image_pipeline import image_pipeline
+from services.token_sweeper import run_token_sweeper, TOKEN_SWEEP_INTERVAL, TOKEN_SWEEP_BATCH_SIZE
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """ a function to prepare the application resources before the first request """
+
+    await asyncio.to_thread(warm_pool, engine, DB_POOL_WARM)
+    await asyncio.to_thread(services.startup, ["token_manager", "file_manager", "email_sender"])
+    sweeper = asyncio.create_task(run_token_sweeper(SessionLocal, TOKEN_SWEEP_INTERVAL, TOKEN_SWEEP_BATCH_SIZE))
+    mail_queue.start()
+    http_client.start()
+    image_pipeline.start(SessionLocal)
+    yield
+    await mail_queue.stop()
+    await http_client.close()
+    await image_pipeline.stop()
+    sweeper.cancel()
+    with suppress(asyncio.CancelledError):
+        await sweeper
+    password_service.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -41,11 +72,51 @@ def status():
 
     return {"Message": "API is working correctly"}
 
+@app.get("/status/pool")
+def pool_status():
+    """ a function to display the live usage of the database connection pool and of the read replica pools """
+
+    return {
+        **pool_stats.snapshot(engine.pool),
+        "replicas": [stats.snapshot(replica.pool) for replica, stats in replica_pools],
+    }
+
+@app.get("/status/mail")
+def mail_queue_status():
+    """ a function to display the depth of the outbound mail queue """
+
+    return mail_queue.stats()
+
+@app.get("/status/http")
+def http_client_status():
+    """ a function to display the latency and circuit state of the outbound apis """
+
+    return http_client.stats()
+
+@app.get("/status/images")
+def image_pipeline_status():
+    """ a function to display the images waiting for their resized copies """
+
+    return image_pipeline.stats()
+
+@app.get("/status/services")
+def services_status():
+    """ a function to display the services created so far """
+
+    return {"initialized": services.initialized()}
+
+@app.get("/status/principals")
+def principal_cache_status():
+    """ a function to display the hit rate of the authenticated principal cache """
+
+    return principal_cache.stats()
+
 
 app.include_router(auth)
 app.include_router(user)
 app.include_router(admin)
 app.include_router(agent)
+app.include_router(media)
 
 app.add_middleware(DBSessionMiddleware)
 
@@ -13,3 +13,12 @@ def get_admin_from_access_token(request: Request):
 
     access_token = request.cookies.get("access_token")
     return token_manager.verify_admin_access_token(access_token, request.state.storage)
+
+def get_admin_claims(request: Request):
+    """ a function to authorize an admin from the access token claims without loading the admin
+    Args:
+        request: the request from the frontend
+    """
+
+    access_token = request.cookies.get("access_token")
+    return token_manager.verify_claims(access_token, "admin", request.state.storage)
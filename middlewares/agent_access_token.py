@@ -11,4 +11,11 @@ def verify_agent_access_token(request: Request):
 
     get_agent_response = token_manager.verify_agent_access_token(access_token, request.state.storage)
 
-    return get_agent_response
\ No newline at end of file
+    return get_agent_response
+
+def verify_agent_claims(request: Request):
+    """ a function to authorize an agent from the access token claims without loading the agent """
+
+    access_token = request.cookies.get("access_token")
+
+    return token_manager.verify_claims(access_token, "agent", request.state.storage)
\ No newline at end of file
@@ -11,4 +11,11 @@ def get_user_from_access_token(request: Request):
 
     verify_token_response = token_manager.verify_access_token(access_token, request.state.storage)
 
-    return verify_token_response
\ No newline at end of file
+    return verify_token_response
+
+def get_user_claims(request: Request):
+    """ a method to authorize a user from the access token claims without loading the user """
+
+    access_token = request.cookies.get("access_token")
+
+    return token_manager.verify_claims(access_token, "user", request.state.storage)
\ No newline at end of file
@@ -1,21 +1,49 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request
+from starlette.types import ASGIApp, Receive, Scope, Send, Message
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from os import getenv
-from database.storage_engine import DBStorage
+from database.storage_engine import LazyDBStorage
+from database.async_storage_engine import AsyncDBStorage, ThreadedDBStorage
+from database.pool_metrics import InstrumentedQueuePool, PoolStats, instrumented_pool, ping_when_idle
+from database.replicas import ReplicaRouter
 
-DATABASE_URL = (
+DATABASE_URL = getenv("DATABASE_URL") or (
     f"mysql+mysqldb://{getenv('DB_USER')}:{getenv('DB_PASSWORD')}"
     f"@{getenv('DB_HOST')}:{getenv('DB_PORT')}/{getenv('DB_NAME')}"
 )
 
+# the read only getters await the async driver when set, otherwise they run the sync driver on a thread
+DB_ASYNC = getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
+ASYNC_DATABASE_URL = getenv("ASYNC_DATABASE_URL") or (
+    f"mysql+{getenv('DB_ASYNC_DRIVER', 'aiomysql')}://{getenv('DB_USER')}:{getenv('DB_PASSWORD')}"
+    f"@{getenv('DB_HOST')}:{getenv('DB_PORT')}/{getenv('DB_NAME')}"
+)
+
+DB_POOL_SIZE = int(getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_WARM = min(int(getenv("DB_POOL_WARM", str(DB_POOL_SIZE))), DB_POOL_SIZE)
+# always pings on every checkout, idle only pings connections unused for DB_POOL_PING_IDLE seconds
+DB_POOL_PRE_PING = getenv("DB_POOL_PRE_PING", "idle").lower()
+DB_POOL_PING_IDLE = float(getenv("DB_POOL_PING_IDLE", "30"))
+
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,   # IMPORTANT for MySQL
-    pool_recycle=1800
+    poolclass=InstrumentedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=DB_POOL_PRE_PING == "always",   # IMPORTANT for MySQL
+    pool_recycle=DB_POOL_RECYCLE
 )
 
+if DB_POOL_PRE_PING == "idle":
+    ping_when_idle(engine, DB_POOL_PING_IDLE)
+
 SessionLocal = sessionmaker(
     bind=engine,
     autocommit=False,
@@ -23,15 +51,111 @@ SessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
-class DBSessionMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # create db session
-        session = SessionLocal()
+# comma separated urls of the read replicas used by the read only getters
+DB_REPLICA_URLS = [url.strip() for url in getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+
+def create_replica_engine(url: str):
+    """ a function to create the engine of a read replica with the pool metrics and pings of the primary
+    Args:
+        url: the url of the replica
+    Return the engine and the metrics of its pool
+    """
+
+    stats = PoolStats()
+    replica = create_engine(
+        url,
+        poolclass=instrumented_pool(stats),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING == "always",
+        pool_recycle=DB_POOL_RECYCLE
+    )
+    if DB_POOL_PRE_PING == "idle":
+        ping_when_idle(replica, DB_POOL_PING_IDLE, stats)
+    return replica, stats
+
+# the engine and pool metrics of each replica, shown by /status/pool
+replica_pools = [create_replica_engine(url) for url in DB_REPLICA_URLS]
+
+replica_router = ReplicaRouter(
+    [replica for replica, _ in replica_pools],
+    max_lag=float(getenv("DB_REPLICA_MAX_LAG", "5")),
+    check_interval=float(getenv("DB_REPLICA_CHECK_INTERVAL", "5")),
+) if DB_REPLICA_URLS else None
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_recycle=1800
+) if DB_ASYNC else None
+
+# the async routes read from the same replicas through the async driver, the router is given the
+# sync face of each async engine since DBStorage runs inside AsyncSession.run_sync
+ASYNC_DB_REPLICA_URLS = [
+    url.strip() for url in getenv("ASYNC_DB_REPLICA_URLS", "").split(",") if url.strip()
+] or [
+    make_url(url).set(drivername=f"mysql+{getenv('DB_ASYNC_DRIVER', 'aiomysql')}").render_as_string(hide_password=False)
+    for url in DB_REPLICA_URLS
+]
+
+async_replica_router = ReplicaRouter(
+    [create_async_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+        pool_recycle=DB_POOL_RECYCLE
+    ).sync_engine for url in ASYNC_DB_REPLICA_URLS],
+    max_lag=float(getenv("DB_REPLICA_MAX_LAG", "5")),
+    check_interval=float(getenv("DB_REPLICA_CHECK_INTERVAL", "5")),
+) if DB_ASYNC and ASYNC_DB_REPLICA_URLS else None
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+) if DB_ASYNC else None
+
+class DBSessionMiddleware:
+    """ a pure asgi middleware which attaches a lazily opened storage to every request
+
+    A session is only checked out of the pool when a storage method is called and it is
+    released as soon as the response starts so the pool is not held while the body streams
+    """
+
+    def __init__(self, app: ASGIApp):
+        """ the class initializer
+        Args:
+            app: the next asgi application in the stack
+        """
+
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        storage = LazyDBStorage(SessionLocal, replica_router)
+        async_storage = AsyncDBStorage(AsyncSessionLocal, async_replica_router) if DB_ASYNC else ThreadedDBStorage(storage)
+
+        # attach to request state
+        state = scope.setdefault("state", {})
+        state["storage"] = storage
+        state["async_storage"] = async_storage
+
+        async def release():
+            storage.close()
+            await async_storage.close()
+
+        async def send_and_release(message: Message):
+            if message["type"] == "http.response.start":
+                await release()
+            await send(message)
 
         try:
-            # attach to request state
-            request.state.storage = DBStorage(session)
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send_and_release)
         finally:
-            session.close()
\ No newline at end of file
+            await release()
@@ -0,0 +1,15 @@
+-- the indexes of the keyset listings and the hot lookup columns used by DBStorage
+-- the foreign key columns already had an index made by mysql, the named ones below replace them in the plans
+
+CREATE INDEX ix_users_created_at_id ON users (created_at, id);
+CREATE INDEX ix_agents_created_at_id ON agents (created_at, id);
+CREATE INDEX ix_celebs_created_at_id ON celebs (created_at, id);
+CREATE INDEX ix_celebs_agent_id_created_at_id ON celebs (agent_id, created_at, id);
+CREATE INDEX ix_bookings_user_id_created_at_id ON bookings (user_id, created_at, id);
+CREATE INDEX ix_bookings_celeb_id_created_at_id ON bookings (celeb_id, created_at, id);
+CREATE INDEX ix_bookings_user_id_status ON bookings (user_id, status);
+CREATE INDEX ix_admin_email ON `admin` (email);
+CREATE INDEX ix_admin_refresh_token ON `admin` (refresh_token);
+CREATE INDEX ix_availability_celeb_id ON availability (celeb_id);
+CREATE INDEX ix_refresh_tokens_user_id_created_at_id ON refresh_tokens (user_id, created_at, id);
+CREATE INDEX ix_agent_refresh_agent_id ON agent_refresh (agent_id);
@@ -0,0 +1,13 @@
+-- the maintained booking counters of every user, filled by python -m utils.rebuild_booking_stats
+-- IF NOT EXISTS because create_all made the new tables on startup before the migrations existed
+
+CREATE TABLE IF NOT EXISTS user_booking_stats (
+	user_id VARCHAR(60) NOT NULL,
+	total INTEGER NOT NULL,
+	approved INTEGER NOT NULL,
+	pending INTEGER NOT NULL,
+	cancelled INTEGER NOT NULL,
+	paid INTEGER NOT NULL,
+	PRIMARY KEY (user_id),
+	FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+);
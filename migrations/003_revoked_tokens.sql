@@ -0,0 +1,14 @@
+-- the revoked access tokens and subjects
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+	jti VARCHAR(60),
+	subject_id VARCHAR(60),
+	expires_at DATETIME NOT NULL,
+	id VARCHAR(60) NOT NULL,
+	created_at DATETIME NOT NULL,
+	PRIMARY KEY (id),
+	UNIQUE (id),
+	INDEX ix_revoked_tokens_jti (jti),
+	INDEX ix_revoked_tokens_subject_id (subject_id),
+	INDEX ix_revoked_tokens_expires_at (expires_at)
+);
@@ -0,0 +1,16 @@
+-- the refresh tokens are saved as a sha256 digest with an expiry
+-- the existing rows have no digest to fill so they are removed, this logs out every user and agent
+-- once when it is applied and each of them has to log in again
+
+DELETE FROM refresh_tokens;
+DELETE FROM agent_refresh;
+ALTER TABLE refresh_tokens
+	ADD COLUMN token_hash VARCHAR(64) NOT NULL,
+	ADD COLUMN expires_at DATETIME NOT NULL,
+	ADD UNIQUE (token_hash),
+	ADD INDEX ix_refresh_tokens_expires_at (expires_at);
+ALTER TABLE agent_refresh
+	ADD COLUMN token_hash VARCHAR(64) NOT NULL,
+	ADD COLUMN expires_at DATETIME NOT NULL,
+	ADD UNIQUE (token_hash),
+	ADD INDEX ix_agent_refresh_expires_at (expires_at);
@@ -0,0 +1,9 @@
+-- the otp codes are looked up by email and code and expire
+-- the codes sent before it have no expiry so they are removed and can be requested again
+
+DELETE FROM otp_codes;
+ALTER TABLE otp_codes
+	ADD COLUMN sent_at DATETIME NOT NULL,
+	ADD COLUMN expires_at DATETIME NOT NULL,
+	ADD INDEX ix_otp_codes_email_code (email, code),
+	ADD INDEX ix_otp_codes_expires_at (expires_at);
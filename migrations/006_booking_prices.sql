@@ -0,0 +1,6 @@
+-- the price of a booking when it was made, the older bookings are filled by python -m utils.backfill_booking_prices
+
+ALTER TABLE bookings
+	ADD COLUMN price_usd INTEGER,
+	ADD COLUMN price_btc FLOAT,
+	ADD COLUMN quote_at DATETIME;
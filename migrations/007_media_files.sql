@@ -0,0 +1,15 @@
+-- the profile images are stored by content hash with a reference count
+-- the keys are longer than the old file names and one file can now be shared so profile_url is not unique
+
+CREATE TABLE IF NOT EXISTS media_files (
+	`key` VARCHAR(128) NOT NULL,
+	size INTEGER NOT NULL,
+	refcount INTEGER NOT NULL,
+	id VARCHAR(60) NOT NULL,
+	created_at DATETIME NOT NULL,
+	PRIMARY KEY (id),
+	UNIQUE (`key`),
+	UNIQUE (id)
+);
+ALTER TABLE agents DROP INDEX profile_url, MODIFY profile_url VARCHAR(128);
+ALTER TABLE celebs MODIFY profile_url VARCHAR(128);
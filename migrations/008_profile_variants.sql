@@ -0,0 +1,4 @@
+-- the resized and webp copies of the profile images
+
+ALTER TABLE agents ADD COLUMN profile_variants JSON;
+ALTER TABLE celebs ADD COLUMN profile_variants JSON;
@@ -0,0 +1,9 @@
+-- the resend limit counts the send times of a rolling window and each code has a cap on the checks made against it
+-- the codes sent before it have no send times so they are removed and can be requested again
+
+DELETE FROM otp_codes;
+ALTER TABLE otp_codes
+	DROP INDEX ix_otp_codes_email_code,
+	DROP COLUMN count,
+	ADD COLUMN sends JSON NOT NULL,
+	ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,4 @@
+-- the profiles saved with a json null instead of sql NULL, so the variants backfill finds them
+
+UPDATE agents SET profile_variants = NULL WHERE JSON_TYPE(profile_variants) = 'NULL';
+UPDATE celebs SET profile_variants = NULL WHERE JSON_TYPE(profile_variants) = 'NULL';
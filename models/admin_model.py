@@ -22,8 +22,8 @@ class Admin(Basemodel, Base):
     __tablename__ = "admin"
 
     name: Mapped[str] = mapped_column(String(60), nullable=False)
-    email: Mapped[str] = mapped_column(String(60), nullable=False)
+    email: Mapped[str] = mapped_column(String(60), nullable=False, index=True)
     password: Mapped[str] = mapped_column(String(1024), nullable=False)
-    refresh_token: Mapped[str] = mapped_column(String(60), nullable=True)
+    refresh_token: Mapped[str] = mapped_column(String(60), nullable=True, index=True)
 
     agents: Mapped[List["Agent"]] = relationship(back_populates="admin", cascade="all, delete")
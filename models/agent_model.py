@@ -2,7 +2,7 @@
 
 import enum
 
-from sqlalchemy import String, Enum, ForeignKey, Boolean
+from sqlalchemy import String, Enum, ForeignKey, Boolean, Index, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from pydantic import BaseModel, EmailStr
 from typing import List
@@ -38,6 +38,9 @@ class Agent(Basemodel, Base):
     """ the agent class """
 
     __tablename__ = "agents"
+    __table_args__ = (
+        Index("ix_agents_created_at_id", "created_at", "id"),
+    )
 
     name: Mapped[str] = mapped_column(String(256), nullable=False)
     email: Mapped[str] = mapped_column(String(60), nullable=False, unique=True)
@@ -47,7 +50,10 @@ class Agent(Basemodel, Base):
     password: Mapped[str] = mapped_column(String(2048), nullable=False)
     number_verified: Mapped[bool] = mapped_column(Boolean, default=False)
     email_verified: Mapped[bool] = mapped_column(Boolean, default=False)
-    profile_url: Mapped[str] = mapped_column(String(60), nullable=True, unique=True, default=None)
+    # agents uploading the same image share it so the key is not unique
+    profile_url: Mapped[str] = mapped_column(String(128), nullable=True, default=None)
+    # the file names of the resized and webp copies of the profile image by variant, sql NULL until they are made
+    profile_variants: Mapped[dict] = mapped_column(JSON(none_as_null=True), nullable=True, default=None)
 
     admin: Mapped["Admin"] = relationship(back_populates="agents")
     refresh_token: Mapped["AgentRefresh"] = relationship(back_populates="agent", cascade="all, delete")
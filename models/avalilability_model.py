@@ -42,7 +42,7 @@ class Availability(Basemodel, Base):
 
     __tablename__ = "availability"
 
-    celeb_id: Mapped[str] = mapped_column(String(60), ForeignKey("celebs.id"))
+    celeb_id: Mapped[str] = mapped_column(String(60), ForeignKey("celebs.id"), index=True)
     monday: Mapped[bool] = mapped_column(Boolean, default=True)
     tuesday: Mapped[bool] = mapped_column(Boolean, default=True)
     wednesday: Mapped[bool] = mapped_column(Boolean, default=True)
@@ -37,6 +37,8 @@ class Basemodel:
             my_dict["created_at"] = str(my_dict["created_at"])
         if my_dict.get("date_of_birth"):
             my_dict["date_of_birth"] = str(my_dict["date_of_birth"])
+        if my_dict.get("quote_at"):
+            my_dict["quote_at"] = str(my_dict["quote_at"])
         if my_dict.get("refresh_token"):
             del my_dict["refresh_token"]
         if my_dict.get("agent"):
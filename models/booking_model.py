@@ -2,8 +2,10 @@
 
 import enum
 
-from sqlalchemy import String, ForeignKey, Enum
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import datetime
+from os import getenv
+from sqlalchemy import String, ForeignKey, Enum, Index, Integer, Float, event, inspect, update
+from sqlalchemy.orm import Mapped, mapped_column, relationship, Session
 from pydantic import BaseModel
 
 from .base_model import Base, Basemodel
@@ -31,12 +33,21 @@ class Booking(Basemodel, Base):
     """ the bookings class """
 
     __tablename__ = "bookings"
+    __table_args__ = (
+        Index("ix_bookings_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_bookings_celeb_id_created_at_id", "celeb_id", "created_at", "id"),
+        Index("ix_bookings_user_id_status", "user_id", "status"),
+    )
 
     celeb_id: Mapped[str] = mapped_column(String(60), ForeignKey("celebs.id"))
     user_id: Mapped[str] = mapped_column(String(60), ForeignKey("users.id"))
     day: Mapped[Weekday] = mapped_column(Enum(Weekday), nullable=False)
     status: Mapped[Status] = mapped_column(Enum(Status), default=Status.PENDING)
     type: Mapped[Type] = mapped_column(Enum(Type), nullable=False)
+    # the prices at booking time, empty on bookings made before they were stored until the backfill runs
+    price_usd: Mapped[int] = mapped_column(Integer, nullable=True)
+    price_btc: Mapped[float] = mapped_column(Float, nullable=True)
+    quote_at: Mapped[datetime] = mapped_column(nullable=True)
 
     celeb: Mapped["Celeb"] = relationship(back_populates="bookings")
     user: Mapped["User"] = relationship(back_populates="bookings")
@@ -48,4 +59,101 @@ class Booking(Basemodel, Base):
         self.user_id = user_id
         self.type = type
 
-        super().__init__()
\ No newline at end of file
+        super().__init__()
+
+
+# keep the user_booking_stats counters in step with every booking write when enabled
+BOOKING_STATS_COUNTERS = getenv("BOOKING_STATS_COUNTERS", "false").lower() in ("1", "true", "yes")
+
+STATUS_COUNTERS = {
+    Status.APPROVED: "approved",
+    Status.PENDING: "pending",
+    Status.CANCELLED: "cancelled",
+    Status.PAID: "paid",
+}
+
+class UserBookingStats(Base):
+    """ the per user booking counters so the booking count is a primary key read """
+
+    __tablename__ = "user_booking_stats"
+
+    user_id: Mapped[str] = mapped_column(String(60), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    approved: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    pending: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    cancelled: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    paid: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+def upsert_booking_stats(connection, user_id: str, changes: dict):
+    """ a function to insert the counters of a user or add to them when the row already exists
+    Args:
+        connection: the connection of the current transaction
+        user_id: the id of the user
+        changes: the amount to add to each counter
+    """
+
+    table = UserBookingStats.__table__
+
+    if connection.dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table).values(user_id=user_id, **changes)
+        statement = statement.on_duplicate_key_update({
+            column: table.c[column] + amount for column, amount in changes.items()
+        })
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table).values(user_id=user_id, **changes)
+        statement = statement.on_conflict_do_update(index_elements=["user_id"], set_={
+            column: table.c[column] + amount for column, amount in changes.items()
+        })
+    connection.execute(statement)
+
+def update_booking_stats(session: Session, flush_context):
+    """ a function to apply the counter changes of the flushed bookings in the same transaction
+    Args:
+        session: the session which was flushed
+        flush_context: the flush context from sqlalchemy
+    """
+
+    deltas = {}
+
+    def add(user_id, column, amount):
+        changes = deltas.setdefault(user_id, {})
+        changes[column] = changes.get(column, 0) + amount
+
+    for booking in session.new:
+        if isinstance(booking, Booking):
+            add(booking.user_id, "total", 1)
+            add(booking.user_id, STATUS_COUNTERS[booking.status or Status.PENDING], 1)
+
+    for booking in session.dirty:
+        if not isinstance(booking, Booking):
+            continue
+        history = inspect(booking).attrs.status.history
+        if not history.added or not history.deleted:
+            continue
+        add(booking.user_id, STATUS_COUNTERS[history.deleted[0]], -1)
+        add(booking.user_id, STATUS_COUNTERS[history.added[0]], 1)
+
+    for booking in session.deleted:
+        if isinstance(booking, Booking):
+            add(booking.user_id, "total", -1)
+            add(booking.user_id, STATUS_COUNTERS[booking.status or Status.PENDING], -1)
+
+    connection = session.connection()
+    table = UserBookingStats.__table__
+    for user_id, changes in deltas.items():
+        changes = {column: amount for column, amount in changes.items() if amount}
+        if not user_id or not changes:
+            continue
+        # the counters are added in the database so concurrent bookings never overwrite each other
+        result = connection.execute(
+            update(table).where(table.c.user_id == user_id).values({
+                column: table.c[column] + amount for column, amount in changes.items()
+            })
+        )
+        if result.rowcount == 0 and changes.get("total", 0) > 0:
+            upsert_booking_stats(connection, user_id, changes)
+
+if BOOKING_STATS_COUNTERS:
+    event.listen(Session, "after_flush", update_booking_stats)
@@ -1,6 +1,6 @@
 """ a module to create the celebrity model for login and database saving """
 
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, Index, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from pydantic import BaseModel
 from typing import List
@@ -21,12 +21,18 @@ class Celeb(Basemodel, Base):
     """The orm for the celeb_class in the database"""
 
     __tablename__ = "celebs"
+    __table_args__ = (
+        Index("ix_celebs_created_at_id", "created_at", "id"),
+        Index("ix_celebs_agent_id_created_at_id", "agent_id", "created_at", "id"),
+    )
 
     name: Mapped[str] = mapped_column(String(128), nullable=False)
     location: Mapped[str] = mapped_column(String(256), nullable=True)
     profession: Mapped[str] = mapped_column(String(60), nullable=False)
     marital_status: Mapped[str] = mapped_column(String(60), nullable=True)
-    profile_url: Mapped[str] = mapped_column(String(60), nullable=True, default=None)
+    profile_url: Mapped[str] = mapped_column(String(128), nullable=True, default=None)
+    # the file names of the resized and webp copies of the profile image by variant, sql NULL until they are made
+    profile_variants: Mapped[dict] = mapped_column(JSON(none_as_null=True), nullable=True, default=None)
     bio: Mapped[str] = mapped_column(String(1024), nullable=True)
     
     agent_id: Mapped[str] = mapped_column(String(60), ForeignKey("agents.id"))
@@ -49,6 +55,7 @@ class Celeb(Basemodel, Base):
         self.profession = profession
         self.marital_status = marital_status
         self.profile_url = None
+        self.profile_variants = None
         self.bio = None
 
         super().__init__()
@@ -0,0 +1,29 @@
+""" a module to define the reference counts of the stored images """
+
+from sqlalchemy import String, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base_model import Basemodel, Base
+
+class MediaFile(Basemodel, Base):
+    """ the media file class
+    one row for each distinct image, counting the profiles pointing at it
+    """
+
+    __tablename__ = "media_files"
+
+    key: Mapped[str] = mapped_column(String(128), nullable=False, unique=True)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    refcount: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+
+    def __init__(self, key: str, size: int):
+        """ the class initializer
+        Args:
+            key: the sha256 name of the image with its extension
+            size: the size of the image in bytes
+        """
+
+        super().__init__()
+        self.key = key
+        self.size = size
+        self.refcount = 1
@@ -1,6 +1,7 @@
 """ a module to create the function to save otp code"""
 
-from sqlalchemy import String, Integer
+from datetime import datetime
+from sqlalchemy import String, Integer, JSON
 from sqlalchemy.orm import mapped_column, Mapped
 from pydantic import BaseModel, Field
 
@@ -23,16 +24,27 @@ class OtpCode(Basemodel, Base):
 
     code: Mapped[str] = mapped_column(String(10), nullable=False)
     email: Mapped[str] = mapped_column(String(60), nullable=False, unique=True)
-    count: Mapped[int] = mapped_column(Integer, default=0)
-
-    def __init__(self, email: str, code: str):
+    # the timestamps of the codes sent in the last resend window
+    sends: Mapped[list] = mapped_column(JSON, nullable=False)
+    # the checks made against the current code
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # when the current code was sent, the code is valid for a short time after it
+    sent_at: Mapped[datetime] = mapped_column(nullable=False)
+    # the end of the resend window of the last send, the row is purged after it
+    expires_at: Mapped[datetime] = mapped_column(nullable=False, index=True)
+
+    def __init__(self, email: str, code: str, expires_at: datetime):
         """ the class initializer
         Args:
             email: the email address the otp code is been sent to
             code: the code which is been sent
+            expires_at: the end of the resend window
         """
 
         super().__init__()
         self.code = code
         self.email = email
-        self.count = 0
+        self.sent_at = self.created_at
+        self.sends = [self.sent_at.timestamp()]
+        self.attempts = 0
+        self.expires_at = expires_at
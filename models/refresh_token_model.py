@@ -1,40 +1,71 @@
 """ a module to define the refresh token model for saving refresh tokens """
 
-from sqlalchemy import String, ForeignKey
+import hashlib
+
+from datetime import datetime, timedelta
+from os import getenv
+from sqlalchemy import String, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base_model import Basemodel, Base
 
+# the days a refresh token can be used before the user has to log in again
+REFRESH_TOKEN_DAYS = int(getenv("REFRESH_TOKEN_DAYS", "7"))
+
+def hash_token(token: str):
+    """ a function to get the digest saved in place of a refresh token
+    Args:
+        token: the refresh token sent to the client
+    """
+
+    return hashlib.sha256(token.encode()).hexdigest()
+
 class RefreshToken(Basemodel, Base):
     """ the refresh token class """
 
     __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        Index("ix_refresh_tokens_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     user_id: Mapped[str] = mapped_column(String(60), ForeignKey("users.id"), nullable=False)
+    token_hash: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    expires_at: Mapped[datetime] = mapped_column(nullable=False, index=True)
 
     user: Mapped["User"] = relationship(back_populates="refresh_token")
 
-    def __init__(self, user_id):
-        """ the initializer for the refresh token object"""
+    def __init__(self, user_id, token: str):
+        """ the initializer for the refresh token object
+        Args:
+            user_id: the id of the user the token belongs to
+            token: the refresh token sent to the client, only its hash is saved
+        """
 
         super().__init__()
 
         self.user_id = user_id
+        self.token_hash = hash_token(token)
+        self.expires_at = self.created_at + timedelta(days=REFRESH_TOKEN_DAYS)
 
 class AgentRefresh(Basemodel, Base):
     """ The class for the admin refresh token """
 
     __tablename__ = "agent_refresh"
 
-    agent_id: Mapped[str] = mapped_column(String(60), ForeignKey("agents.id"))
+    agent_id: Mapped[str] = mapped_column(String(60), ForeignKey("agents.id"), index=True)
+    token_hash: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    expires_at: Mapped[datetime] = mapped_column(nullable=False, index=True)
 
     agent: Mapped["Agent"] = relationship(back_populates="refresh_token")
 
-    def __init__(self, agent_id):
+    def __init__(self, agent_id, token: str):
         """ the class initializer
         Args:
             agent_id: the agent id
+            token: the refresh token sent to the agent, only its hash is saved
         """
 
         super().__init__()
         self.agent_id = agent_id
+        self.token_hash = hash_token(token)
+        self.expires_at = self.created_at + timedelta(days=REFRESH_TOKEN_DAYS)
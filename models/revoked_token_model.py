@@ -0,0 +1,31 @@
+""" a module to define the revoked access tokens model """
+
+from datetime import datetime
+from sqlalchemy import String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base_model import Basemodel, Base
+
+class RevokedToken(Basemodel, Base):
+    """ the revoked token class
+    a row either revokes one access token by its jti or every token of a subject issued before it
+    """
+
+    __tablename__ = "revoked_tokens"
+
+    jti: Mapped[str] = mapped_column(String(60), nullable=True, index=True)
+    subject_id: Mapped[str] = mapped_column(String(60), nullable=True, index=True)
+    expires_at: Mapped[datetime] = mapped_column(nullable=False, index=True)
+
+    def __init__(self, expires_at: datetime, jti: str | None = None, subject_id: str | None = None):
+        """ the class initializer
+        Args:
+            expires_at: the time after which the revoked tokens have expired anyway
+            jti: the id of the revoked access token
+            subject_id: the id of the user, agent or admin whose tokens are revoked
+        """
+
+        super().__init__()
+        self.jti = jti
+        self.subject_id = subject_id
+        self.expires_at = expires_at
@@ -0,0 +1,16 @@
+""" a module to define the claims carried by the access tokens """
+
+from pydantic import BaseModel, Field
+
+class AccessClaims(BaseModel):
+    """ the authorization claims of an access token
+    they identify the caller without a database lookup
+    """
+
+    id: str = Field(validation_alias="user_id")
+    role: str = "user"
+    jti: str | None = None
+    iat: float | None = None
+    level: str | None = None
+    is_verified: bool | None = None
+    tier: int | None = None
@@ -3,7 +3,7 @@
 import enum
 
 from datetime import date, datetime
-from sqlalchemy import String, Boolean, Enum
+from sqlalchemy import String, Boolean, Enum, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from pydantic import BaseModel, EmailStr
 from typing import List
@@ -42,6 +42,9 @@ class UpdateUserLevel(BaseModel):
 class User(Basemodel, Base):
 
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
     name: Mapped[str] = mapped_column(String(256), nullable=False)
     email: Mapped[str] = mapped_column(String(256), nullable=False, unique=True)
@@ -53,7 +56,7 @@ class User(Basemodel, Base):
     old_level: Mapped[UserLevel] = mapped_column(Enum(UserLevel), default=UserLevel.UNVERIFIED)
 
     bookings: Mapped[List["Booking"]] = relationship(back_populates="user", cascade="all, delete, delete-orphan")
-    refresh_token: Mapped["RefreshToken"] = relationship(back_populates="user", cascade="all, delete, delete-orphan")
+    refresh_token: Mapped[List["RefreshToken"]] = relationship(back_populates="user", cascade="all, delete, delete-orphan")
 
     def __init__(
         self, 
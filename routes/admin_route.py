@@ -5,19 +5,26 @@ from fastapi.responses import JSONResponse
 from typing import Dict
 
 from database.storage_engine import DBStorage
+from database.async_storage_engine import AsyncDBStorage
 from models.agent_model import AgentCreate, Agent, UpdateAgentTier
 from models.admin_model import Admin
 from models.booking_model import BookingStatus, Status
 from models.user import UpdateUserLevel
 from utils.responses import api_response
+from utils.pagination import page_offset, page_data, valid_cursor
+from utils.fields import parse_fields
 from utils.check_email import check_email
-from utils.check_password import ph
-from middlewares.admin_access_token import get_admin_from_access_token
+from utils.id_string import uuid
+from services.password_service import password_service
+from utils.cookie_token import token_manager
+from middlewares.admin_access_token import get_admin_from_access_token, get_admin_claims
 from services.email_sender import email_sender
 from services.file_management import file_manager
+from services.image_pipeline import image_pipeline, profile_image, accepts_webp
+from services.pricing_engine import pricing_engine
 
 
-admin = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(get_admin_from_access_token)])
+admin = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(get_admin_claims)])
 
 @admin.post("/agent/add")
 async def add_agent(agent: AgentCreate, request: Request, get_admin_response = Depends(get_admin_from_access_token)):
@@ -50,26 +57,34 @@ async def add_agent(agent: AgentCreate, request: Request, get_admin_response = D
         content = api_response(False, "The email domain is not approved by our servers")
         return JSONResponse(content.model_dump(), 500)
     
-    # send an email to the agent with an otp code for email verification
-    password_response = email_sender.send_agent_password(agent.email)
-    password = password_response.payload
-
-    admin.agents.append(Agent(agent.name, agent.email, ph.hash(password), agent.phone_number))
+    password = uuid().split("-")[-1]
+    new_agent = Agent(agent.name, agent.email, await password_service.hash(password), agent.phone_number)
+    admin.agents.append(new_agent)
     admin.save(storage)
 
+    # the password only reaches the agent by email so the agent is removed again when it is not sent
+    password_response = await email_sender.send_agent_password(agent.email, password)
+    if not password_response.status:
+        storage.delete(new_agent)
+        content = api_response(False, "The password email could not be sent, add the agent again later")
+        return JSONResponse(content.model_dump(), 503)
+
     content = api_response(True, f"Agent {agent.name} has been added successfully")
     return JSONResponse(content.model_dump())
 
 @admin.get("/agents")
 @admin.get("/agents/{agent_id}")
-async def get_agent_info(request: Request, agent_id: str | None = None, page: int = 1, offset: int=10, limit: int=10, get_admin_response=Depends(get_admin_from_access_token)):
+async def get_agent_info(request: Request, agent_id: str | None = None, page: int = 1, limit: int=10, cursor: str | None = None, fields: str | None = None, get_admin_response=Depends(get_admin_from_access_token)):
     """ an endpoint to get all or one of an agent if the agent_id is provided
     Args:
         agent_id: the agent id if it is provided
+        cursor: the next_cursor of the previous page, an empty cursor starts from the first page
+        fields: the comma separated columns to return for each item e.g name,email
         get_admin_response: the admin response from the access token
     """
 
     storage: DBStorage = request.state.storage
+    async_storage: AsyncDBStorage = request.state.async_storage
 
     if not get_admin_response.status:
         content = api_response(False, "The user is not allowed to use this route")
@@ -80,15 +95,21 @@ async def get_agent_info(request: Request, agent_id: str | None = None, page: in
         return JSONResponse(content.model_dump(), 205)
     
     if agent_id:
-        agent_response = storage.get_agent_from_id(agent_id)
+        agent_response = await async_storage.get_agent_from_id(agent_id)
         agent = agent_response.payload
-        content = api_response(True, "Agent gotten successfuly", agent.to_dict()) if agent_response.status else api_response(False, "no agent is gotten for the provided id")
+        content = api_response(True, "Agent gotten successfuly", profile_image(agent.to_dict(), "medium", accepts_webp(request))) if agent_response.status else api_response(False, "no agent is gotten for the provided id")
         return JSONResponse(content.model_dump())
     
-    page = page - 1 if page >= 1 else 0
-    
-    agents_response = storage.get_agents(offset * page, limit)
-    content = api_response(True, "Agents gotten successfully", agents_response.payload) if agents_response.status else api_response(False, "No agent is found for the provided page")
+    if not valid_cursor(cursor):
+        content = api_response(False, "Invalid cursor")
+        return JSONResponse(content.model_dump(), 400)
+
+    agents_response = await async_storage.get_agents(page_offset(page, limit), limit, cursor, parse_fields(fields))
+    if agents_response.status:
+        agents = [profile_image(agent, "thumb", accepts_webp(request)) for agent in agents_response.payload]
+        content = api_response(True, "Agents gotten successfully", page_data(agents, limit, cursor))
+    else:
+        content = api_response(False, "No agent is found for the provided page")
     return JSONResponse(content.model_dump())
 
 @admin.delete("/agent/{agent_id}")
@@ -118,8 +139,13 @@ async def delete_admin(agent_id: str, request: Request, get_admin_response = Dep
     # delete the agent
     agent = agent_response.payload
     if agent.profile_url:
-        file_manager.delete_agent_file(agent.profile_url)
+        await file_manager.delete_agent_image(agent.profile_url, storage)
+    # the celebrities are deleted with the agent so their images lose a reference too
+    for celeb in agent.celebs:
+        if celeb.profile_url:
+            await file_manager.delete_celeb_image(celeb.profile_url, storage)
     agent.delete(storage)
+    token_manager.revoke_subject(agent_id, storage)
     content = api_response(True, "Agent deleted")
     return JSONResponse(content.model_dump())
 
@@ -193,16 +219,18 @@ async def add_agent_image(agent_id: str, request: Request, file: UploadFile = Fi
     
     agent: Agent = agent_response.payload
 
-    location_response = file_manager.save_agent_file(file)
+    location_response = await file_manager.save_image(file, storage)
     if not location_response.status:
-        content = api_response(False, "The file was not successfully saved")
+        content = api_response(False, location_response.payload or "The file was not successfully saved")
         return JSONResponse(content.model_dump(), 500)
     
     if agent.profile_url:
-        file_manager.delete_agent_file(agent.profile_url)
+        await file_manager.delete_agent_image(agent.profile_url, storage)
 
-    agent.profile_url = location_response.payload
+    agent.profile_url = location_response.payload.get("location")
+    agent.profile_variants = None
     agent.save(storage)
+    image_pipeline.submit(Agent, agent.id, agent.profile_url)
     content = api_response(True, "The image has been saved successfully", agent.to_dict())
     return JSONResponse(content.model_dump())
 
@@ -238,18 +266,22 @@ async def update_agent_tier(agent_id: str, payload: UpdateAgentTier, request: Re
     agent: Agent = agent_response.payload
     agent.tier = new_tier
     agent.save(storage)
+    token_manager.revoke_subject(agent.id, storage)
     content = api_response(True, "Agent tier updated successfully", agent.to_dict())
     return JSONResponse(content.model_dump())
 
 @admin.get("/celebs")
-async def get_all_celebs(request:Request, page: int = 1, limit: int = 10, get_admin_response = Depends(get_admin_from_access_token)):
+async def get_all_celebs(request:Request, page: int = 1, limit: int = 10, cursor: str | None = None, fields: str | None = None, get_admin_response = Depends(get_admin_from_access_token)):
     """ a method to get the admin response for the provided page
     Args:
         page: the current page
         limit: the amount of data to be presented for each page
+        cursor: the next_cursor of the previous page, an empty cursor starts from the first page
+        fields: the comma separated columns to return for each item e.g name,email
     """
 
     storage: DBStorage = request.state.storage
+    async_storage: AsyncDBStorage = request.state.async_storage
 
     if not get_admin_response.status:
         content = api_response(False, "The user is not allowed to use this route")
@@ -259,23 +291,32 @@ async def get_all_celebs(request:Request, page: int = 1, limit: int = 10, get_ad
         content = api_response(False, "The access token is expired refresh to user the application")
         return JSONResponse(content.model_dump(), 205)
     
-    page = 0 if page - 1 < 0 else page - 1
+    if not valid_cursor(cursor):
+        content = api_response(False, "Invalid cursor")
+        return JSONResponse(content.model_dump(), 400)
 
-    celebs_response = storage.get_celebrities_for_admin(limit, page * limit)
-    content = api_response(True, "Celebrities gotten", celebs_response.payload) if celebs_response.status else api_response(False, "No celebrity found")
+    celebs_response = await async_storage.get_celebrities_for_admin(limit, page_offset(page, limit), cursor, parse_fields(fields))
+    if celebs_response.status:
+        celebs = [profile_image(celeb, "thumb", accepts_webp(request)) for celeb in celebs_response.payload]
+        content = api_response(True, "Celebrities gotten", page_data(celebs, limit, cursor))
+    else:
+        content = api_response(False, "No celebrity found")
     return JSONResponse(content.model_dump())
 
 @admin.get("/users")
 @admin.get("/users/{user_id}")
-async def get_all_user(request: Request, user_id: str = None, page: int = 1, limit: int = 10, get_admin_response = Depends(get_admin_from_access_token)):
+async def get_all_user(request: Request, user_id: str = None, page: int = 1, limit: int = 10, cursor: str | None = None, fields: str | None = None, get_admin_response = Depends(get_admin_from_access_token)):
     """ an endpoint to get the user from the database for the admin
     Args:
         user_id: the user id of the user
         page: the current page
         limit: the limit of the page
+        cursor: the next_cursor of the previous page, an empty cursor starts from the first page
+        fields: the comma separated columns to return for each item e.g name,email
     """
 
     storage: DBStorage = request.state.storage
+    async_storage: AsyncDBStorage = request.state.async_storage
 
     if not get_admin_response.status:
         content = api_response(False, "The user is not allowed to use this route")
@@ -285,15 +326,17 @@ async def get_all_user(request: Request, user_id: str = None, page: int = 1, lim
         content = api_response(False, "The access token is expired refresh to user the application")
         return JSONResponse(content.model_dump(), 205)
     
-    page = 0 if page - 1 > 0 else page - 1
-    
     if not user_id:
-        user_response = storage.get_users_for_admin(limit, limit * page)
+        if not valid_cursor(cursor):
+            content = api_response(False, "Invalid cursor")
+            return JSONResponse(content.model_dump(), 400)
 
-        content = api_response(True, "Users retrieved", user_response.payload) if user_response.status else api_response(False, "No user is found")
+        user_response = await async_storage.get_users_for_admin(limit, page_offset(page, limit), cursor, parse_fields(fields))
+
+        content = api_response(True, "Users retrieved", page_data(user_response.payload, limit, cursor)) if user_response.status else api_response(False, "No user is found")
         return JSONResponse(content.model_dump())
     
-    user_response = storage.get_user_by_id(user_id)
+    user_response = await async_storage.get_user_by_id(user_id)
     content = api_response(True, "User gotten", user_response.payload.to_dict()) if user_response.status else api_response(False, "No user with this id found")
     return JSONResponse(content.model_dump())
 
@@ -321,6 +364,7 @@ async def delete_user_by_admin(user_id: str, request: Request, get_admin_respons
     
     user = user_response.payload
     user.delete(storage)
+    token_manager.revoke_subject(user_id, storage)
 
     content = api_response(True, "The user has been deleted successfully")
     return JSONResponse(content.model_dump())
@@ -356,14 +400,16 @@ async def update_user_level(user_id: str, payload: UpdateUserLevel, request: Req
     user.old_level = user_level
 
     user.save(storage)
+    token_manager.revoke_subject(user.id, storage)
     content = api_response(True, "The users level has been updated successfully", user.to_dict())
     return JSONResponse(content.model_dump())
 
 @admin.get("/bookings/{booking_id}")
-async def get_booking_for_admin(booking_id: str, request: Request, get_admin_response=Depends(get_admin_from_access_token)):
+async def get_booking_for_admin(booking_id: str, request: Request, currency: str | None = None, get_admin_response=Depends(get_admin_from_access_token)):
     """ an endpoint to get a booking based on the provided booking id
     Args:
         booking_id: the booking id to search for
+        currency: the code of a currency to add the booking price in, e.g EUR
         get_admin_response: the admin from the access token
     """
 
@@ -382,9 +428,13 @@ async def get_booking_for_admin(booking_id: str, request: Request, get_admin_res
         content = api_response(False, "No booking is found for the provided id")
     else:
         booking = booking_response.payload
+        booking_dict = booking.to_dict()
+        if currency and not (await pricing_engine.price_bookings([booking_dict], currency)).status:
+            content = api_response(False, "The currency is not supported or the exchange rates are unavailable")
+            return JSONResponse(content.model_dump(), 400)
         # print(booking.celeb, "===", booking.?user)
         content = api_response(True, "Booking successfully retrieved", {
-            "booking": booking.to_dict(),
+            "booking": booking_dict,
             "user": booking.user.name,
             "celebrity": booking.celeb.name
         })
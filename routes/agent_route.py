@@ -1,6 +1,5 @@
 """ a module to define the agent route """
 
-from argon2.exceptions import VerifyMismatchError
 from fastapi import APIRouter, Depends, Body, UploadFile, File, Request
 from fastapi.responses import JSONResponse
 from typing import Dict, Optional
@@ -10,12 +9,18 @@ from models.celebrity_model import CelebCreate, Celeb
 from models.avalilability_model import AgentWeekDay
 from models.booking_model import BookingStatus, Status
 from database.storage_engine import DBStorage
-from middlewares.agent_access_token import verify_agent_access_token
+from database.async_storage_engine import AsyncDBStorage
+from middlewares.agent_access_token import verify_agent_access_token, verify_agent_claims
 from utils.responses import api_response
-from utils.check_password import ph, check_password_strength
+from utils.pagination import page_offset, page_data, valid_cursor
+from utils.fields import parse_fields, include_fields
+from utils.check_password import check_password_strength
+from services.password_service import password_service
 from services.file_management import file_manager
+from services.image_pipeline import image_pipeline, profile_image, accepts_webp
+from services.pricing_engine import pricing_engine, PRICING_FIELDS
 
-agent = APIRouter(prefix="/agent", tags=["Agents"], dependencies=[Depends(verify_agent_access_token)])
+agent = APIRouter(prefix="/agent", tags=["Agents"], dependencies=[Depends(verify_agent_claims)])
 
 @agent.patch("/profile/password")
 async def update_password(request: Request, payload: Dict[str, str]=Body(), get_agent_response = Depends(verify_agent_access_token)):
@@ -41,9 +46,8 @@ async def update_password(request: Request, payload: Dict[str, str]=Body(), get_
         content = api_response(False, "Both the old and the new password must be provided and must be different")
         return JSONResponse(content.model_dump(), 500)
     
-    try:
-        ph.verify(agent.password, old_password)
-    except VerifyMismatchError:
+    password_response = await password_service.verify(agent.password, old_password)
+    if not password_response.status:
         content = api_response(False, "The old password does not match the new one")
         return JSONResponse(cotent.model_dump(), 500)
     
@@ -52,7 +56,7 @@ async def update_password(request: Request, payload: Dict[str, str]=Body(), get_
         content = api_response(False, "The provided password is not up to the required strength")
         return JSONResponse(content.model_dump(), 500)
     
-    agent.password = ph.hash(new_password)
+    agent.password = await password_service.hash(new_password)
     agent.email_verified = True
     agent.save(request.state.storage)
 
@@ -83,14 +87,17 @@ async def add_celebrity(celeb: CelebCreate, request: Request, get_agent_response
 
 @agent.get("/celebs")
 @agent.get("/celebs/{celeb_id}")
-async def get_celebrity(request: Request, celeb_id: Optional[str] = None, page: int = 1, limit: int = 10, get_agent_response = Depends(verify_agent_access_token)):
+async def get_celebrity(request: Request, celeb_id: Optional[str] = None, page: int = 1, limit: int = 10, cursor: Optional[str] = None, fields: Optional[str] = None, get_agent_response = Depends(verify_agent_access_token)):
     """ a method to get a celebrity infrmation if an celeb_id is given
     else all the celebs of the agents are provided
     Args:
         celeb_id (str): the celeb_id of the celebrity if given
+        cursor: the next_cursor of the previous page, an empty cursor starts from the first page
+        fields: the comma separated columns to return for each item e.g name,email
         get_agent_response: the agent in a response
     """
     storage: DBStorage = request.state.storage
+    async_storage: AsyncDBStorage = request.state.async_storage
     
     if not get_agent_response.status:
         content = api_response(False, "The user is not allowed to visit this route")
@@ -103,12 +110,19 @@ async def get_celebrity(request: Request, celeb_id: Optional[str] = None, page:
     agent: Agent = get_agent_response.payload
 
     # get the celebrities from the database using the required offset and limit
-    page = page - 1 if page - 1 > 0 else 0
-    celeb_response = storage.get_celebrities(agent.id, limit, limit * page, celeb_id)
+    if not valid_cursor(cursor):
+        content = api_response(False, "Invalid cursor")
+        return JSONResponse(content.model_dump(), 400)
+
+    celeb_response = await async_storage.get_celebrities(agent.id, limit, page_offset(page, limit), celeb_id, cursor, parse_fields(fields))
     if not celeb_response.status:
         content = api_response(False, "No celebrity is found")
+    elif celeb_id:
+        celeb = profile_image(celeb_response.payload, "medium", accepts_webp(request))
+        content = api_response(True, "Celebrity gotten successfully", celeb)
     else:
-        content = api_response(True, "Celebrity gotten successfully", celeb_response.payload)
+        celeb_list = [profile_image(celeb, "thumb", accepts_webp(request)) for celeb in celeb_response.payload]
+        content = api_response(True, "Celebrity gotten successfully", page_data(celeb_list, limit, cursor))
     return JSONResponse(content.model_dump())
 
 @agent.put("/celeb/{celeb_id}/profile/picture")
@@ -141,19 +155,21 @@ async def add_profile_image(celeb_id: str, request: Request, file: UploadFile =
         content = api_response(False, "No celebrity found with the provided ID")
         return JSONResponse(content.model_dump(), 500)
     
-    saved_file_response = file_manager.save_celeb_file(file)
+    saved_file_response = await file_manager.save_image(file, storage)
     if not saved_file_response.status:
-        content = api_response(False, "The file was not successfully saved")
+        content = api_response(False, saved_file_response.payload or "The file was not successfully saved")
         return JSONResponse(content.model_dump(), 500)
     
     celeb: Celeb = get_celeb_response.payload
-    file_location = saved_file_response.payload
+    file_location = saved_file_response.payload.get("location")
 
     if celeb.profile_url:
-        file_manager.delete_celeb_file(celeb.profile_url)
+        await file_manager.delete_celeb_image(celeb.profile_url, storage)
 
     celeb.profile_url = file_location
+    celeb.profile_variants = None
     celeb.save(storage)
+    image_pipeline.submit(Celeb, celeb.id, file_location)
 
     content = api_response(True, "The upload is successful", celeb.to_dict())
     return JSONResponse(content.model_dump())
@@ -208,6 +224,7 @@ async def get_celeb_availability(celeb_id: str, request: Request, get_agent_resp
     """
 
     storage: DBStorage = request.state.storage
+    async_storage: AsyncDBStorage = request.state.async_storage
 
     if not get_agent_response.status:
         content = api_response(False, "The user is not allowed to visit this route")
@@ -217,7 +234,7 @@ async def get_celeb_availability(celeb_id: str, request: Request, get_agent_resp
         content = api_response(False, "The access token is expired, Refresh and try again")
         return JSONResponse(content.model_dump(), 205)
     
-    availability_response = storage.get_celeb_availability(celeb_id)
+    availability_response = await async_storage.get_celeb_availability(celeb_id, readonly=True)
     if not availability_response.status:
         content = api_response(False, "No availability is found for the provided celeb")
         return JSONResponse(content.model_dump())
@@ -276,13 +293,17 @@ async def update_celeb_availability(celeb_id: str, payload: AgentWeekDay, reques
     return JSONResponse(content.model_dump())
 
 @agent.get("/celeb/{celeb_id}/bookings")
-async def get_celeb_bookings(celeb_id: str, request: Request, page: int = 1, limit:int = 10, get_agent_response = Depends(verify_agent_access_token)):
+async def get_celeb_bookings(celeb_id: str, request: Request, page: int = 1, limit:int = 10, cursor: Optional[str] = None, fields: Optional[str] = None, currency: Optional[str] = None, get_agent_response = Depends(verify_agent_access_token)):
     """an endpoint to get all the bookings of a celebrity
     Args:
         celeb_id: the celebrity id of which to get the booking
+        cursor: the next_cursor of the previous page, an empty cursor starts from the first page
+        fields: the comma separated columns to return for each item e.g name,email
+        currency: the code of a currency to add the booking prices in, e.g EUR
     """
 
     storage: DBStorage = request.state.storage
+    async_storage: AsyncDBStorage = request.state.async_storage
 
     if not get_agent_response.status:
         content = api_response(False, "The user is not allowed to visit this route")
@@ -292,13 +313,23 @@ async def get_celeb_bookings(celeb_id: str, request: Request, page: int = 1, lim
         content = api_response(False, "The access token is expired, Refresh and try again")
         return JSONResponse(content.model_dump(), 205)
     
-    page = 0 if page - 1 < 0 else page - 1
+    if not valid_cursor(cursor):
+        content = api_response(False, "Invalid cursor")
+        return JSONResponse(content.model_dump(), 400)
+
+    fields = parse_fields(fields)
+    if currency:
+        # the prices are worked out from these columns so they are loaded whatever fields were asked for
+        fields = include_fields(fields, PRICING_FIELDS)
 
-    bookings_list_response = storage.get_celeb_bookings(celeb_id, limit, limit * page)
+    bookings_list_response = await async_storage.get_celeb_bookings(celeb_id, limit, page_offset(page, limit), cursor, fields)
     if not bookings_list_response.status:
         content = api_response(False, "No booking is found for the provided celebrity")
+    elif currency and not (await pricing_engine.price_bookings(bookings_list_response.payload, currency)).status:
+        content = api_response(False, "The currency is not supported or the exchange rates are unavailable")
+        return JSONResponse(content.model_dump(), 400)
     else:
-        content = api_response(True, "Bookings found", bookings_list_response.payload)  
+        content = api_response(True, "Bookings found", page_data(bookings_list_response.payload, limit, cursor))  
 
     return JSONResponse(content.model_dump())
 
@@ -11,11 +11,14 @@ from database.storage_engine import DBStorage
 from utils.responses import api_response
 from utils.cookie_token import token_manager
 from utils.check_email import check_email
-from utils.check_password import check_password_strength, ph
+from utils.check_password import check_password_strength
+from services.password_service import password_service
+from utils.login_throttle import login_throttle, LOGIN_THROTTLE_WINDOW
 from middlewares.get_user_from_cookies import get_user_from_access_token
 from middlewares.admin_access_token import get_admin_from_access_token
 from middlewares.agent_access_token import verify_agent_access_token
 from services.email_sender import email_sender
+from services.otp_store import otp_store
 from utils.id_string import uuid
 from utils.delete_refresh_token import delete_refresh_token
 
@@ -52,11 +55,11 @@ async def signup(user: UserCreate, request: Request):
 
     # create the user
     user = User(**user.model_dump())
-    user.password = ph.hash(user.password)
+    user.password = await password_service.hash(user.password)
     user.save(storage)
 
     # set the cookies and send them to the user frontend
-    access_tokesn_response = token_manager.create_access_token(user.id)
+    access_tokesn_response = token_manager.create_access_token(user)
     refresh_token_response = token_manager.create_refresh_token(user.id, storage)
     # create the refresh token for user refresh
     content = api_response(True, "The user has been created", user.to_dict())
@@ -73,17 +76,32 @@ async def login(user: UserLogin, request: Request):
         user: the user information containing the email and password
     """
 
+    # the throttle is checked before the database and the password hash are touched
+    client_ip = request.client.host if request.client else None
+    if not await login_throttle.allow("user", user.email, client_ip):
+        content = api_response(False, "Too many login attempts, wait a few minutes and try again")
+        return JSONResponse(content.model_dump(), 429, headers={"Retry-After": str(int(LOGIN_THROTTLE_WINDOW))})
+
     storage: DBStorage = request.state.storage
 
-    saved_user_response = storage.get_user_from_email(user.email, user.password)
+    saved_user_response = storage.get_user_from_email(user.email)
     if not saved_user_response.status:
         # return a response that the user is not found
         content = api_response(False, "No user is found for the current email address and password")
         return JSONResponse(content.model_dump(), 500)
+
+    password_response = await password_service.verify(saved_user_response.payload.password, user.password)
+    if not password_response.status:
+        content = api_response(False, "No user is found for the current email address and password")
+        return JSONResponse(content.model_dump(), 500)
     
     user = saved_user_response.payload
+    if password_response.payload:
+        user.password = password_response.payload
+        user.save(storage)
+    await login_throttle.succeeded("user", user.email, client_ip)
 
-    access_token_response = token_manager.create_access_token(user.id)
+    access_token_response = token_manager.create_access_token(user)
     refresh_token_response = token_manager.create_refresh_token(user.id, storage)
     content = api_response(True, "Login successful", user.to_dict())
     response = JSONResponse(content.model_dump())
@@ -117,6 +135,11 @@ async def request_otp_code(request: Request, user_response = Depends(get_user_fr
     
     send_mail_response = email_sender.send_otp_code(user_response.payload.email, storage)
 
+    if not send_mail_response.status and send_mail_response.payload:
+        retry_after = send_mail_response.payload["retry_after"]
+        content = api_response(False, f"Too many codes were requested, wait {retry_after} seconds before asking for a new one")
+        return JSONResponse(content.model_dump(), 429, headers={"Retry-After": str(retry_after)})
+
     if not send_mail_response.status:
         content = api_response(False, "The email message was not sent successfully")
         return JSONResponse(content.model_dump(), 500)
@@ -139,19 +162,13 @@ async def validate_otp(otp_code: OTPRequest, request: Request, user_response = D
         content = api_response(False, "The access code is expired")
         return JSONResponse(content.model_dump(), 205)
     
-    user_email_response = storage.get_otp_email(otp_code)
     user = user_response.payload
 
-    if not user_email_response.status:
-        content = api_response(False, "The OTP code is invalid")
-        return JSONResponse(content.model_dump(), 500)
-    
-    if user_email_response.payload.email != user.email:
-        content = api_response(False, "Your email address does not correspond with the provided otp code")
+    # the code is looked up with the user email so codes of other users never match
+    if not otp_store.consume(user.email, otp_code, storage):
+        content = api_response(False, "The OTP code is invalid or has expired")
         return JSONResponse(content.model_dump(), 500)
     
-    user_email_response.payload.delete(storage)
-    
     # update the user from this end and delete the otp code
     user.is_verified = True
     if user.old_level == UserLevel.UNVERIFIED:
@@ -179,6 +196,7 @@ async def logout(request: Request, user_response = Depends(get_user_from_access_
     
     # delete the refresh token from the database
     delete_refresh_token(request.cookies.get("refresh_token"), request.state.storage)
+    token_manager.revoke_access_token(request.cookies.get("access_token"), request.state.storage)
 
     content = api_response(True, "Log out successful")
     response = JSONResponse(content.model_dump())
@@ -209,7 +227,12 @@ async def refresh_token(request: Request):
     token_object = verify_refresh_response.payload
     user_id = token_object.user_id
 
-    access_token_response = token_manager.create_access_token(user_id)
+    user_response = storage.get_principal("user", user_id)
+    if not user_response.status:
+        content = api_response(False, "The provided token does not match a user on our end")
+        return JSONResponse(content.model_dump(), 500)
+
+    access_token_response = token_manager.create_access_token(user_response.payload)
     refresh_token_response = token_manager.create_refresh_token(user_id, storage)
 
     token_object.delete(storage)
@@ -226,16 +249,30 @@ async def admin_login(admin: AdminLogin, request: Request):
         the admin email and password in the request body
     """
 
+    # the throttle is checked before the database and the password hash are touched
+    client_ip = request.client.host if request.client else None
+    if not await login_throttle.allow("admin", admin.email, client_ip):
+        content = api_response(False, "Too many login attempts, wait a few minutes and try again")
+        return JSONResponse(content.model_dump(), 429, headers={"Retry-After": str(int(LOGIN_THROTTLE_WINDOW))})
+
     storage: DBStorage = request.state.storage
 
-    admin_user_response = storage.get_admin_from_email(admin.email, admin.password)
+    admin_user_response = storage.get_admin_from_email(admin.email)
     if not admin_user_response.status:
         content = api_response(False, "Login unsuccessful check your password and email and try again")
         return JSONResponse(content.model_dump(), 500)
+
+    password_response = await password_service.verify(admin_user_response.payload.password, admin.password)
+    if not password_response.status:
+        content = api_response(False, "Login unsuccessful check your password and email and try again")
+        return JSONResponse(content.model_dump(), 500)
     
     AdminUser = admin_user_response.payload
+    if password_response.payload:
+        AdminUser.password = password_response.payload
+    await login_throttle.succeeded("admin", AdminUser.email, client_ip)
     
-    access_token_response = token_manager.create_access_token(AdminUser.id)
+    access_token_response = token_manager.create_access_token(AdminUser, "admin")
     AdminUser.refresh_token = uuid()
     AdminUser.save(storage)
 
@@ -263,7 +300,7 @@ async def refresh_admin_token(request: Request):
     
     AdminUser.refresh_token = uuid()
     AdminUser.save(storage)
-    access_token_response = token_manager.create_access_token(AdminUser.id)
+    access_token_response = token_manager.create_access_token(AdminUser, "admin")
 
     content = api_response(True, "The refresh is successful")
     response = JSONResponse(content.model_dump())
@@ -286,6 +323,7 @@ async def log_out_admin(request: Request, admin_response = Depends(get_admin_fro
     AdminUser = admin_response.payload
     AdminUser.refresh_token = None
     AdminUser.save(request.state.storage)
+    token_manager.revoke_access_token(request.cookies.get("access_token"), request.state.storage)
 
     content = api_response(True, "Logout successful")
     response = JSONResponse(content.model_dump())
@@ -300,27 +338,42 @@ async def agent_login(agent: AgentLogin, request: Request):
         agent: the agent email and password
     """
 
+    # the throttle is checked before the database and the password hash are touched
+    client_ip = request.client.host if request.client else None
+    if not await login_throttle.allow("agent", agent.email, client_ip):
+        content = api_response(False, "Too many login attempts, wait a few minutes and try again")
+        return JSONResponse(content.model_dump(), 429, headers={"Retry-After": str(int(LOGIN_THROTTLE_WINDOW))})
+
     storage: DBStorage = request.state.storage
 
-    get_agent_response = storage.get_agent_from_email(agent.email, agent.password)
+    get_agent_response = storage.get_agent_from_email(agent.email)
 
     if not get_agent_response.status:
         content = api_response(False, "The provided email and password are not correct")
         return JSONResponse(content.model_dump(), 500)
     
-    if not get_agent_response.payload:
+    if not agent.password:
         content = api_response(False, "No password is provided")
         return JSONResponse(content.model_dump(), 500)
+
+    password_response = await password_service.verify(get_agent_response.payload.password, agent.password)
+    if not password_response.status:
+        content = api_response(False, "The provided email and password are not correct")
+        return JSONResponse(content.model_dump(), 500)
     
     agent = get_agent_response.payload
+    if password_response.payload:
+        agent.password = password_response.payload
+        agent.save(storage)
+    await login_throttle.succeeded("agent", agent.email, client_ip)
 
-    access_token_response = token_manager.create_access_token(agent.id)
+    access_token_response = token_manager.create_access_token(agent, "agent")
     refresh_token_response = token_manager.create_agent_refresh(agent.id, storage)
 
     content = api_response(True, "Login successful", agent.to_dict())
     response = JSONResponse(content.model_dump())
     response.set_cookie("access_token", access_token_response.payload.get("access_token"))
-    response.set_cookie("refresh_token", refresh_token_response.payload.get("id"))
+    response.set_cookie("refresh_token", refresh_token_response.payload.get("refresh_token"))
     return response
 
 @auth.get("/agent/refresh")
@@ -340,13 +393,18 @@ async def refresh_agent_token(request: Request):
     
     agent_id = agent_id_response.payload.get("agent_id")
 
-    access_token_response = token_manager.create_access_token(agent_id)
+    agent_response = storage.get_principal("agent", agent_id)
+    if not agent_response.status:
+        content = api_response(False, "The refresh token is invalid")
+        return JSONResponse(content.model_dump(), 500)
+
+    access_token_response = token_manager.create_access_token(agent_response.payload, "agent")
     refresh_token_response = token_manager.create_agent_refresh(agent_id, storage)
 
     content = api_response(True, "Token refresh successful")
     response = JSONResponse(content.model_dump())
     response.set_cookie("access_token", access_token_response.payload.get("access_token"))
-    response.set_cookie("refresh_token", refresh_token_response.payload.get("id"))
+    response.set_cookie("refresh_token", refresh_token_response.payload.get("refresh_token"))
     return response
 
 @auth.post("/agent/logout")
@@ -365,6 +423,7 @@ async def agent_log_out(request: Request, get_agent_response = Depends(verify_ag
 
     if agent.refresh_token:
         agent.refresh_token.delete(request.state.storage)
+    token_manager.revoke_access_token(request.cookies.get("access_token"), request.state.storage)
 
     content = api_response(True, "Log out successful")
     response = JSONResponse(content.model_dump())
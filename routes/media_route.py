@@ -0,0 +1,95 @@
+""" a module to define the route serving the stored profile images """
+
+import asyncio
+import os
+import re
+
+from os import getenv
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, FileResponse, Response
+
+from utils.responses import api_response
+from services.file_management import file_manager
+
+media = APIRouter(tags=["Media"], prefix="/media")
+
+# a stored image or one of its copies, e.g <sha256>.png or <sha256>_thumb_webp.webp
+MEDIA_KEY = re.compile(r"^(?P<stem>[0-9a-f]{64}(?:_[a-z_]+)?)\.(?P<extension>png|jpeg|webp)$")
+# the uuid names of the images saved before the content addressed store
+# the old upload kept whatever followed the last dot of the client file name, in its case, e.g .JPG
+LEGACY_KEY = re.compile(r"^[0-9a-f-]{36}\.(?P<extension>[^./]+)$")
+
+MEDIA_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+LEGACY_MEDIA_TYPES = {**MEDIA_TYPES, "jpg": "image/jpeg", "jpe": "image/jpeg", "gif": "image/gif", "bmp": "image/bmp"}
+
+# the stored names never change content so the clients can keep them for a year
+MEDIA_CACHE_CONTROL = f"public, max-age={int(getenv('MEDIA_CACHE_MAX_AGE', '31536000'))}, immutable"
+# when set the bytes are left to the proxy, e.g /protected-media/ mapped by nginx to MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = getenv("MEDIA_ACCEL_PREFIX")
+
+def etag_matches(if_none_match: str | None, etag: str):
+    """ a function to check the If-None-Match header of a request against an etag
+    Args:
+        if_none_match: the header value, a list of etags or *
+        etag: the quoted etag of the file
+    """
+
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def locate(key: str):
+    """ a function to find a stored image on disk
+    Args:
+        key: the file name saved on the profile or one of its copies
+    Return the path, the etag and the media type, or None when the name is not a stored image
+    """
+
+    match = MEDIA_KEY.match(key)
+    if match:
+        # the name is the hash of the content so it makes a strong etag
+        return file_manager.path_of(key), f'"{match["stem"]}"', MEDIA_TYPES[match["extension"]]
+
+    match = LEGACY_KEY.match(key)
+    if match:
+        for directory in (file_manager.agent_path, file_manager.admin_path):
+            path = f"{directory}/{key}"
+            if os.path.exists(path):
+                media_type = LEGACY_MEDIA_TYPES.get(match["extension"].lower(), "application/octet-stream")
+                return path, None, media_type
+    return None
+
+@media.api_route("/{key}", methods=["GET", "HEAD"])
+async def get_media(key: str, request: Request):
+    """ an endpoint to serve a profile image or one of its resized copies
+    the file is sent by the server without reading it into python and partial Range requests are answered
+    Args:
+        key: the file name of the image
+    """
+
+    location = await asyncio.to_thread(locate, key)
+    if location is None:
+        content = api_response(False, "No image is found with the provided name")
+        return JSONResponse(content.model_dump(), 404)
+
+    path, etag, media_type = location
+    # the legacy names may carry any extension so the browsers must not guess a type from the bytes
+    headers = {"Cache-Control": MEDIA_CACHE_CONTROL, "X-Content-Type-Options": "nosniff"}
+    if etag:
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+    if MEDIA_ACCEL_PREFIX:
+        relative = os.path.relpath(path, file_manager.root)
+        headers["X-Accel-Redirect"] = f"{MEDIA_ACCEL_PREFIX.rstrip('/')}/{relative}"
+        return Response(media_type=media_type, headers=headers)
+
+    try:
+        stat_result = await asyncio.to_thread(os.stat, path)
+    except FileNotFoundError:
+        content = api_response(False, "No image is found with the provided name")
+        return JSONResponse(content.model_dump(), 404)
+
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
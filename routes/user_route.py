@@ -3,20 +3,23 @@
 from fastapi import Depends, APIRouter, Body, Request
 from fastapi.responses import JSONResponse
 from typing import Dict
-from argon2.exceptions import VerifyMismatchError
 from pydantic import EmailStr
 
-from models.celebrity_model import Celeb
-from models.booking_model import Booking
 from models.avalilability_model import UserWeekDay
 from utils.responses import api_response
-from utils.check_password import ph, check_password_strength
+from utils.pagination import page_offset, page_data, valid_cursor
+from utils.fields import parse_fields, include_fields
+from utils.check_password import check_password_strength
+from services.password_service import password_service
 from utils.check_email import check_email
 from utils.booking_price import price_converter
-from middlewares.get_user_from_cookies import get_user_from_access_token
+from services.pricing_engine import pricing_engine, PRICING_FIELDS
+from services.image_pipeline import profile_image, accepts_webp
+from middlewares.get_user_from_cookies import get_user_from_access_token, get_user_claims
 from database.storage_engine import DBStorage
+from database.async_storage_engine import AsyncDBStorage
 
-user = APIRouter(prefix="/user", tags=["Users"], dependencies=[Depends(get_user_from_access_token)])
+user = APIRouter(prefix="/user", tags=["Users"], dependencies=[Depends(get_user_claims)])
 
 @user.get("/me")
 async def get_me(user_response = Depends(get_user_from_access_token)):
@@ -61,9 +64,8 @@ async def update_password(request: Request, payload: Dict[str, str] = Body(), us
         content = api_response(False, "The old and new password must be different")
         return JSONResponse(content.model_dump(), 500)
     
-    try:
-        ph.verify(user.password, old_password)
-    except VerifyMismatchError:
+    password_response = await password_service.verify(user.password, old_password)
+    if not password_response.status:
         content = api_response(False, "the old password does not match the user password")
         return JSONResponse(content.model_dump(), 500)
     
@@ -72,7 +74,7 @@ async def update_password(request: Request, payload: Dict[str, str] = Body(), us
         content = api_response(False, "The password provided does not match the required strength")
         return JSONResponse(content.model_dump(), 500)
     
-    user.password = ph.hash(new_password)
+    user.password = await password_service.hash(new_password)
     user.save(storage)
 
     content = api_response(True, "The user password has been updated", user.to_dict())
@@ -175,14 +177,17 @@ async def delete_me(request: Request, user_response = Depends(get_user_from_acce
 
 @user.get("/agents")
 @user.get("/agents/{agent_id}")
-async def get_agents_and_celebs(request: Request, agent_id: str = None, page:int = 1, limit: int = 10, user_response=Depends(get_user_from_access_token)):
+async def get_agents_and_celebs(request: Request, agent_id: str = None, page:int = 1, limit: int = 10, cursor: str | None = None, fields: str | None = None, user_response=Depends(get_user_from_access_token)):
     """ a module for user to get agents from the database 
     when agent_id is given the agent along with the agent celebrities are provided
     Args:
         agent_id: the agent id for the agent to search for
+        cursor: the next_cursor of the previous page, an empty cursor starts from the first page
+        fields: the comma separated columns to return for each item e.g name,email
     """
 
     storage: DBStorage = request.state.storage
+    async_storage: AsyncDBStorage = request.state.async_storage
 
     if not user_response.status:
         content = api_response(False, "The access token is not valid")
@@ -194,12 +199,16 @@ async def get_agents_and_celebs(request: Request, agent_id: str = None, page:int
     
     if not agent_id:
         # no agent id is given so all the agents are provided for the user
-        page = 0 if page - 1 < 0 else page - 1
-        agents_response = storage.get_agents(page * limit, limit)
+        if not valid_cursor(cursor):
+            content = api_response(False, "Invalid cursor")
+            return JSONResponse(content.model_dump(), 400)
+
+        agents_response = await async_storage.get_agents(page_offset(page, limit), limit, cursor, parse_fields(fields))
         if not  agents_response.status:
             content = api_response(False, "No agent found")
         else:
-            agents = agents_response.payload
+            agent_list = [profile_image(agent, "thumb", accepts_webp(request)) for agent in agents_response.payload]
+            agents = page_data(agent_list, limit, cursor)
             content = api_response(True, "Agents retrieved successfully", agents)
         return JSONResponse(content.model_dump())
     
@@ -209,9 +218,10 @@ async def get_agents_and_celebs(request: Request, agent_id: str = None, page:int
         return JSONResponse(content.model_dump())
     
     agent = agent_response.payload
-    celeb_list = [celeb.to_dict() for celeb in agent.celebs]
+    webp = accepts_webp(request)
+    celeb_list = [profile_image(celeb.to_dict(), "thumb", webp) for celeb in agent.celebs]
 
-    content = api_response(True, "Agent and celebrities gotten", {"agent": agent.to_dict(), "celebs": celeb_list})
+    content = api_response(True, "Agent and celebrities gotten", {"agent": profile_image(agent.to_dict(), "medium", webp), "celebs": celeb_list})
     return JSONResponse(content.model_dump())
 
 @user.get("/celeb/{celeb_id}/availability")
@@ -223,6 +233,7 @@ async def get_celeb_availability(celeb_id:str, request: Request, user_response =
     """
 
     storage: DBStorage = request.state.storage
+    async_storage: AsyncDBStorage = request.state.async_storage
 
     if not user_response.status:
         content = api_response(False, "The access token is not valid")
@@ -232,7 +243,7 @@ async def get_celeb_availability(celeb_id:str, request: Request, user_response =
         content = api_response(False, "The Token expired, Refresh the token and try again")
         return JSONResponse(content.model_dump(), 205)
 
-    availability_response = storage.get_celeb_availability(celeb_id)
+    availability_response = await async_storage.get_celeb_availability(celeb_id, readonly=True)
     if not availability_response.status:
         content = api_response(False, "No availability for the selected celebrity")
     else:
@@ -258,27 +269,30 @@ async def book_a_celeb(celeb_id: str, payload: UserWeekDay, request: Request, us
     
     user = user_response.payload
 
+    # the celebrity is checked first so an invalid booking never waits on the quote
     celeb_response = storage.get_celeb_by_id(celeb_id)
     if not celeb_response.status:
-        content = (False, "No celebrity found with the provided id")
+        content = api_response(False, "No celebrity found with the provided id")
         return JSONResponse(content.model_dump())
-    
-    celeb: Celeb = celeb_response.payload
 
-    celeb.bookings.append(Booking(payload.day ,user.id, payload.type))
-    celeb.save(storage)
+    # the price is stored with the booking so reading it later needs no quote, without a recent quote
+    # the btc price is left empty and set later by utils.backfill_booking_prices
+    price = await price_converter(payload.type)
+
+    storage.create_booking(celeb_id, user.id, payload.day, payload.type, price, celeb=celeb_response.payload)
 
     content = api_response(True, "Booking added")
     return JSONResponse(content.model_dump())
 
 @user.get("/bookings/count")
-async def count_all_user_bookings(request: Request, user_response=Depends(get_user_from_access_token)):
+async def count_all_user_bookings(request: Request, user_response=Depends(get_user_claims)):
     """ an endpoint to get the count of bookings a users has submitted along with approved counts and rejected counts
     Args:
-        user_response: the user from the access token
+        user_response: the user claims from the access token
     """
 
     storage: DBStorage = request.state.storage
+    async_storage: AsyncDBStorage = request.state.async_storage
 
     if not user_response.status:
         content = api_response(False, "The access token is not valid")
@@ -290,7 +304,7 @@ async def count_all_user_bookings(request: Request, user_response=Depends(get_us
     
     user = user_response.payload
     
-    count_response = storage.get_user_bookings_info(user.id)
+    count_response = await async_storage.get_user_bookings_info(user.id)
     if not count_response.status:
         content = api_response(False, "The user id is not correct")
     else:
@@ -300,15 +314,19 @@ async def count_all_user_bookings(request: Request, user_response=Depends(get_us
 
 @user.get("/bookings")
 @user.get("/bookings/{booking_id}")
-async def get_bookings_for_user(request: Request, booking_id: str = None, page: int = 1, limit: int = 10, user_response=Depends(get_user_from_access_token)):
+async def get_bookings_for_user(request: Request, booking_id: str = None, page: int = 1, limit: int = 10, cursor: str | None = None, fields: str | None = None, currency: str | None = None, user_response=Depends(get_user_claims)):
     """ an endpoint to get all the bookings of a user and view the booking status
     Args:
         booking_id: the booking ticket number for viewing the booking by the user
         page: the booking page on the front end
         limit: the amount of data to be viewed by the frontend
+        cursor: the next_cursor of the previous page, an empty cursor starts from the first page
+        fields: the comma separated columns to return for each item e.g name,email
+        currency: the code of a currency to add the booking prices in, e.g EUR
     """
 
     storage: DBStorage = request.state.storage
+    async_storage: AsyncDBStorage = request.state.async_storage
 
     if not user_response.status:
         content = api_response(False, "The access token is not valid")
@@ -320,15 +338,27 @@ async def get_bookings_for_user(request: Request, booking_id: str = None, page:
 
     user = user_response.payload
 
-    page = 0 if page - 1 > 0 else page - 1
-    booking_list_response = storage.get_booking(booking_id, limit, limit * page, user_id=user.id)
+    if not valid_cursor(cursor):
+        content = api_response(False, "Invalid cursor")
+        return JSONResponse(content.model_dump(), 400)
+
+    fields = parse_fields(fields)
+    if currency:
+        # the prices are worked out from these columns so they are loaded whatever fields were asked for
+        fields = include_fields(fields, PRICING_FIELDS)
+
+    booking_list_response = await async_storage.get_booking(booking_id, limit, page_offset(page, limit), cursor, fields, user_id=user.id)
 
     if not booking_list_response.status:
         content = api_response(False, "No booking is found with the provided number")
         return JSONResponse(content.model_dump())
     
     if not booking_id:
-        bookings = booking_list_response.payload
+        if currency and not (await pricing_engine.price_bookings(booking_list_response.payload, currency)).status:
+            content = api_response(False, "The currency is not supported or the exchange rates are unavailable")
+            return JSONResponse(content.model_dump(), 400)
+
+        bookings = page_data(booking_list_response.payload, limit, cursor)
         content = api_response(True, "bookings are retrieved successfully", bookings)
         return JSONResponse(content.model_dump())
     
@@ -336,7 +366,16 @@ async def get_bookings_for_user(request: Request, booking_id: str = None, page:
 
     booking_dict = booking.to_dict()
 
-    booking_dict["price"] = price_converter(booking.type)
+    if booking.price_btc is not None:
+        booking_dict["price"] = {"usd": booking.price_usd, "btc": booking.price_btc}
+    else:
+        # bookings made before the prices were stored are priced now until the backfill runs
+        price = await price_converter(booking.type)
+        booking_dict["price"] = {"usd": price["usd"], "btc": price["btc"]}
+
+    if currency and not (await pricing_engine.price_bookings([booking_dict], currency)).status:
+        content = api_response(False, "The currency is not supported or the exchange rates are unavailable")
+        return JSONResponse(content.model_dump(), 400)
 
     content = api_response(True, "Booking is retrieved successfully", booking_dict)
     return JSONResponse(content.model_dump())
\ No newline at end of file
@@ -1,55 +1,35 @@
 """ a module to create a function to send email to a user"""
 
-import smtplib
-
 from os import getenv
 from email.message import EmailMessage
 from datetime import datetime
 
-from models.otp_codes_model import OtpCode
 from database.storage_engine import DBStorage
-from utils.create_otp_code import create_otp
+from services.otp_store import otp_store
 from utils.responses import function_response
-from utils.id_string import uuid
+from services.mail_queue import mail_queue
+from services.registry import services, LazyService
 
 class EmailSender:
-    """ a class which holds functions to send emails to a user"""
-
-    def __init__(self):
-        """ the class initializer"""
-
-        self.__sender = smtplib.SMTP("smtp.gmail.com", 587)
-        self.__sender.starttls()
-        account = getenv("GOOGLE_ACCOUNT")
-        password = getenv("GOOGLE_PASSWORD")
-
-        self.__sender.login(account, password)
+    """ a class which holds functions to send emails to a user
+    the messages are queued and sent by the mail queue workers, except the agent passwords
+    """
 
     def send_otp_code(self, email_address: str, storage: DBStorage):
         """ a method to send otp codes to the provided email address and save the sent otp code to the database
         Args:
             email_address (str): the email address of the user
-        Return: the otp object already saved to the database
+        Return: the otp code once the email is queued, or the seconds to wait when the resend limits refuse it
         """
 
-        otp_code = create_otp()
-
-        saved_otp_response = storage.get_otp_object(email_address)
-        if saved_otp_response.status:
-            otp_code_object = saved_otp_response.payload
-            if otp_code_object.count == 3:
-                return function_response(False)
-    
-            otp_code_object.code = otp_code
-            otp_code_object.count += 1
-        else:
-            otp_code_object = OtpCode(email_address, otp_code)
-        otp_code_object.save(storage)
+        otp_code = otp_store.issue(email_address, storage)
+        if otp_code is None:
+            return function_response(False, {"retry_after": otp_store.retry_after(email_address, storage)})
 
         # send the email to the user
         message = EmailMessage()
         message["To"] = email_address
-        message["From"] = getenv("GOOGLE_ACCOUNT")
+        message["From"] = getenv("MAIL_FROM") or getenv("GOOGLE_ACCOUNT")
         message["Subject"] = "Celeb Connect Validation Email"
         message.set_content(f"The validation code is {otp_code}")
         message.add_alternative(f"""
@@ -89,22 +69,22 @@ class EmailSender:
 </html>
 """, subtype="html")
         
-        self.__sender.send_message(message)
+        mail_queue.enqueue(message)
 
         return function_response(True, {"code": otp_code})
     
-    def send_agent_password(self, agent_email):
+    async def send_agent_password(self, agent_email: str, password: str):
         """a method to send a password to the agent which he needs to change as
         soon as he logs in to the website
+        the email is sent before returning since nobody else knows the password
         Args:
             agent_email: the email address of the agent
+            password: the generated password of the agent
         """
 
-        password = uuid().split("-")[-1]
-
         message = EmailMessage()
         message["To"] = agent_email
-        message["From"] = getenv("GOOGLE_ACCOUNT")
+        message["From"] = getenv("MAIL_FROM") or getenv("GOOGLE_ACCOUNT")
         message["Subject"] = "Celeb Connect Validation Email"
         message.set_content(f"The password is {password}")
         message.add_alternative(f"""
@@ -187,8 +167,13 @@ class EmailSender:
 </body>
 </html>
 """, subtype="html")
-        
-        self.__sender.send_message(message)
-        return function_response(True, password)
 
-email_sender = EmailSender()
+        try:
+            await mail_queue.send(message)
+        except Exception as e:
+            print(f"The password email to {agent_email} was not sent: {e}")
+            return function_response(False)
+        return function_response(True)
+
+services.register("email_sender", EmailSender)
+email_sender = LazyService(services, "email_sender")
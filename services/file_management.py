@@ -1,88 +1,227 @@
 """ a module to create a file management class for managing  all file activities """
 
+import asyncio
+import glob
+import hashlib
 import os
-import shutil
+import tempfile
 
+from os import getenv
 from fastapi import UploadFile
 
-from utils.id_string import uuid
 from utils.responses import function_response
+from services.registry import services, LazyService
+
+# the most bytes accepted for one profile image and the size of each read
+MAX_UPLOAD_BYTES = int(getenv("MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+# the first bytes of the accepted image formats and the extension they are saved with
+IMAGE_SIGNATURES = {
+    b"\x89PNG\r\n\x1a\n": "png",
+    b"\xff\xd8\xff": "jpeg",
+}
+
+def image_extension(head: bytes):
+    """ a function to get the extension of an image from its first bytes
+    Args:
+        head: the start of the file
+    Return None when the bytes are not a png or jpeg image
+    """
+
+    for signature, extension in IMAGE_SIGNATURES.items():
+        if head.startswith(signature):
+            return extension
+    return None
 
 class FileManager:
-    """ the file management class """
+    """ the file management class
+    the images are stored once under the sha256 of their content in two levels of sharded folders
+    and the database counts the profiles pointing at each of them
+    """
 
     def __init__(self):
         """The class initilializer"""
 
-        self.agent_path = "/tmp/celeb_connect/agents"
-        self.user_path = "/tmp/celeb_connect/users"
-        self.admin_path = "/tmp/celeb_connect/admin"
+        self.root = getenv("MEDIA_ROOT", "/tmp/celeb_connect")
+        self.media_path = f"{self.root}/media"
+        self.temp_path = f"{self.media_path}/tmp"
 
+        # the flat folders of the images saved before the content addressed store
+        self.agent_path = f"{self.root}/agents"
+        self.user_path = f"{self.root}/users"
+        self.admin_path = f"{self.root}/admin"
+
+        os.makedirs(self.temp_path, exist_ok=True)
         os.makedirs(self.agent_path, exist_ok=True)
         os.makedirs(self.user_path, exist_ok=True)
         os.makedirs(self.admin_path, exist_ok=True)
 
-    def save_celeb_file(self, file: UploadFile):
-        """ a method to save the file to the server
+    def path_of(self, key: str):
+        """ a method to get the path of a stored image
+        Args:
+            key: the sha256 name of the image, ab/cd/abcd....png for the key abcd....png
+        """
+
+        return f"{self.media_path}/{key[:2]}/{key[2:4]}/{key}"
+
+    async def save_upload(self, file: UploadFile):
+        """ a method to stream an uploaded image to a temp file without blocking the event loop
+        the file is read in chunks, checked and hashed on the way
         Args:
             file: the file to be saved
+        Return the temp path, key and size of the upload, or the reason it was refused
         """
 
-        ext = file.filename.split(".")[-1]
-        location = f"{uuid()}.{ext}"
+        descriptor, temp_path = await asyncio.to_thread(tempfile.mkstemp, dir=self.temp_path, suffix=".part")
+        temp_file = os.fdopen(descriptor, "wb")
+        digest = hashlib.sha256()
+        size, extension = 0, None
 
         try:
-            with open(f"{self.agent_path}/{location}", "wb") as profile_file:
-                shutil.copyfileobj(file.file, profile_file)
-            return function_response(True, location)
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                if extension is None:
+                    extension = image_extension(chunk)
+                    if extension is None:
+                        return function_response(False, "Only png or jpeg images are accepted")
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    return function_response(False, f"The file is larger than {MAX_UPLOAD_BYTES} bytes")
+                digest.update(chunk)
+                await asyncio.to_thread(temp_file.write, chunk)
+
+            if extension is None:
+                return function_response(False, "The file is empty")
+
+            await asyncio.to_thread(temp_file.close)
+            upload = {"temp_path": temp_path, "key": f"{digest.hexdigest()}.{extension}", "size": size}
+            temp_path = None
+            return function_response(True, upload)
         except Exception:
             return function_response(False)
         finally:
-            file.file.close()
+            await file.close()
+            if temp_path is not None:
+                await asyncio.to_thread(self.__discard, temp_file, temp_path)
 
-    def delete_celeb_file(self, file_url):
-        """ a method to delete a celebrity profile image
+    def __discard(self, temp_file, temp_path: str):
+        """ a method to remove the temp file of a refused or failed upload """
+
+        temp_file.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    def __place(self, temp_path: str, key: str):
+        """ a method to move an accepted upload to its place in the store
+        the upload is dropped when the same image is already stored
         Args:
-            file_url (str): the file location
+            temp_path: the temp file of the upload
+            key: the sha256 name of the image
+        Return True when the image was already stored
         """
 
-        file_path = f"{self.agent_path}/{file_url}"
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print(f"File '{file_path}' deleted.")
-        else:
-            print(f"The file '{file_path}' does not exist.")
+        path = self.path_of(key)
+        if os.path.exists(path):
+            os.remove(temp_path)
+            return True
 
-    def save_agent_file(self, file: UploadFile):
-        """ a method to save the file to the server
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        return False
+
+    async def save_image(self, file: UploadFile, storage):
+        """ a method to save a profile image to the store and count the new reference to it
         Args:
             file: the file to be saved
+            storage: the storage of the request
+        Return the location, sha256 and size of the image and if it was already stored
         """
 
-        ext = file.filename.split(".")[-1]
-        location = f"{uuid()}.{ext}"
+        upload_response = await self.save_upload(file)
+        if not upload_response.status:
+            return upload_response
+        upload = upload_response.payload
 
         try:
-            with open(f"{self.admin_path}/{location}", "wb") as profile_file:
-                shutil.copyfileobj(file.file, profile_file)
-            return function_response(True, location)
+            # the reference is counted before the file is placed so a concurrent delete keeps it
+            storage.add_media_reference(upload["key"], upload["size"])
         except Exception:
+            await asyncio.to_thread(os.remove, upload["temp_path"])
             return function_response(False)
-        finally:
-            file.file.close()
 
-    def delete_agent_file(self, file_url):
+        try:
+            deduplicated = await asyncio.to_thread(self.__place, upload["temp_path"], upload["key"])
+        except Exception:
+            # the reference was never used by a profile so it is given back
+            await self.delete_image(upload["key"], storage)
+            if os.path.exists(upload["temp_path"]):
+                await asyncio.to_thread(os.remove, upload["temp_path"])
+            return function_response(False)
+
+        return function_response(True, {
+            "location": upload["key"],
+            "sha256": upload["key"].split(".")[0],
+            "size": upload["size"],
+            "deduplicated": deduplicated,
+        })
+
+    def __remove(self, path: str):
+        """ a method to remove a file which may already be gone """
+
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"File '{path}' deleted.")
+
+    def remove_copies(self, key: str):
+        """ a method to remove the resized and webp copies of a stored image
+        Args:
+            key: the sha256 name of the image
+        """
+
+        path = self.path_of(key)
+        stem = os.path.basename(path).split(".")[0]
+        for copy in glob.glob(f"{os.path.dirname(path)}/{stem}_*"):
+            self.__remove(copy)
+
+    def __remove_with_copies(self, key: str):
+        """ a method to remove a stored image along with its resized and webp copies """
+
+        self.__remove(self.path_of(key))
+        self.remove_copies(key)
+
+    async def delete_image(self, key: str, storage, legacy_directory: str | None = None):
+        """ a method to drop one reference to a profile image, removing the file with the last one
+        Args:
+            key: the location saved on the profile
+            storage: the storage of the request
+            legacy_directory: the flat folder the image was saved in before the store, if any
+        """
+
+        release_response = await asyncio.to_thread(
+            storage.release_media_reference, key, lambda: self.__remove_with_copies(key)
+        )
+        if not release_response.payload and legacy_directory:
+            # the uuid names of the old folders never match a sha256 name
+            await asyncio.to_thread(self.__remove, f"{legacy_directory}/{key}")
+
+    async def delete_celeb_image(self, key: str, storage):
         """ a method to delete a celebrity profile image
         Args:
-            file_url (str): the file location
+            key: the location saved on the profile
+            storage: the storage of the request
+        """
+
+        await self.delete_image(key, storage, self.agent_path)
+
+    async def delete_agent_image(self, key: str, storage):
+        """ a method to delete an agent profile image
+        Args:
+            key: the location saved on the profile
+            storage: the storage of the request
         """
 
-        file_path = f"{self.admin_path}/{file_url}"
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print(f"File '{file_path}' deleted.")
-        else:
-            print(f"The file '{file_path}' does not exist.")
-    
+        await self.delete_image(key, storage, self.admin_path)
 
-file_manager = FileManager()
\ No newline at end of file
+# the folders are created on first use or by the lifespan instead of at import
+services.register("file_manager", FileManager)
+file_manager = LazyService(services, "file_manager")
@@ -0,0 +1,242 @@
+""" a module to share one pooled async http client between the calls to the outbound apis """
+
+import asyncio
+import httpx
+
+from collections import defaultdict
+from os import getenv
+from time import monotonic, perf_counter
+
+class CircuitOpenError(Exception):
+    """ the error raised without calling a host while its circuit is open """
+
+class CircuitBreaker:
+    """ a class which stops the calls to a host after repeated failures until it has had time to recover """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        """ the class initializer
+        Args:
+            failure_threshold: the failures in a row which open the circuit
+            reset_timeout: the seconds the circuit stays open before one trial call is let through
+        """
+
+        self.__failure_threshold = failure_threshold
+        self.__reset_timeout = reset_timeout
+        self.__failures = 0
+        self.__opened_at = None
+        self.__trial_running = False
+
+    @property
+    def state(self):
+        """ the state of the circuit, either closed, open or half_open """
+
+        if self.__opened_at is None:
+            return "closed"
+        if monotonic() - self.__opened_at < self.__reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self):
+        """ a method to check if a call can be made, only one trial call is let through when half open
+        Return if the call can be made and if it took the trial slot
+        """
+
+        state = self.state
+        if state == "closed":
+            return True, False
+        if state == "half_open" and not self.__trial_running:
+            self.__trial_running = True
+            return True, True
+        return False, False
+
+    def record_success(self):
+        """ a method to close the circuit after a successful call """
+
+        self.__failures = 0
+        self.__opened_at = None
+        self.__trial_running = False
+
+    def release(self):
+        """ a method to give back the trial slot of a call which ended without an outcome for the host
+        such as a cancelled call or an error raised before the host answered, only the trial call calls it
+        """
+
+        self.__trial_running = False
+
+    def record_failure(self, trial: bool = False):
+        """ a method to count a failed call and open the circuit past the threshold
+        Args:
+            trial: if the call held the trial slot, a call started before the circuit opened leaves the slot alone
+        """
+
+        self.__failures += 1
+        if trial:
+            self.__trial_running = False
+        if self.__opened_at is not None or self.__failures >= self.__failure_threshold:
+            self.__opened_at = monotonic()
+
+class HostMetrics:
+    """ a class which records the latency and outcome of the calls to one host """
+
+    def __init__(self):
+        """ the class initializer """
+
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def observe(self, seconds: float, failed: bool):
+        """ a method to record a call
+        Args:
+            seconds: the time the call took
+            failed: if the call failed
+        """
+
+        self.calls += 1
+        self.errors += failed
+        self.latency_total += seconds
+        self.latency_max = max(self.latency_max, seconds)
+
+    def to_dict(self):
+        """ a method to get the recorded metrics """
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "latency_avg_seconds": round(self.latency_total / self.calls, 6) if self.calls else 0.0,
+            "latency_max_seconds": round(self.latency_max, 6),
+        }
+
+class HttpClient:
+    """ a class wrapping a keep alive httpx client with per host limits, timeouts and circuit breakers """
+
+    def __init__(
+            self,
+            max_connections: int,
+            max_keepalive: int,
+            per_host_limit: int,
+            timeout: float,
+            connect_timeout: float,
+            failure_threshold: int,
+            reset_timeout: float
+    ):
+        """ the class initializer
+        Args:
+            max_connections: the most connections open across every host
+            max_keepalive: the most idle connections kept open for reuse
+            per_host_limit: the most calls in flight to one host
+            timeout: the seconds allowed for reading, writing and waiting on the pool
+            connect_timeout: the seconds allowed to connect
+            failure_threshold: the failures in a row which open the circuit of a host
+            reset_timeout: the seconds a circuit stays open
+        """
+
+        self.__limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.__timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.__per_host_limit = per_host_limit
+        self.__failure_threshold = failure_threshold
+        self.__reset_timeout = reset_timeout
+        self.__client = None
+        self.__semaphores = {}
+        self.__breakers = {}
+        self.__metrics = defaultdict(HostMetrics)
+
+    def start(self):
+        """ a method to create the underlying client, called by the lifespan """
+
+        if self.__client is None:
+            self.__client = httpx.AsyncClient(limits=self.__limits, timeout=self.__timeout)
+
+    async def close(self):
+        """ a method to close the pooled connections """
+
+        if self.__client is not None:
+            await self.__client.aclose()
+            self.__client = None
+
+    def __breaker(self, host: str):
+        """ a method to get the circuit breaker of a host """
+
+        if host not in self.__breakers:
+            self.__breakers[host] = CircuitBreaker(self.__failure_threshold, self.__reset_timeout)
+        return self.__breakers[host]
+
+    def __semaphore(self, host: str):
+        """ a method to get the concurrency limit of a host """
+
+        if host not in self.__semaphores:
+            self.__semaphores[host] = asyncio.Semaphore(self.__per_host_limit)
+        return self.__semaphores[host]
+
+    async def request(self, method: str, url: str, **kwargs):
+        """ a method to call an outbound api
+        a server error, a rate limit or a network error counts as a failure for the circuit breaker
+        Args:
+            method: the http method
+            url: the url to call
+            kwargs: the httpx request options such as headers or params
+        Raise CircuitOpenError without calling the host while its circuit is open
+        """
+
+        self.start()
+        host = httpx.URL(url).host
+        breaker, metrics = self.__breaker(host), self.__metrics[host]
+
+        allowed, trial = breaker.allow()
+        if not allowed:
+            metrics.rejected += 1
+            raise CircuitOpenError(f"The calls to {host} are paused after repeated failures")
+
+        try:
+            async with self.__semaphore(host):
+                start = perf_counter()
+                try:
+                    response = await self.__client.request(method, url, **kwargs)
+                except httpx.HTTPError:
+                    metrics.observe(perf_counter() - start, True)
+                    breaker.record_failure(trial)
+                    raise
+        except BaseException:
+            # otherwise a cancelled trial call would leave the host rejected for good, any other call
+            # leaves the slot alone so it cannot let a second trial through while one is running
+            if trial:
+                breaker.release()
+            raise
+
+        failed = response.status_code >= 500 or response.status_code == 429
+        metrics.observe(perf_counter() - start, failed)
+        if failed:
+            breaker.record_failure(trial)
+        else:
+            breaker.record_success()
+        return response
+
+    async def get(self, url: str, **kwargs):
+        """ a method to send a get request
+        Args:
+            url: the url to call
+            kwargs: the httpx request options such as headers or params
+        """
+
+        return await self.request("GET", url, **kwargs)
+
+    def stats(self):
+        """ a method to get the latency metrics and circuit state of each host """
+
+        return {
+            host: {**metrics.to_dict(), "circuit": self.__breaker(host).state}
+            for host, metrics in self.__metrics.items()
+        }
+
+http_client = HttpClient(
+    int(getenv("HTTP_MAX_CONNECTIONS", "100")),
+    int(getenv("HTTP_MAX_KEEPALIVE", "20")),
+    int(getenv("HTTP_PER_HOST_LIMIT", "10")),
+    float(getenv("HTTP_TIMEOUT", "5")),
+    float(getenv("HTTP_CONNECT_TIMEOUT", "2")),
+    int(getenv("HTTP_BREAKER_FAILURES", "5")),
+    float(getenv("HTTP_BREAKER_RESET", "30")),
+)
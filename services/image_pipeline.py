@@ -0,0 +1,194 @@
+""" a module to make the resized and webp copies of the profile images away from the upload requests """
+
+import asyncio
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from os import getenv
+from PIL import Image, ImageOps
+
+from services.file_management import file_manager
+
+# the longest side in pixels of each resized copy, every size is also saved as webp
+VARIANT_SIZES = {"thumb": 160, "medium": 640}
+WEBP_QUALITY = int(getenv("IMAGE_WEBP_QUALITY", "80"))
+
+def variant_name(key: str, variant: str, extension: str):
+    """ a function to get the file name of a copy of an image
+    Args:
+        key: the sha256 name of the original image
+        variant: the name of the copy
+        extension: the extension of the copy
+    """
+
+    return f"{key.split('.')[0]}_{variant}.{extension}"
+
+def render_variants(path: str, sizes: dict, webp_quality: int):
+    """ a function to write the resized and webp copies next to an image, run inside the worker processes
+    the copies already on disk are kept since the same content always gives the same copies
+    Args:
+        path: the path of the original image
+        sizes: the longest side of each resized copy by name
+        webp_quality: the quality of the webp copies
+    Return the file name of each copy by variant, e.g thumb and thumb_webp
+    """
+
+    key = os.path.basename(path)
+    extension = key.split(".")[-1]
+    image_format = "PNG" if extension == "png" else "JPEG"
+    variants = {}
+
+    with Image.open(path) as original:
+        # the camera rotation is applied so the copies stand the right way up
+        image = ImageOps.exif_transpose(original)
+        if image_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+
+        outputs = [("webp", None, "webp")]
+        for variant, side in sizes.items():
+            outputs += [(variant, side, extension), (f"{variant}_webp", side, "webp")]
+
+        for variant, side, out_extension in outputs:
+            name = variant_name(key, variant, out_extension)
+            variants[variant] = name
+            target = f"{os.path.dirname(path)}/{name}"
+            if os.path.exists(target):
+                continue
+
+            copy = image.copy()
+            if side is not None:
+                copy.thumbnail((side, side), Image.LANCZOS)
+            temp_path = f"{target}.{os.getpid()}.part"
+            if out_extension == "webp":
+                copy.save(temp_path, "WEBP", quality=webp_quality, method=4)
+            else:
+                copy.save(temp_path, image_format, optimize=True)
+            os.replace(temp_path, target)
+
+    return variants
+
+def profile_image(item: dict, size: str, webp: bool = False):
+    """ a function to add the image of the requested size to a celebrity or agent dictionary
+    the original image is used until its copies are made
+    Args:
+        item: the dictionary of the celebrity or agent
+        size: the name of the resized copy, thumb for the lists and medium for one profile
+        webp: if the client accepts webp images
+    """
+
+    variants = item.get("profile_variants") or {}
+    item["profile_image"] = variants.get(f"{size}_webp" if webp else size) or item.get("profile_url")
+    return item
+
+def accepts_webp(request):
+    """ a function to check if the client of a request accepts webp images
+    Args:
+        request: the request of the client
+    """
+
+    return "image/webp" in request.headers.get("accept", "")
+
+class ImagePipeline:
+    """ a class which makes the copies of the uploaded images on a pool of processes in the background """
+
+    def __init__(self, max_workers: int, sizes: dict, webp_quality: int):
+        """ the class initializer
+        Args:
+            max_workers: the amount of processes resizing at the same time
+            sizes: the longest side of each resized copy by name
+            webp_quality: the quality of the webp copies
+        """
+
+        self.__max_workers = max_workers
+        self.__sizes = sizes
+        self.__webp_quality = webp_quality
+        self.__executor = None
+        self.__session_factory = None
+        self.__tasks = set()
+        self.__done = 0
+        self.__failed = 0
+
+    def __pool(self):
+        """ a method to start the process pool on first use """
+
+        if self.__executor is None:
+            # spawn keeps the workers free of the parent sockets and event loop
+            self.__executor = ProcessPoolExecutor(self.__max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.__executor
+
+    def start(self, session_factory):
+        """ a method to set the sessions the copies are recorded with, called by the lifespan
+        Args:
+            session_factory: the sessionmaker of the primary database
+        """
+
+        self.__session_factory = session_factory
+
+    def submit(self, model, object_id: str, key: str):
+        """ a method to queue the copies of an image without waiting for them
+        Args:
+            model: the Celeb or Agent class
+            object_id: the id of the celebrity or agent
+            key: the sha256 name of the image saved on the profile
+        """
+
+        task = asyncio.create_task(self.__process(model, object_id, key))
+        # the running tasks are kept so they are not collected before they finish
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+
+    async def __process(self, model, object_id: str, key: str):
+        """ a method to make the copies of an image and record them on the profile """
+
+        from database.storage_engine import DBStorage
+
+        try:
+            variants = await asyncio.get_running_loop().run_in_executor(
+                self.__pool(), render_variants, file_manager.path_of(key), self.__sizes, self.__webp_quality
+            )
+
+            def record():
+                with self.__session_factory() as session:
+                    DBStorage(session).set_profile_variants(
+                        model, object_id, key, variants, lambda: file_manager.remove_copies(key)
+                    )
+
+            await asyncio.to_thread(record)
+            self.__done += 1
+        except Exception as e:
+            self.__failed += 1
+            print(f"The copies of the image {key} were not made: {e}")
+
+    async def drain(self):
+        """ a method to wait for every queued image to be processed """
+
+        if self.__tasks:
+            await asyncio.wait(set(self.__tasks))
+
+    async def stop(self, timeout: float = 10):
+        """ a method to let the running copies finish before stopping the worker processes
+        Args:
+            timeout: the most seconds to wait for the running copies
+        """
+
+        if self.__tasks:
+            _, pending = await asyncio.wait(set(self.__tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+        if self.__executor is not None:
+            self.__executor.shutdown(cancel_futures=True)
+            self.__executor = None
+
+    def stats(self):
+        """ a method to get the amount of images being processed and the outcome of the finished ones """
+
+        return {"running": len(self.__tasks), "done": self.__done, "failed": self.__failed}
+
+image_pipeline = ImagePipeline(
+    int(getenv("IMAGE_WORKERS", "1")),
+    VARIANT_SIZES,
+    WEBP_QUALITY,
+)
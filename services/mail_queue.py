@@ -0,0 +1,206 @@
+""" a module to send the emails in the background through a small pool of smtp connections """
+
+import asyncio
+import queue
+import smtplib
+
+from email.message import EmailMessage
+from os import getenv
+
+class SMTPPool:
+    """ a class which lends smtp connections to the mail workers and reopens the broken ones """
+
+    def __init__(self, host: str, port: int, size: int, account: str | None = None, password: str | None = None, starttls: bool = True, timeout: float = 30):
+        """ the class initializer
+        Args:
+            host: the smtp server
+            port: the smtp port
+            size: the most connections opened at the same time
+            account: the account to log in with, no login is done when empty
+            password: the password of the account
+            starttls: if the connection is upgraded to tls before the login
+            timeout: the seconds to wait on the smtp server
+        """
+
+        self.__host = host
+        self.__port = port
+        self.__account = account
+        self.__password = password
+        self.__starttls = starttls
+        self.__timeout = timeout
+        self.__idle = queue.LifoQueue()
+        # each slot is either an open connection or None when it has to be opened
+        for _ in range(size):
+            self.__idle.put(None)
+
+    def __connect(self):
+        """ a method to open and log in a new connection """
+
+        connection = smtplib.SMTP(self.__host, self.__port, timeout=self.__timeout)
+        if self.__starttls:
+            connection.starttls()
+        if self.__account:
+            connection.login(self.__account, self.__password)
+        return connection
+
+    def __discard(self, connection):
+        """ a method to close a connection without failing on an already dropped one """
+
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+
+    def send(self, message: EmailMessage):
+        """ a method to send a message on a pooled connection, blocking until it is sent
+        a connection dropped by the server is reopened once before the error is raised
+        Args:
+            message: the message to send
+        """
+
+        connection = self.__idle.get()
+        try:
+            if connection is None:
+                connection = self.__connect()
+            try:
+                connection.send_message(message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # the server dropped the idle connection, it is cleared first in case the reconnect fails
+                self.__discard(connection)
+                connection = None
+                connection = self.__connect()
+                connection.send_message(message)
+        except Exception:
+            if connection is not None:
+                self.__discard(connection)
+            connection = None
+            raise
+        finally:
+            self.__idle.put(connection)
+
+    def close(self):
+        """ a method to close every idle connection """
+
+        slots = []
+        while not self.__idle.empty():
+            connection = self.__idle.get_nowait()
+            if connection is not None:
+                self.__discard(connection)
+            slots.append(None)
+        for slot in slots:
+            self.__idle.put(slot)
+
+class MailQueue:
+    """ a class which queues the emails and sends them from background tasks with retries """
+
+    def __init__(self, pool: SMTPPool, workers: int, max_retries: int, backoff: float):
+        """ the class initializer
+        Args:
+            pool: the smtp connections to send with
+            workers: the amount of tasks sending at the same time
+            max_retries: the retries of a message before it is dropped
+            backoff: the seconds waited before the first retry, doubled on each retry
+        """
+
+        self.__pool = pool
+        self.__workers = workers
+        self.__max_retries = max_retries
+        self.__backoff = backoff
+        self.__queue = asyncio.Queue()
+        self.__tasks = []
+        self.__sent = 0
+        self.__retries = 0
+        self.__failed = 0
+
+    def enqueue(self, message: EmailMessage):
+        """ a method to queue a message without waiting for it to be sent
+        Args:
+            message: the message to send
+        """
+
+        self.__queue.put_nowait(message)
+
+    async def send(self, message: EmailMessage):
+        """ a method to send a message now, for the emails the request cannot succeed without
+        the error is raised to the caller instead of retrying in the background
+        Args:
+            message: the message to send
+        """
+
+        try:
+            await asyncio.to_thread(self.__pool.send, message)
+        except Exception:
+            self.__failed += 1
+            raise
+        self.__sent += 1
+
+    async def __work(self):
+        """ a method to send the queued messages until the task is cancelled """
+
+        while True:
+            message = await self.__queue.get()
+            try:
+                for attempt in range(self.__max_retries + 1):
+                    try:
+                        await asyncio.to_thread(self.__pool.send, message)
+                        self.__sent += 1
+                        break
+                    except Exception as e:
+                        if attempt == self.__max_retries:
+                            self.__failed += 1
+                            print(f"The email to {message['To']} was dropped after {attempt + 1} attempts: {e}")
+                            break
+                        self.__retries += 1
+                        await asyncio.sleep(self.__backoff * 2 ** attempt)
+            finally:
+                self.__queue.task_done()
+
+    def start(self):
+        """ a method to start the worker tasks on the running event loop """
+
+        if not self.__tasks:
+            self.__tasks = [asyncio.create_task(self.__work()) for _ in range(self.__workers)]
+
+    async def stop(self, timeout: float = 10):
+        """ a method to let the workers send the queued messages before stopping them
+        Args:
+            timeout: the most seconds to wait for the queue to drain
+        """
+
+        try:
+            await asyncio.wait_for(self.__queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"{self.__queue.qsize()} queued emails were not sent before shutdown")
+
+        for task in self.__tasks:
+            task.cancel()
+        await asyncio.gather(*self.__tasks, return_exceptions=True)
+        self.__tasks = []
+        await asyncio.to_thread(self.__pool.close)
+
+    def stats(self):
+        """ a method to get the depth of the queue and the delivery counts """
+
+        return {
+            "queued": self.__queue.qsize(),
+            "workers": len(self.__tasks),
+            "sent": self.__sent,
+            "retries": self.__retries,
+            "failed": self.__failed,
+        }
+
+smtp_pool = SMTPPool(
+    getenv("SMTP_HOST", "smtp.gmail.com"),
+    int(getenv("SMTP_PORT", "587")),
+    int(getenv("SMTP_POOL_SIZE", "2")),
+    getenv("GOOGLE_ACCOUNT"),
+    getenv("GOOGLE_PASSWORD"),
+    getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes"),
+)
+
+mail_queue = MailQueue(
+    smtp_pool,
+    int(getenv("MAIL_WORKERS", "2")),
+    int(getenv("MAIL_MAX_RETRIES", "5")),
+    float(getenv("MAIL_RETRY_BACKOFF", "1")),
+)
@@ -0,0 +1,219 @@
+""" a module to issue and check the otp codes with expiry and resend limits """
+
+import math
+import secrets
+
+from datetime import datetime, timedelta
+from os import getenv
+
+from models.otp_codes_model import OtpCode
+from database.storage_engine import DBStorage
+from utils.create_otp_code import create_otp
+
+class DatabaseOtpBackend:
+    """ a backend keeping the otp codes in the otp_codes table, shared by every worker
+    the expired rows are deleted in batches by the token sweeper
+    """
+
+    def get(self, email_address: str, storage: DBStorage):
+        """ a method to get the otp object of an email
+        Args:
+            email_address: the email the code is sent to
+            storage: the storage of the current request
+        """
+
+        return storage.get_otp_object(email_address).payload
+
+    def attempt(self, otp: OtpCode, max_attempts: int, storage: DBStorage):
+        """ a method to count a check of the code, in one statement so concurrent checks cannot pass the cap
+        Args:
+            otp: the otp object
+            max_attempts: the most checks allowed on one code
+            storage: the storage of the current request
+        Return True when the check is allowed
+        """
+
+        return storage.add_otp_attempt(otp.id, max_attempts).payload
+
+    def save(self, otp: OtpCode, storage: DBStorage):
+        """ a method to save a new or updated otp object
+        Args:
+            otp: the otp object
+            storage: the storage of the current request
+        """
+
+        otp.save(storage)
+
+    def delete(self, otp: OtpCode, storage: DBStorage):
+        """ a method to delete a used otp object
+        Args:
+            otp: the otp object
+            storage: the storage of the current request
+        """
+
+        otp.delete(storage)
+
+class MemoryOtpBackend:
+    """ a backend keeping the otp codes of this worker in a dictionary
+    only suited to a single worker since the codes are not shared between processes
+    """
+
+    def __init__(self):
+        """ the class initializer """
+
+        self.__codes = {}
+        self.__purged_at = datetime.now()
+
+    def __purge(self):
+        """ a method to drop the codes whose resend window is over, at most once a minute """
+
+        now = datetime.now()
+        if now - self.__purged_at < timedelta(minutes=1):
+            return
+
+        for email_address in [email for email, otp in self.__codes.items() if otp.expires_at <= now]:
+            del self.__codes[email_address]
+        self.__purged_at = now
+
+    def get(self, email_address: str, storage: DBStorage):
+        """ a method to get the otp object of an email
+        Args:
+            email_address: the email the code is sent to
+            storage: not used by this backend
+        """
+
+        self.__purge()
+        return self.__codes.get(email_address)
+
+    def attempt(self, otp: OtpCode, max_attempts: int, storage: DBStorage):
+        """ a method to count a check of the code
+        Args:
+            otp: the otp object
+            max_attempts: the most checks allowed on one code
+            storage: not used by this backend
+        Return True when the check is allowed
+        """
+
+        if otp.attempts >= max_attempts:
+            return False
+        otp.attempts += 1
+        return True
+
+    def save(self, otp: OtpCode, storage: DBStorage):
+        """ a method to save a new or updated otp object
+        Args:
+            otp: the otp object
+            storage: not used by this backend
+        """
+
+        self.__codes[otp.email] = otp
+
+    def delete(self, otp: OtpCode, storage: DBStorage):
+        """ a method to delete a used otp object
+        Args:
+            otp: the otp object
+            storage: not used by this backend
+        """
+
+        self.__codes.pop(otp.email, None)
+
+class OtpStore:
+    """ a class which issues the otp codes and checks them against the expiry and resend limits """
+
+    def __init__(self, backend, ttl: float, resend_window: float, resend_limit: int, cooldown: float, max_attempts: int):
+        """ the class initializer
+        Args:
+            backend: the backend holding the codes
+            ttl: the seconds a code stays valid after it is sent
+            resend_window: the seconds over which the sends of an email are counted
+            resend_limit: the most codes sent to an email in any resend window
+            cooldown: the seconds to wait between two sends to the same email
+            max_attempts: the most checks allowed on one code before a new one has to be sent
+        """
+
+        self.__backend = backend
+        self.__ttl = timedelta(seconds=ttl)
+        self.__resend_window = timedelta(seconds=max(resend_window, ttl))
+        self.__resend_limit = resend_limit
+        self.__cooldown = timedelta(seconds=cooldown)
+        self.__max_attempts = max_attempts
+
+    def issue(self, email_address: str, storage: DBStorage):
+        """ a method to create a new code for an email when the resend limits allow it
+        Args:
+            email_address: the email the code is sent to
+            storage: the storage of the current request
+        Return the new code, None when the email has to wait before another code
+        """
+
+        now = datetime.now()
+        code = create_otp()
+
+        otp = self.__backend.get(email_address, storage)
+        if otp is None:
+            otp = OtpCode(email_address, code, now + self.__resend_window)
+        else:
+            # the window rolls with each send so only the sends of the last window are counted
+            window_start = (now - self.__resend_window).timestamp()
+            sends = [sent for sent in otp.sends if sent > window_start]
+            if len(sends) >= self.__resend_limit or now - otp.sent_at < self.__cooldown:
+                return None
+            otp.code = code
+            otp.sends = sends + [now.timestamp()]
+            otp.attempts = 0
+            otp.sent_at = now
+            otp.expires_at = now + self.__resend_window
+
+        self.__backend.save(otp, storage)
+        return code
+
+    def retry_after(self, email_address: str, storage: DBStorage):
+        """ a method to get the seconds an email has to wait before another code can be sent to it
+        Args:
+            email_address: the email the code is sent to
+            storage: the storage of the current request
+        """
+
+        otp = self.__backend.get(email_address, storage)
+        if otp is None:
+            return 0
+
+        now = datetime.now()
+        waits = [(otp.sent_at + self.__cooldown - now).total_seconds()]
+        window_start = (now - self.__resend_window).timestamp()
+        sends = sorted(sent for sent in otp.sends if sent > window_start)
+        if len(sends) >= self.__resend_limit:
+            # the send which has to leave the window before the count is under the limit again
+            leaving = sends[len(sends) - self.__resend_limit]
+            waits.append(leaving + self.__resend_window.total_seconds() - now.timestamp())
+        return max(0, math.ceil(max(waits)))
+
+    def consume(self, email_address: str, code: str, storage: DBStorage):
+        """ a method to check a code sent by the user and delete it once used
+        every check counts against the attempts of the code, a code past them needs a new one to be sent
+        Args:
+            email_address: the email of the user
+            code: the code sent by the user
+            storage: the storage of the current request
+        """
+
+        otp = self.__backend.get(email_address, storage)
+        if otp is None or otp.sent_at <= datetime.now() - self.__ttl:
+            return False
+
+        if not self.__backend.attempt(otp, self.__max_attempts, storage):
+            return False
+        if not secrets.compare_digest(otp.code, code or ""):
+            return False
+
+        self.__backend.delete(otp, storage)
+        return True
+
+otp_store = OtpStore(
+    MemoryOtpBackend() if getenv("OTP_STORE", "db") == "memory" else DatabaseOtpBackend(),
+    float(getenv("OTP_TTL", "600")),
+    float(getenv("OTP_RESEND_WINDOW", "3600")),
+    int(getenv("OTP_RESEND_LIMIT", "3")),
+    float(getenv("OTP_RESEND_COOLDOWN", "60")),
+    int(getenv("OTP_MAX_ATTEMPTS", "5")),
+)
@@ -0,0 +1,103 @@
+""" a module to hash and verify the passwords away from the event loop """
+
+import asyncio
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from os import getenv
+from argon2.exceptions import VerifyMismatchError, VerificationError, InvalidHashError
+
+from utils.check_password import ph
+from utils.responses import function_response
+
+def hash_password(password: str):
+    """ a function to hash a password, run inside the worker processes
+    Args:
+        password: the plain password
+    """
+
+    return ph.hash(password)
+
+def verify_password(hashed: str, password: str):
+    """ a function to verify a password, run inside the worker processes
+    Args:
+        hashed: the stored hash
+        password: the plain password to check
+    Return if the password matches and the new hash when the stored one uses old parameters
+    """
+
+    try:
+        ph.verify(hashed, password)
+    except (VerifyMismatchError, VerificationError, InvalidHashError):
+        return False, None
+
+    return True, ph.hash(password) if ph.check_needs_rehash(hashed) else None
+
+class PasswordService:
+    """ a class which runs the argon2 work on a bounded pool of processes """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        """ the class initializer
+        Args:
+            max_workers: the amount of processes hashing at the same time
+            max_pending: the most hashes waiting for a process before the callers wait in turn
+        """
+
+        self.__max_workers = max_workers
+        self.__max_pending = max_pending
+        self.__executor = None
+        self.__pending = None
+
+    def __pool(self):
+        """ a method to start the process pool on first use """
+
+        if self.__executor is None:
+            # spawn keeps the workers free of the parent sockets and event loop
+            self.__executor = ProcessPoolExecutor(self.__max_workers, mp_context=multiprocessing.get_context("spawn"))
+            self.__pending = asyncio.Semaphore(self.__max_pending)
+        return self.__executor
+
+    async def __run(self, function, *args):
+        """ a method to run a function on the pool without blocking the event loop
+        Args:
+            function: the function to run
+            args: the arguments of the function
+        """
+
+        executor = self.__pool()
+        async with self.__pending:
+            return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+
+    async def hash(self, password: str):
+        """ a method to hash a password
+        Args:
+            password: the plain password
+        """
+
+        return await self.__run(hash_password, password)
+
+    async def verify(self, hashed: str, password: str):
+        """ a method to verify a password against the stored hash
+        Args:
+            hashed: the stored hash
+            password: the plain password to check
+        Return a response with the new hash as payload when the stored one should be replaced
+        """
+
+        if not hashed or not password:
+            return function_response(False)
+
+        matches, new_hash = await self.__run(verify_password, hashed, password)
+        return function_response(matches, new_hash)
+
+    def shutdown(self):
+        """ a method to stop the worker processes """
+
+        if self.__executor is not None:
+            self.__executor.shutdown(cancel_futures=True)
+            self.__executor = None
+
+PASSWORD_WORKERS = int(getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+password_service = PasswordService(PASSWORD_WORKERS, int(getenv("PASSWORD_MAX_PENDING", str(PASSWORD_WORKERS * 8))))
@@ -0,0 +1,122 @@
+""" a module to price the bookings in any currency from one cached table of exchange rates """
+
+from os import getenv
+
+from services.http_client import http_client
+from services.quote_service import QuoteService, QuoteUnavailable
+from utils.booking_price import booking_prices
+from utils.responses import function_response
+
+CURRENCY_API_URL = "https://api.currencyapi.com/v3/latest"
+
+# the booking columns a price is worked out from, loaded even when the client asks for other fields
+PRICING_FIELDS = ("type", "price_usd")
+
+async def fetch_currencyapi_rates():
+    """ a function to get the usd exchange rates of every currency from currencyapi.com
+    the same endpoint the currencyapicom client calls, sent through the shared async http client
+    """
+
+    response = await http_client.get(
+        CURRENCY_API_URL,
+        params={"base_currency": "USD"},
+        headers={"apikey": getenv("CURRENCY_API_KEY") or ""},
+    )
+    response.raise_for_status()
+
+    return {code: float(rate["value"]) for code, rate in response.json()["data"].items()}
+
+class PriceTable:
+    """ a class holding the price of every booking type in every currency for one set of rates """
+
+    def __init__(self, prices: dict, rates: dict):
+        """ the class initializer
+        Args:
+            prices: the usd price of each booking type
+            rates: the amount of each currency one usd buys
+        """
+
+        self.rates = {"USD": 1.0, **{code.upper(): rate for code, rate in rates.items()}}
+        # one row per currency so a request is priced with a single lookup
+        self.prices = {
+            code: {booking_type: round(usd * rate, 2) for booking_type, usd in prices.items()}
+            for code, rate in self.rates.items()
+        }
+
+    def price(self, booking_type: str, currency: str):
+        """ a method to get the price of a booking type
+        Args:
+            booking_type: the type of the booking
+            currency: the code of the currency
+        """
+
+        return self.prices.get(currency.upper(), {}).get(booking_type)
+
+    def convert(self, usd: float, currency: str):
+        """ a method to convert a stored usd price
+        Args:
+            usd: the amount in usd
+            currency: the code of the currency
+        """
+
+        rate = self.rates.get(currency.upper())
+        return None if rate is None or usd is None else round(usd * rate, 2)
+
+class PricingEngine:
+    """ a class which keeps the price table in step with the cached exchange rates """
+
+    def __init__(self, prices: dict, source, ttl: float, max_stale: float):
+        """ the class initializer
+        Args:
+            prices: the usd price of each booking type
+            source: an async function returning the usd exchange rates by currency code
+            ttl: the seconds the rates are used before a refresh
+            max_stale: the seconds old rates are still used while the refresh runs in the background
+        """
+
+        self.__prices = prices
+        self.__rates = QuoteService(source, ttl, max_stale)
+        self.__table = None
+        self.__table_rates = None
+
+    async def table(self):
+        """ a method to get the price table of the current rates, rebuilt only when the rates change """
+
+        rates = await self.__rates.get()
+        if rates is not self.__table_rates:
+            self.__table = PriceTable(self.__prices, rates)
+            self.__table_rates = rates
+        return self.__table
+
+    async def price_bookings(self, bookings: list[dict], currency: str):
+        """ a method to add the price in the requested currency to each booking
+        the stored usd price is converted when present, otherwise the price of the booking type is used
+        Args:
+            bookings: the dictionaries of the bookings
+            currency: the code of the currency
+        Return a failed response when the currency is unknown or no rates could be fetched
+        """
+
+        try:
+            table = await self.table()
+        except QuoteUnavailable:
+            return function_response(False)
+
+        code = currency.upper()
+        if code not in table.rates:
+            return function_response(False)
+
+        for booking in bookings:
+            if booking.get("price_usd") is not None:
+                amount = table.convert(booking["price_usd"], code)
+            else:
+                amount = table.price(booking.get("type"), code)
+            booking.setdefault("price", {})[code.lower()] = amount
+        return function_response(True, bookings)
+
+pricing_engine = PricingEngine(
+    booking_prices,
+    fetch_currencyapi_rates,
+    float(getenv("FX_RATES_TTL", "3600")),
+    float(getenv("FX_RATES_MAX_STALE", "86400")),
+)
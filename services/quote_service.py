@@ -0,0 +1,98 @@
+""" a module to serve the bitcoin price from a cache refreshed in the background """
+
+import asyncio
+
+from datetime import datetime
+from os import getenv
+from time import monotonic
+
+from services.http_client import http_client
+
+COIN_GECKO_URL = "https://api.coingecko.com/api/v3/simple/price?vs_currencies=usd&ids=bitcoin&names=Bitcoin&symbols=btc"
+
+async def fetch_btc_usd():
+    """ a function to get the current bitcoin price in usd from coingecko """
+
+    response = await http_client.get(COIN_GECKO_URL, headers={"x-cg-demo-api-key": getenv("COIN_GECKO_API")})
+    response.raise_for_status()
+
+    return float(response.json().get("bitcoin").get("usd"))
+
+class QuoteUnavailable(Exception):
+    """ the error raised when the upstream fails and no quote younger than max_stale is known """
+
+class QuoteService:
+    """ a class which caches a quote and refreshes it with at most one request in flight """
+
+    def __init__(self, fetcher, ttl: float, max_stale: float):
+        """ the class initializer
+        Args:
+            fetcher: an async function returning the current quote
+            ttl: the seconds a quote is served without a refresh
+            max_stale: the seconds an old quote is still served while the refresh runs in the background
+        """
+
+        self.__fetcher = fetcher
+        self.__ttl = ttl
+        self.__max_stale = max_stale
+        self.__quote = None
+        self.__fetched_at = None
+        self.__quoted_at = None
+        self.__retry_at = 0.0
+        self.__refresh = None
+
+    async def __fetch(self):
+        """ a method to fetch a new quote, keeping the last one when the upstream fails and it is not too old """
+
+        try:
+            quote = await self.__fetcher()
+        except Exception as e:
+            # the background refreshes wait a ttl before asking the failing upstream again
+            self.__retry_at = monotonic() + self.__ttl
+            if self.__quote is None or monotonic() - self.__fetched_at >= self.__max_stale:
+                raise QuoteUnavailable(f"No quote younger than {self.__max_stale} seconds: {e}") from e
+            print(f"The quote could not be refreshed, the last one is kept: {e}")
+            return self.__quote
+
+        self.__quote = quote
+        self.__fetched_at = monotonic()
+        self.__quoted_at = datetime.now()
+        return quote
+
+    @property
+    def quoted_at(self):
+        """ the time the current quote was fetched """
+
+        return self.__quoted_at
+
+    def __start_refresh(self):
+        """ a method to start a refresh unless one is already running """
+
+        if self.__refresh is None or self.__refresh.done():
+            self.__refresh = asyncio.create_task(self.__fetch())
+        return self.__refresh
+
+    async def get(self):
+        """ a method to get the quote
+        a fresh quote is returned as is, a stale one is returned while it is refreshed in the background
+        and the caller only waits when no usable quote is known
+        Raise QuoteUnavailable when that wait fails, a quote older than max_stale is never returned
+        """
+
+        if self.__quote is not None:
+            age = monotonic() - self.__fetched_at
+            if age < self.__ttl:
+                return self.__quote
+            if age < self.__max_stale:
+                if monotonic() >= self.__retry_at:
+                    self.__start_refresh()
+                return self.__quote
+
+        # shield keeps the shared refresh running when this request is cancelled
+        return await asyncio.shield(self.__start_refresh())
+
+quote_service = QuoteService(
+    fetch_btc_usd,
+    float(getenv("QUOTE_TTL", "60")),
+    float(getenv("QUOTE_MAX_STALE", "600")),
+)
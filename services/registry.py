@@ -0,0 +1,74 @@
+""" a module to create the application services on first use instead of at import """
+
+import threading
+
+class ServiceRegistry:
+    """ a class which holds the factories of the services and the instances already created """
+
+    def __init__(self):
+        """ the class initializer """
+
+        self.__factories = {}
+        self.__instances = {}
+        self.__lock = threading.Lock()
+
+    def register(self, name: str, factory):
+        """ a method to register the factory of a service
+        Args:
+            name: the name of the service
+            factory: a callable creating the service
+        """
+
+        self.__factories[name] = factory
+
+    def get(self, name: str):
+        """ a method to get a service, creating it on the first call
+        Args:
+            name: the name of the service
+        """
+
+        instance = self.__instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self.__lock:
+            if name not in self.__instances:
+                self.__instances[name] = self.__factories[name]()
+            return self.__instances[name]
+
+    def startup(self, names: list[str]):
+        """ a method to create some services ahead of the first request, used by the lifespan
+        Args:
+            names: the names of the services to create
+        """
+
+        for name in names:
+            self.get(name)
+
+    def initialized(self):
+        """ a method to get the names of the services created so far """
+
+        return list(self.__instances)
+
+class LazyService:
+    """ a stand in for a module level service which creates it on the first attribute access """
+
+    def __init__(self, registry: ServiceRegistry, name: str):
+        """ the class initializer
+        Args:
+            registry: the registry holding the service
+            name: the name of the service
+        """
+
+        self.__registry = registry
+        self.__name = name
+
+    def __getattr__(self, attribute: str):
+        """ a method to get an attribute of the real service
+        Args:
+            attribute: the name of the attribute
+        """
+
+        return getattr(self.__registry.get(self.__name), attribute)
+
+services = ServiceRegistry()
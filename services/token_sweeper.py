@@ -0,0 +1,50 @@
+""" a module to delete the expired refresh tokens, revocations and otp codes in the background """
+
+import asyncio
+
+from os import getenv
+from sqlalchemy.orm import sessionmaker
+
+from models.refresh_token_model import RefreshToken, AgentRefresh
+from models.revoked_token_model import RevokedToken
+from models.otp_codes_model import OtpCode
+from database.storage_engine import DBStorage
+
+TOKEN_SWEEP_INTERVAL = float(getenv("TOKEN_SWEEP_INTERVAL", "300"))
+TOKEN_SWEEP_BATCH_SIZE = int(getenv("TOKEN_SWEEP_BATCH_SIZE", "500"))
+
+def sweep_expired_tokens(session_factory: sessionmaker, batch_size: int):
+    """ a function to delete every expired token one small transaction at a time
+    Args:
+        session_factory: the factory of the sessions to delete with
+        batch_size: the most rows deleted in one transaction
+    Return the amount of rows deleted
+    """
+
+    storage = DBStorage(session_factory())
+    deleted = 0
+    try:
+        for model in (RefreshToken, AgentRefresh, RevokedToken, OtpCode):
+            while True:
+                count = storage.delete_expired(model, batch_size)
+                deleted += count
+                if count < batch_size:
+                    break
+    finally:
+        storage.close()
+    return deleted
+
+async def run_token_sweeper(session_factory: sessionmaker, interval: float, batch_size: int):
+    """ a function to sweep the expired tokens every interval until the application stops
+    Args:
+        session_factory: the factory of the sessions to delete with
+        interval: the seconds between two sweeps
+        batch_size: the most rows deleted in one transaction
+    """
+
+    while True:
+        try:
+            await asyncio.to_thread(sweep_expired_tokens, session_factory, batch_size)
+        except Exception as e:
+            print(f"The expired tokens could not be swept: {e}")
+        await asyncio.sleep(interval)
@@ -1,7 +1,16 @@
+import asyncio
 import dotenv
 
 dotenv.load_dotenv()
 
+from services.http_client import http_client
 from utils.booking_price import price_converter
 
-price_converter("oo")
\ No newline at end of file
+async def main():
+    try:
+        print(await price_converter("One-Time"))
+    finally:
+        await http_client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+""" the shared fixtures of the test suite, every test runs against a throw away sqlite database """
+
+import os
+import sys
+import tempfile
+
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# the application reads its settings at import so they are set before anything is imported
+TEST_DIR = tempfile.mkdtemp(prefix="celeb_connect_")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DIR}/test.db"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{TEST_DIR}/test.db"
+os.environ["MEDIA_ROOT"] = f"{TEST_DIR}/media"
+os.environ["JWT_ACCESS_KEY"] = "test-access-key-for-the-suite-only-000"
+os.environ["JWT_REFRESH_KEY"] = "test-refresh-key-for-the-suite-only-000"
+os.environ["DB_POOL_WARM"] = "0"
+
+import pytest
+
+from fastapi.testclient import TestClient
+
+@pytest.fixture
+def engine():
+    """ the sqlite engine of the application with every table created """
+
+    from middlewares.session_middleware import engine
+    from models.base_model import Base
+    from utils.create_all_tables import create_tables
+
+    create_tables()
+    yield engine
+    Base.metadata.drop_all(engine)
+
+@pytest.fixture
+def session_factory(engine):
+    """ the sessionmaker the application uses for each request """
+
+    from middlewares.session_middleware import SessionLocal
+
+    return SessionLocal
+
+@pytest.fixture
+def storage(session_factory):
+    """ a storage on its own session, closed after the test """
+
+    from database.storage_engine import DBStorage
+
+    storage = DBStorage(session_factory())
+    yield storage
+    storage.close()
+
+@pytest.fixture
+def seeded(storage):
+    """ one admin, user, agent and celebrity saved to the database """
+
+    from models.admin_model import Admin
+    from models.user import User
+    from models.agent_model import Agent
+    from models.celebrity_model import Celeb
+
+    admin = Admin()
+    admin.name, admin.email, admin.password = "admin", "admin@gmail.com", "password"
+    storage.save(admin)
+
+    user = User("first", "last", "user@gmail.com", datetime(2000, 1, 1), "password", "08000000000")
+    storage.save(user)
+
+    agent = Agent("agent", "agent@gmail.com", "password")
+    agent.admin_id = admin.id
+    storage.save(agent)
+
+    celeb = Celeb("celeb", "lagos", "singer")
+    celeb.agent_id = agent.id
+    storage.save(celeb)
+
+    return {"admin": admin, "user": user, "agent": agent, "celeb": celeb}
+
+@pytest.fixture
+def replica_engine(engine, tmp_path):
+    """ a second sqlite database standing in for a read replica, holding one agent the primary does not have """
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from models.base_model import Base
+    from models.agent_model import Agent
+
+    replica = create_engine(f"sqlite:///{tmp_path}/replica.db")
+    Base.metadata.create_all(replica)
+    with Session(replica) as session:
+        agent = Agent("replica agent", "replica@gmail.com", "password")
+        agent.admin_id = "admin"
+        session.add(agent)
+        session.commit()
+    yield replica
+    replica.dispose()
+
+@pytest.fixture
+def client(engine):
+    """ a test client of the application, the lifespan is not run """
+
+    from main import app
+
+    return TestClient(app)
+
+def access_cookies(principal, role: str):
+    """ a function to get the cookies of a logged in principal
+    Args:
+        principal: the user, agent or admin
+        role: either user, agent or admin
+    """
+
+    from utils.cookie_token import token_manager
+
+    return {"access_token": token_manager.create_access_token(principal, role).payload["access_token"]}
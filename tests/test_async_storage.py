@@ -0,0 +1,119 @@
+""" the tests of the awaitable storages used by the read only route getters """
+
+import asyncio
+import os
+
+import pytest
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from database.async_storage_engine import AsyncDBStorage, ThreadedDBStorage
+from database.storage_engine import LazyDBStorage
+from tests.conftest import access_cookies
+
+def run_async(coroutine_function):
+    """ a function to run a test coroutine against an aiosqlite engine on the test database """
+
+    async def main():
+        async_engine = create_async_engine(os.environ["ASYNC_DATABASE_URL"])
+        try:
+            return await coroutine_function(async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False))
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(main())
+
+def test_async_storage_getters_match_the_sync_storage(seeded, storage):
+    user, celeb, agent = seeded["user"], seeded["celeb"], seeded["agent"]
+    storage.create_booking(celeb.id, user.id, "MONDAY", "One-Time")
+
+    async def check(session_factory):
+        async_storage = AsyncDBStorage(session_factory)
+        try:
+            user_response = await async_storage.get_user_by_id(user.id)
+            celebs_response = await async_storage.get_celebrities(agent.id, 10, 0)
+            bookings_response = await async_storage.get_booking(None, 10, 0, user_id=user.id)
+            return user_response, celebs_response, bookings_response
+        finally:
+            await async_storage.close()
+
+    user_response, celebs_response, bookings_response = run_async(check)
+
+    assert user_response.status and user_response.payload.email == user.email
+    assert [item["id"] for item in celebs_response.payload] == [celeb.id]
+    assert bookings_response.payload == storage.get_booking(None, 10, 0, user_id=user.id).payload
+
+def test_async_storage_reads_from_the_replicas(seeded, replica_engine):
+    from database.replicas import ReplicaRouter
+    from models.admin_model import Admin
+
+    admin = Admin()
+    admin.name, admin.email, admin.password = "second", "second@gmail.com", "password"
+
+    async def check(session_factory):
+        replica = create_async_engine(str(replica_engine.url).replace("sqlite://", "sqlite+aiosqlite://"))
+        async_storage = AsyncDBStorage(session_factory, ReplicaRouter([replica.sync_engine]))
+        try:
+            read = await async_storage.get_agents(0, 10)
+            await async_storage.save(admin)
+            after_write = await async_storage.get_agents(0, 10)
+            return read, after_write
+        finally:
+            await async_storage.close()
+            await replica.dispose()
+
+    read, after_write = run_async(check)
+
+    assert [item["name"] for item in read.payload] == ["replica agent"]
+    assert [item["name"] for item in after_write.payload] == ["agent"]
+
+def test_async_storage_opens_no_session_until_called(engine):
+    opened = []
+
+    def factory():
+        opened.append(True)
+        raise AssertionError("the session should not be opened")
+
+    async def unused():
+        await AsyncDBStorage(factory).close()
+
+    asyncio.run(unused())
+    assert opened == []
+
+def test_private_methods_are_not_exposed(engine):
+    with pytest.raises(AttributeError):
+        AsyncDBStorage(None)._DBStorage__reader
+    with pytest.raises(AttributeError):
+        ThreadedDBStorage(None).not_a_method
+
+def test_threaded_storage_runs_the_sync_storage_off_the_loop(seeded, session_factory):
+    import threading
+
+    lazy = LazyDBStorage(session_factory)
+    loop_thread = threading.get_ident()
+    threads = []
+
+    original = lazy.get_user_by_id
+
+    def spy(user_id):
+        threads.append(threading.get_ident())
+        return original(user_id)
+
+    lazy.__dict__["get_user_by_id"] = spy
+
+    async def check():
+        return await ThreadedDBStorage(lazy).get_user_by_id(seeded["user"].id)
+
+    response = asyncio.run(check())
+    lazy.close()
+
+    assert response.payload.id == seeded["user"].id
+    assert threads and threads[0] != loop_thread
+
+def test_routes_read_through_the_awaitable_storage(seeded, client):
+    client.cookies.update(access_cookies(seeded["user"], "user"))
+
+    response = client.get("/user/bookings/count")
+
+    assert response.status_code == 200
+    assert response.json()["data"] == {"total": 0, "success": 0, "pending": 0}
@@ -0,0 +1,78 @@
+""" the tests of pricing a booking when it is made """
+
+import asyncio
+
+import pytest
+
+from sqlalchemy import event
+
+from services.quote_service import quote_service, QuoteUnavailable
+from tests.conftest import access_cookies
+from utils.booking_price import price_converter
+
+def test_the_price_is_converted_with_the_quote(monkeypatch):
+    async def get():
+        return 50000.0
+
+    monkeypatch.setattr(quote_service, "get", get)
+
+    price = asyncio.run(price_converter("One-Time"))
+    assert price["usd"] == 4372 and price["btc"] == round(4372 / 50000, 8)
+
+def test_the_btc_price_is_left_empty_without_a_quote(monkeypatch):
+    async def get():
+        raise QuoteUnavailable("down")
+
+    monkeypatch.setattr(quote_service, "get", get)
+
+    assert asyncio.run(price_converter("One-Time")) == {"usd": 4372, "btc": None, "quoted_at": None}
+
+@pytest.fixture
+def quotes(monkeypatch):
+    """ the bitcoin quotes served to the route, the quote is unavailable when the list holds an error """
+
+    served = []
+
+    async def get():
+        served.append(True)
+        if isinstance(served[0], Exception):
+            raise served[0]
+        return 43720.0
+
+    monkeypatch.setattr(quote_service, "get", get)
+    return served
+
+def book(client, user, celeb_id: str):
+    client.cookies.update(access_cookies(user, "user"))
+    return client.post(f"/user/{celeb_id}/book", json={"day": "MONDAY", "type": "One-Time"})
+
+def test_a_missing_celebrity_is_rejected_before_pricing(client, seeded, quotes):
+    response = book(client, seeded["user"], "missing")
+
+    assert response.json()["message"] == "No celebrity found with the provided id"
+    assert quotes == []
+
+def test_a_booking_stores_its_price(client, seeded, storage, quotes):
+    assert book(client, seeded["user"], seeded["celeb"].id).json()["status"]
+
+    booking = storage.get_booking(None, 10, 0, user_id=seeded["user"].id).payload[0]
+    assert booking["price_usd"] == 4372 and booking["price_btc"] == 0.1
+
+def test_a_booking_looks_the_celebrity_up_once(client, seeded, engine, quotes):
+    statements = []
+    capture = lambda connection, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        assert book(client, seeded["user"], seeded["celeb"].id).json()["status"]
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert len([statement for statement in statements if "FROM celebs" in statement]) == 1
+
+def test_a_booking_without_a_quote_is_kept_for_the_backfill(client, seeded, storage, quotes):
+    quotes.append(QuoteUnavailable("down"))
+
+    assert book(client, seeded["user"], seeded["celeb"].id).json()["status"]
+
+    booking = storage.get_booking(None, 10, 0, user_id=seeded["user"].id).payload[0]
+    assert booking["price_usd"] == 4372 and booking["price_btc"] is None
@@ -0,0 +1,119 @@
+""" the tests of the per user booking counters kept by the after_flush listener """
+
+import threading
+
+import pytest
+
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+import models.booking_model
+from models.booking_model import Status, UserBookingStats, update_booking_stats
+
+@pytest.fixture
+def counters(engine, monkeypatch):
+    """ the booking counters turned on as with BOOKING_STATS_COUNTERS=true """
+
+    monkeypatch.setattr(models.booking_model, "BOOKING_STATS_COUNTERS", True)
+    event.listen(Session, "after_flush", update_booking_stats)
+    yield
+    event.remove(Session, "after_flush", update_booking_stats)
+
+def stats_of(session_factory, user_id: str):
+    """ a function to read the counters of a user on a fresh session, None when they have no row """
+
+    with session_factory() as session:
+        stats = session.get(UserBookingStats, user_id)
+        if stats is None:
+            return None
+        return {"total": stats.total, "approved": stats.approved, "pending": stats.pending,
+                "cancelled": stats.cancelled, "paid": stats.paid}
+
+def counts(total=0, approved=0, pending=0, cancelled=0, paid=0):
+    return {"total": total, "approved": approved, "pending": pending, "cancelled": cancelled, "paid": paid}
+
+def test_the_first_booking_of_a_user_creates_the_counters(counters, seeded, storage, session_factory):
+    user, celeb = seeded["user"], seeded["celeb"]
+    assert stats_of(session_factory, user.id) is None
+
+    storage.create_booking(celeb.id, user.id, "MONDAY", "One-Time")
+    storage.create_booking(celeb.id, user.id, "TUESDAY", "One-Time")
+
+    assert stats_of(session_factory, user.id) == counts(total=2, pending=2)
+
+def test_a_status_change_moves_the_booking_between_counters(counters, seeded, storage, session_factory):
+    user, celeb = seeded["user"], seeded["celeb"]
+    booking = storage.create_booking(celeb.id, user.id, "MONDAY", "One-Time").payload
+
+    booking.status = Status.APPROVED
+    storage.save(booking)
+
+    assert stats_of(session_factory, user.id) == counts(total=1, approved=1)
+
+def test_a_deleted_booking_is_taken_off_the_counters(counters, seeded, storage, session_factory):
+    user, celeb = seeded["user"], seeded["celeb"]
+    kept = storage.create_booking(celeb.id, user.id, "MONDAY", "One-Time").payload
+    removed = storage.create_booking(celeb.id, user.id, "TUESDAY", "One-Time").payload
+    kept.status = Status.PAID
+    storage.save(kept)
+
+    storage.delete(removed)
+
+    assert stats_of(session_factory, user.id) == counts(total=1, paid=1)
+
+def test_the_counters_match_the_group_by_count(counters, seeded, storage, monkeypatch):
+    user, celeb = seeded["user"], seeded["celeb"]
+    for day, status in [("MONDAY", Status.APPROVED), ("TUESDAY", None), ("FRIDAY", Status.CANCELLED), ("SUNDAY", None)]:
+        booking = storage.create_booking(celeb.id, user.id, day, "One-Time").payload
+        if status:
+            booking.status = status
+            storage.save(booking)
+
+    from_counters = storage.get_user_bookings_info(user.id).payload
+    monkeypatch.setattr(models.booking_model, "BOOKING_STATS_COUNTERS", False)
+    from_group_by = storage.get_user_bookings_info(user.id).payload
+
+    assert from_counters == from_group_by == {"total": 4, "success": 1, "pending": 2}
+
+def test_concurrent_first_bookings_are_all_counted(counters, seeded, session_factory):
+    from database.storage_engine import DBStorage
+
+    user, celeb = seeded["user"], seeded["celeb"]
+    start = threading.Barrier(4)
+    errors = []
+
+    def book():
+        storage = DBStorage(session_factory())
+        try:
+            start.wait()
+            for _ in range(5):
+                storage.create_booking(celeb.id, user.id, "MONDAY", "One-Time")
+        except Exception as e:
+            errors.append(e)
+        finally:
+            storage.close()
+
+    threads = [threading.Thread(target=book) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert stats_of(session_factory, user.id) == counts(total=20, pending=20)
+
+def test_the_rebuild_repairs_wrong_counters(counters, seeded, storage, session_factory):
+    from utils.rebuild_booking_stats import rebuild_booking_stats
+
+    user, celeb = seeded["user"], seeded["celeb"]
+    booking = storage.create_booking(celeb.id, user.id, "MONDAY", "One-Time").payload
+    booking.status = Status.APPROVED
+    storage.save(booking)
+    storage.create_booking(celeb.id, user.id, "TUESDAY", "One-Time")
+
+    with session_factory() as session:
+        session.execute(update(UserBookingStats).values(total=9, approved=0, pending=7))
+        session.commit()
+    rebuild_booking_stats()
+
+    assert stats_of(session_factory, user.id) == counts(total=2, approved=1, pending=1)
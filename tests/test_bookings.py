@@ -0,0 +1,22 @@
+""" the tests of making bookings through DBStorage """
+
+from sqlalchemy import event
+
+def test_create_booking_does_not_load_the_celebrity_bookings(seeded, storage, engine):
+    celeb, user = seeded["celeb"], seeded["user"]
+    for _ in range(3):
+        storage.create_booking(celeb.id, user.id, "MONDAY", "One-Time")
+
+    statements = []
+    capture = lambda connection, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        booking = storage.create_booking(celeb.id, user.id, "TUESDAY", "One-Time")
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert booking.status and booking.payload.celeb_id == celeb.id
+    assert not [statement for statement in statements if statement.startswith("SELECT") and "FROM bookings" in statement]
+
+def test_create_booking_for_a_missing_celebrity(seeded, storage):
+    assert not storage.create_booking("missing", seeded["user"].id, "MONDAY", "One-Time").status
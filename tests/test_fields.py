@@ -0,0 +1,36 @@
+""" the tests of the sparse fieldsets of the listing endpoints """
+
+from utils.fields import parse_fields
+from tests.conftest import access_cookies
+
+def test_parse_fields_splits_and_trims_the_names():
+    assert parse_fields(" name , email,,") == ["name", "email"]
+    assert parse_fields("") is None and parse_fields(" , ") is None and parse_fields(None) is None
+
+def test_only_the_requested_columns_are_selected(seeded, storage):
+    users = storage.get_users_for_admin(10, 0, fields=["email", "level"]).payload
+
+    assert users == [{
+        "id": seeded["user"].id,
+        "created_at": str(seeded["user"].created_at),
+        "email": "user@gmail.com",
+        "level": seeded["user"].level,
+    }]
+
+def test_secrets_are_never_selected_even_when_asked_for(seeded, storage):
+    users = storage.get_users_for_admin(10, 0, fields=["email", "password", "refresh_token", "not_a_column"]).payload
+    agents = storage.get_agents(0, 10, fields=["name", "password"]).payload
+
+    assert set(users[0]) == {"id", "created_at", "email"}
+    assert set(agents[0]) == {"id", "created_at", "name"}
+
+def test_the_routes_return_the_requested_fields_without_secrets(seeded, client):
+    client.cookies.update(access_cookies(seeded["admin"], "admin"))
+
+    users = client.get("/admin/users", params={"fields": "email,password,refresh_token"}).json()["data"]
+    agents = client.get("/admin/agents", params={"fields": "name,password"}).json()["data"]
+    full = client.get("/admin/agents").json()["data"]
+
+    assert [set(item) for item in users] == [{"id", "created_at", "email"}]
+    assert [set(item) for item in agents] == [{"id", "created_at", "name", "profile_image"}]
+    assert "password" not in full[0] and full[0]["email"] == "agent@gmail.com"
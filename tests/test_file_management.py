@@ -0,0 +1,137 @@
+""" the tests of streaming the profile images into the content addressed store """
+
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+
+from starlette.datastructures import UploadFile
+
+import services.file_management
+from services.file_management import FileManager
+
+PNG = b"\x89PNG\r\n\x1a\n"
+
+def upload(data: bytes, name: str = "image.png"):
+    return UploadFile(io.BytesIO(data), filename=name)
+
+class BrokenStream(io.BytesIO):
+    """ a request body which is cut off after its first read """
+
+    def read(self, size=-1):
+        if self.tell():
+            raise ConnectionError("the client went away")
+        return super().read(size)
+
+@pytest.fixture
+def file_manager(engine, tmp_path, monkeypatch):
+    """ a file manager on its own media folder """
+
+    monkeypatch.setenv("MEDIA_ROOT", str(tmp_path))
+    return FileManager()
+
+def stored_files(file_manager):
+    return sorted(
+        os.path.join(folder, name)
+        for folder, _, names in os.walk(file_manager.media_path) for name in names
+    )
+
+def test_an_image_is_stored_under_its_sha256(file_manager, storage):
+    data = PNG + os.urandom(200 * 1024)
+
+    response = asyncio.run(file_manager.save_image(upload(data), storage))
+
+    key = f"{hashlib.sha256(data).hexdigest()}.png"
+    assert response.status and response.payload["location"] == key
+    with open(file_manager.path_of(key), "rb") as stored:
+        assert stored.read() == data
+    assert stored_files(file_manager) == [file_manager.path_of(key)]
+
+def test_an_upload_over_the_cap_is_refused_without_leftovers(file_manager, storage, monkeypatch):
+    monkeypatch.setattr(services.file_management, "MAX_UPLOAD_BYTES", 100 * 1024)
+
+    response = asyncio.run(file_manager.save_image(upload(PNG + os.urandom(300 * 1024)), storage))
+
+    assert not response.status and "larger than" in response.payload
+    assert stored_files(file_manager) == []
+
+def test_a_file_which_is_not_an_image_is_refused(file_manager, storage):
+    response = asyncio.run(file_manager.save_image(upload(b"GIF89a" + os.urandom(1024), "image.png"), storage))
+
+    assert not response.status
+    assert stored_files(file_manager) == []
+
+def test_a_cut_off_upload_leaves_no_partial_file(file_manager, storage, monkeypatch):
+    monkeypatch.setattr(services.file_management, "UPLOAD_CHUNK_BYTES", 1024)
+    broken = UploadFile(BrokenStream(PNG + os.urandom(10 * 1024)), filename="image.png")
+
+    response = asyncio.run(file_manager.save_image(broken, storage))
+
+    assert not response.status
+    assert stored_files(file_manager) == []
+
+def media_row(key: str):
+    """ a function to get the reference count of a stored image, None when it has no row """
+
+    from sqlalchemy import select
+    from middlewares.session_middleware import SessionLocal
+    from models.media_model import MediaFile
+
+    with SessionLocal() as session:
+        return session.execute(select(MediaFile.refcount).where(MediaFile.key == key)).scalar_one_or_none()
+
+def test_a_failed_placement_gives_the_reference_back(file_manager, storage, monkeypatch):
+    data = PNG + os.urandom(1024)
+    key = f"{hashlib.sha256(data).hexdigest()}.png"
+
+    def failing_replace(source, destination):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(services.file_management.os, "replace", failing_replace)
+    response = asyncio.run(file_manager.save_image(upload(data), storage))
+
+    assert not response.status
+    assert media_row(key) is None
+    assert stored_files(file_manager) == []
+
+def test_a_shared_image_is_removed_with_its_last_reference(file_manager, storage):
+    data = PNG + os.urandom(1024)
+    key = asyncio.run(file_manager.save_image(upload(data), storage)).payload["location"]
+    assert asyncio.run(file_manager.save_image(upload(data), storage)).payload["deduplicated"]
+
+    asyncio.run(file_manager.delete_image(key, storage))
+    assert os.path.exists(file_manager.path_of(key)) and media_row(key) == 1
+
+    asyncio.run(file_manager.delete_image(key, storage))
+    assert not os.path.exists(file_manager.path_of(key)) and media_row(key) is None
+
+def test_an_upload_during_the_last_delete_stores_the_file_again(file_manager, storage, session_factory):
+    import threading
+    import time
+
+    from database.storage_engine import DBStorage
+
+    data = PNG + os.urandom(1024)
+    key = asyncio.run(file_manager.save_image(upload(data), storage)).payload["location"]
+    results = []
+
+    def concurrent_upload():
+        other = DBStorage(session_factory())
+        results.append(asyncio.run(file_manager.save_image(upload(data), other)))
+        other.close()
+
+    def remove_while_an_upload_starts():
+        thread = threading.Thread(target=concurrent_upload)
+        thread.start()
+        # the upload waits on the locked row instead of counting on the file being removed
+        time.sleep(0.3)
+        os.remove(file_manager.path_of(key))
+        results.append(thread)
+
+    storage.release_media_reference(key, remove_while_an_upload_starts)
+    results[0].join()
+
+    assert results[1].status and not results[1].payload["deduplicated"]
+    assert os.path.exists(file_manager.path_of(key)) and media_row(key) == 1
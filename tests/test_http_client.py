@@ -0,0 +1,132 @@
+""" the tests of the pooled http client and its circuit breakers against a local stub server """
+
+import asyncio
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+
+import pytest
+
+from services.http_client import HttpClient, CircuitBreaker, CircuitOpenError
+
+RESET = 0.2
+
+class StubHandler(BaseHTTPRequestHandler):
+    """ answers /ok with 200, /fail with 500 and /slow after a second """
+
+    def do_GET(self):
+        if self.path == "/slow":
+            sleep(1)
+        self.send_response(500 if self.path == "/fail" else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+def run(calls):
+    """ a function to run some calls on a new client with a circuit opened after 2 failures """
+
+    async def main():
+        client = HttpClient(10, 5, 5, 5, 2, failure_threshold=2, reset_timeout=RESET)
+        try:
+            return await calls(client)
+        finally:
+            await client.close()
+
+    return asyncio.run(main())
+
+async def open_circuit(client, stub):
+    for _ in range(2):
+        await client.get(f"{stub}/fail")
+    with pytest.raises(CircuitOpenError):
+        await client.get(f"{stub}/ok")
+    await asyncio.sleep(RESET)
+
+def test_a_successful_trial_closes_the_circuit(stub):
+    async def calls(client):
+        await open_circuit(client, stub)
+        assert (await client.get(f"{stub}/ok")).status_code == 200
+        return client.stats()
+
+    assert run(calls)["127.0.0.1"]["circuit"] == "closed"
+
+def test_a_failed_trial_opens_the_circuit_again(stub):
+    async def calls(client):
+        await open_circuit(client, stub)
+        await client.get(f"{stub}/fail")
+        with pytest.raises(CircuitOpenError):
+            await client.get(f"{stub}/ok")
+
+    run(calls)
+
+def test_only_one_trial_runs_at_a_time(stub):
+    async def calls(client):
+        await open_circuit(client, stub)
+        trial = asyncio.create_task(client.get(f"{stub}/slow"))
+        await asyncio.sleep(0.1)
+        with pytest.raises(CircuitOpenError):
+            await client.get(f"{stub}/ok")
+        assert (await trial).status_code == 200
+
+    run(calls)
+
+def test_a_cancelled_trial_gives_the_slot_back(stub):
+    async def calls(client):
+        await open_circuit(client, stub)
+        trial = asyncio.create_task(client.get(f"{stub}/slow"))
+        await asyncio.sleep(0.1)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert (await client.get(f"{stub}/ok")).status_code == 200
+
+    run(calls)
+
+def test_a_trial_which_never_reached_the_host_gives_the_slot_back(stub):
+    async def calls(client):
+        await open_circuit(client, stub)
+        # the body cannot be encoded so the call fails before anything is sent
+        with pytest.raises(TypeError):
+            await client.request("POST", f"{stub}/ok", json=object())
+        assert (await client.get(f"{stub}/ok")).status_code == 200
+
+    run(calls)
+
+def test_a_call_started_before_the_circuit_opened_cannot_free_the_trial_slot(stub):
+    async def calls(client):
+        earlier = asyncio.create_task(client.get(f"{stub}/slow"))
+        await asyncio.sleep(0.05)
+        await open_circuit(client, stub)
+        trial = asyncio.create_task(client.get(f"{stub}/slow"))
+        await asyncio.sleep(0.1)
+
+        earlier.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await earlier
+        with pytest.raises(CircuitOpenError):
+            await client.get(f"{stub}/ok")
+        assert (await trial).status_code == 200
+
+    run(calls)
+
+def test_a_call_started_before_the_circuit_opened_failing_keeps_the_trial_running(stub):
+    breaker = CircuitBreaker(2, RESET)
+    assert breaker.allow() == (True, False)
+    breaker.record_failure()
+    breaker.record_failure()
+    sleep(RESET)
+
+    assert breaker.allow() == (True, True)
+    # the call let through while closed fails after the trial started
+    breaker.record_failure()
+    sleep(RESET)
+    assert breaker.allow() == (False, False)
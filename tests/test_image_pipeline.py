@@ -0,0 +1,93 @@
+""" the tests of making the resized and webp copies of the profile images """
+
+import asyncio
+import io
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from PIL import Image
+from starlette.datastructures import UploadFile
+
+import services.image_pipeline
+from services.file_management import FileManager
+from services.image_pipeline import ImagePipeline, VARIANT_SIZES
+
+def png_upload(color: tuple):
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), color).save(buffer, "PNG")
+    buffer.seek(0)
+    return UploadFile(buffer, filename="image.png")
+
+@pytest.fixture
+def file_manager(engine, tmp_path, monkeypatch):
+    """ a file manager on its own media folder, used by the pipeline too """
+
+    monkeypatch.setenv("MEDIA_ROOT", str(tmp_path))
+    file_manager = FileManager()
+    monkeypatch.setattr(services.image_pipeline, "file_manager", file_manager)
+    return file_manager
+
+def copies_of(file_manager, key: str):
+    folder = os.path.dirname(file_manager.path_of(key))
+    stem = key.split(".")[0]
+    return sorted(name for name in os.listdir(folder) if name.startswith(f"{stem}_")) if os.path.isdir(folder) else []
+
+def set_profile(storage, profile, key: str):
+    profile.profile_url = key
+    storage.save(profile)
+
+def test_a_render_finishing_after_the_last_delete_removes_its_copies(file_manager, storage, seeded, session_factory, monkeypatch):
+    from models.celebrity_model import Celeb
+
+    celeb = seeded["celeb"]
+    key = asyncio.run(file_manager.save_image(png_upload((200, 10, 10)), storage)).payload["location"]
+    set_profile(storage, celeb, key)
+    render = services.image_pipeline.render_variants
+
+    def render_then_delete(path, sizes, webp_quality):
+        variants = render(path, sizes, webp_quality)
+        # the profile image is replaced and its last reference dropped while the copies were made
+        asyncio.run(file_manager.delete_image(key, storage))
+        return variants
+
+    monkeypatch.setattr(services.image_pipeline, "render_variants", render_then_delete)
+    pipeline = ImagePipeline(1, VARIANT_SIZES, 80)
+    pipeline._ImagePipeline__executor = ThreadPoolExecutor(1)
+    pipeline.start(session_factory)
+
+    async def run():
+        pipeline.submit(Celeb, celeb.id, key)
+        await pipeline.drain()
+        await pipeline.stop()
+
+    asyncio.run(run())
+
+    assert pipeline.stats()["done"] == 1
+    assert not os.path.exists(file_manager.path_of(key))
+    assert copies_of(file_manager, key) == []
+    with session_factory() as session:
+        assert session.get(Celeb, celeb.id).profile_variants is None
+
+def test_the_backfill_makes_the_copies_of_the_stored_images_only(file_manager, storage, seeded, session_factory):
+    from models.agent_model import Agent
+    from models.celebrity_model import Celeb
+    from utils.backfill_profile_variants import backfill_profile_variants
+
+    celeb, agent = seeded["celeb"], seeded["agent"]
+    key = asyncio.run(file_manager.save_image(png_upload((10, 200, 10)), storage)).payload["location"]
+    set_profile(storage, celeb, key)
+    # an image of the flat folders saved before the store has no row and is left alone
+    set_profile(storage, agent, "legacy.png")
+
+    submitted, _ = asyncio.run(backfill_profile_variants(10))
+
+    assert submitted == 1
+    with session_factory() as session:
+        variants = session.get(Celeb, celeb.id).profile_variants
+        assert session.get(Agent, agent.id).profile_variants is None
+    assert sorted(variants) == ["medium", "medium_webp", "thumb", "thumb_webp", "webp"]
+    assert copies_of(file_manager, key) == sorted(variants.values())
+    assert storage.get_profiles_without_variants(Celeb, None, 10) == []
@@ -0,0 +1,73 @@
+""" the tests of the login throttle on the memory and redis backends """
+
+import asyncio
+
+import fakeredis
+import pytest
+
+import utils.login_throttle
+from utils.login_throttle import LoginThrottle, MemoryThrottleBackend, RedisThrottleBackend
+
+WINDOW = 300
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ a clock the throttle reads, starting at the beginning of a window """
+
+    now = [WINDOW * 1000.0]
+    monkeypatch.setattr(utils.login_throttle, "time", lambda: now[0])
+    return now
+
+@pytest.fixture(params=["memory", "redis"])
+def throttle(request, clock):
+    """ a throttle allowing 3 attempts per account and address, 10 per address and 6 per account """
+
+    if request.param == "memory":
+        backend = MemoryThrottleBackend(WINDOW)
+    else:
+        backend = RedisThrottleBackend(fakeredis.FakeAsyncRedis(), WINDOW)
+    return LoginThrottle(backend, 3, 10, 6)
+
+def attempts(throttle, count: int, email: str = "victim@gmail.com", ip: str = "10.0.0.1"):
+    async def run():
+        return [await throttle.allow("user", email, ip) for _ in range(count)]
+
+    return asyncio.run(run())
+
+def test_attempts_past_the_limit_are_rejected(throttle):
+    assert attempts(throttle, 4) == [True, True, True, False]
+
+def test_rejected_attempts_are_not_counted(throttle, clock):
+    attempts(throttle, 3)
+    attempts(throttle, 50)
+
+    # halfway through the next window half of the 3 allowed attempts are still counted
+    clock[0] += WINDOW * 1.5
+    assert attempts(throttle, 3) == [True, True, False]
+
+def test_an_address_cannot_lock_the_account_out_for_others(throttle):
+    assert attempts(throttle, 4, ip="10.0.0.66") == [True, True, True, False]
+
+    assert attempts(throttle, 1, ip="10.0.0.1") == [True]
+
+def test_the_address_limit_covers_every_account(throttle):
+    results = [attempts(throttle, 1, email=f"user{number}@gmail.com")[0] for number in range(11)]
+
+    assert results == [True] * 10 + [False]
+
+def test_a_successful_login_clears_the_account(throttle):
+    attempts(throttle, 3)
+    asyncio.run(throttle.succeeded("user", "Victim@gmail.com", "10.0.0.1"))
+
+    assert attempts(throttle, 1) == [True]
+
+def test_guesses_spread_over_many_addresses_reach_the_account_limit(throttle):
+    results = [attempts(throttle, 3, ip=f"10.0.1.{number}") for number in range(3)]
+
+    assert results == [[True, True, True], [True, True, True], [False, False, False]]
+
+def test_concurrent_attempts_cannot_pass_the_limit(throttle):
+    async def run():
+        return await asyncio.gather(*[throttle.allow("user", "victim@gmail.com", "10.0.0.1") for _ in range(20)])
+
+    assert sum(asyncio.run(run())) == 3
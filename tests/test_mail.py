@@ -0,0 +1,100 @@
+""" the tests of the smtp pool, the mail queue and the agent password email against a local aiosmtpd server """
+
+import asyncio
+import socket
+
+from email.message import EmailMessage
+
+import pytest
+
+from aiosmtpd.controller import Controller
+
+from services.mail_queue import SMTPPool, MailQueue
+from tests.conftest import access_cookies
+
+class Inbox:
+    """ an aiosmtpd handler keeping the received messages """
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def inbox():
+    """ a running smtp server on a free local port """
+
+    inbox = Inbox()
+    controller = Controller(inbox, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    inbox.port = controller.port
+    yield inbox
+    controller.stop()
+
+def message(to: str):
+    message = EmailMessage()
+    message["To"], message["From"], message["Subject"] = to, "noreply@gmail.com", "test"
+    message.set_content("hello")
+    return message
+
+def test_queued_messages_are_sent_over_the_pool(inbox):
+    pool = SMTPPool("127.0.0.1", inbox.port, 1, starttls=False)
+    mail_queue = MailQueue(pool, 2, 0, 0)
+
+    async def run():
+        mail_queue.start()
+        for number in range(3):
+            mail_queue.enqueue(message(f"user{number}@gmail.com"))
+        await mail_queue.stop()
+
+    asyncio.run(run())
+
+    assert sorted(envelope.rcpt_tos[0] for envelope in inbox.messages) == [f"user{number}@gmail.com" for number in range(3)]
+    assert mail_queue.stats()["sent"] == 3
+
+def test_a_send_to_a_server_which_is_down_raises():
+    mail_queue = MailQueue(SMTPPool("127.0.0.1", free_port(), 1, starttls=False, timeout=2), 1, 0, 0)
+
+    with pytest.raises(OSError):
+        asyncio.run(mail_queue.send(message("user@gmail.com")))
+    assert mail_queue.stats()["failed"] == 1
+
+@pytest.fixture
+def agent_mail(monkeypatch):
+    """ a function to point the agent password email at an smtp port """
+
+    import services.email_sender
+    from services.password_service import password_service
+
+    def point_at(port: int):
+        mail_queue = MailQueue(SMTPPool("127.0.0.1", port, 1, starttls=False, timeout=2), 1, 0, 0)
+        monkeypatch.setattr(services.email_sender, "mail_queue", mail_queue)
+
+    yield point_at
+    password_service.shutdown()
+
+def test_the_agent_password_is_emailed_before_the_agent_is_added(client, seeded, storage, inbox, agent_mail):
+    agent_mail(inbox.port)
+    client.cookies.update(access_cookies(seeded["admin"], "admin"))
+
+    response = client.post("/admin/agent/add", json={"name": "new", "email": "new.agent@gmail.com", "phone_number": "0800"})
+
+    assert response.status_code == 200, response.text
+    assert [envelope.rcpt_tos for envelope in inbox.messages] == [["new.agent@gmail.com"]]
+    assert storage.get_agent_from_email("new.agent@gmail.com").status
+
+def test_the_agent_is_not_kept_when_the_password_email_fails(client, seeded, storage, agent_mail):
+    agent_mail(free_port())
+    client.cookies.update(access_cookies(seeded["admin"], "admin"))
+
+    response = client.post("/admin/agent/add", json={"name": "new", "email": "new.agent@gmail.com", "phone_number": "0800"})
+
+    assert response.status_code == 503
+    assert not storage.get_agent_from_email("new.agent@gmail.com").status
@@ -0,0 +1,97 @@
+""" the tests of serving the stored profile images with their cache headers and range requests """
+
+import hashlib
+import os
+
+import pytest
+
+import routes.media_route
+from services.file_management import FileManager
+
+LEGACY_NAME = "0b4c3f2e-6a8d-4f7e-9c1a-2d5e8f0a1b3c"
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    """ the file manager the route reads the images from, on its own folder """
+
+    monkeypatch.setenv("MEDIA_ROOT", str(tmp_path))
+    manager = FileManager()
+    monkeypatch.setattr(routes.media_route, "file_manager", manager)
+    return manager
+
+def store(media, data: bytes, suffix: str = "", extension: str = "png"):
+    """ a function to place an image in the content addressed store and get its key """
+
+    key = f"{hashlib.sha256(data).hexdigest()}{suffix}.{extension}"
+    path = media.path_of(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as stored:
+        stored.write(data)
+    return key
+
+def store_legacy(directory: str, extension: str, data: bytes = b"legacy image"):
+    name = f"{LEGACY_NAME}.{extension}"
+    with open(f"{directory}/{name}", "wb") as stored:
+        stored.write(data)
+    return name
+
+def test_a_hashed_image_is_cached_for_good_with_a_strong_etag(client, media):
+    data = os.urandom(1024)
+    key = store(media, data, "_thumb_webp", "webp")
+
+    response = client.get(f"/media/{key}")
+
+    assert response.status_code == 200 and response.content == data
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["etag"] == f'"{key.removesuffix(".webp")}"'
+    assert "immutable" in response.headers["cache-control"] and "max-age=31536000" in response.headers["cache-control"]
+
+def test_a_matching_if_none_match_is_answered_with_304(client, media):
+    key = store(media, os.urandom(1024))
+    etag = client.get(f"/media/{key}").headers["etag"]
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get(f"/media/{key}", headers={"If-None-Match": header})
+        assert response.status_code == 304 and response.content == b""
+        assert response.headers["etag"] == etag
+
+    assert client.get(f"/media/{key}", headers={"If-None-Match": '"other"'}).status_code == 200
+
+def test_a_range_request_gets_only_the_asked_bytes(client, media):
+    data = os.urandom(4096)
+    key = store(media, data)
+
+    response = client.get(f"/media/{key}", headers={"Range": "bytes=100-199"})
+
+    assert response.status_code == 206 and response.content == data[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(data)}"
+    assert client.get(f"/media/{key}", headers={"Range": "bytes=5000-6000"}).status_code == 416
+
+def test_the_legacy_names_are_served_with_every_extension_the_old_upload_wrote(client, media):
+    expected = {
+        "png": "image/png",
+        "jpeg": "image/jpeg",
+        "jpg": "image/jpeg",
+        "JPG": "image/jpeg",
+        "Png": "image/png",
+        "gif": "image/gif",
+        "heic": "application/octet-stream",
+    }
+
+    for extension, media_type in expected.items():
+        name = store_legacy(media.agent_path, extension)
+        response = client.get(f"/media/{name}")
+        os.remove(f"{media.agent_path}/{name}")
+
+        assert response.status_code == 200 and response.content == b"legacy image"
+        assert response.headers["content-type"].split(";")[0] == media_type
+        assert response.headers["x-content-type-options"] == "nosniff"
+
+    agent_image = store_legacy(media.admin_path, "jpg")
+    assert client.get(f"/media/{agent_image}").status_code == 200
+
+def test_unknown_or_unsafe_names_are_not_found(client, media):
+    store_legacy(media.agent_path, "jpg")
+
+    for key in (f"{LEGACY_NAME}.JPG", f"{'0' * 64}.png", "..%2F..%2Fetc%2Fpasswd", f"{LEGACY_NAME}.jpg.", "image.png"):
+        assert client.get(f"/media/{key}").status_code == 404
@@ -0,0 +1,61 @@
+""" the tests of the sql migrations runner """
+
+import os
+import re
+
+from sqlalchemy import create_engine, inspect, text
+
+from utils.migrate import MIGRATIONS_DIR, apply_migrations, migration_files, stamp_migrations, statements
+
+def write(directory, name, sql):
+    with open(os.path.join(directory, name), "w") as migration:
+        migration.write(sql)
+
+def test_statements_drop_comments_and_split_on_line_ends():
+    sql = "-- a comment; not a statement\nCREATE TABLE a (id INTEGER);\nALTER TABLE a\n\tADD COLUMN b TEXT;\n"
+
+    assert statements(sql) == ["CREATE TABLE a (id INTEGER)", "ALTER TABLE a\n\tADD COLUMN b TEXT"]
+
+def test_pending_migrations_run_once_in_order(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/db.sqlite")
+    write(tmp_path, "002_column.sql", "ALTER TABLE things ADD COLUMN size INTEGER;\n")
+    write(tmp_path, "001_table.sql", "CREATE TABLE things (id INTEGER PRIMARY KEY);\n")
+
+    assert apply_migrations(engine, str(tmp_path)) == ["001_table.sql", "002_column.sql"]
+    assert apply_migrations(engine, str(tmp_path)) == []
+    assert [column["name"] for column in inspect(engine).get_columns("things")] == ["id", "size"]
+
+def test_a_failed_migration_is_not_recorded(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/db.sqlite")
+    write(tmp_path, "001_broken.sql", "ALTER TABLE missing ADD COLUMN a TEXT;\n")
+
+    try:
+        apply_migrations(engine, str(tmp_path))
+    except Exception:
+        pass
+    write(tmp_path, "001_broken.sql", "CREATE TABLE things (id INTEGER PRIMARY KEY);\n")
+
+    assert apply_migrations(engine, str(tmp_path)) == ["001_broken.sql"]
+
+def test_stamped_migrations_are_skipped(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/db.sqlite")
+    write(tmp_path, "001_table.sql", "CREATE TABLE things (id INTEGER PRIMARY KEY);\n")
+
+    stamp_migrations(engine, str(tmp_path))
+
+    assert apply_migrations(engine, str(tmp_path)) == []
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT version FROM schema_migrations")).scalars().all() == ["001_table.sql"]
+
+def test_every_model_index_and_new_table_has_a_migration(engine):
+    from models.base_model import Base
+
+    sql = "".join(open(os.path.join(MIGRATIONS_DIR, name)).read() for name in migration_files())
+    created = set(re.findall(r"CREATE TABLE IF NOT EXISTS (\w+)", sql))
+    # the tables of setup.sql before the migrations were added
+    baseline = {"admin", "agent_refresh", "agents", "availability", "bookings", "celebs", "otp_codes", "refresh_tokens", "users"}
+
+    assert set(Base.metadata.tables) - baseline == created
+    for table in Base.metadata.tables.values():
+        for index in table.indexes:
+            assert index.name in sql, index.name
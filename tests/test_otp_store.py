@@ -0,0 +1,98 @@
+""" the tests of the otp store on the database and memory backends """
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.otp_store import OtpStore, DatabaseOtpBackend, MemoryOtpBackend
+
+WINDOW = 3600
+EMAIL = "user@gmail.com"
+
+@pytest.fixture(params=["db", "memory"])
+def backend(request, engine):
+    return DatabaseOtpBackend() if request.param == "db" else MemoryOtpBackend()
+
+@pytest.fixture
+def otp_store(backend):
+    """ a store allowing 3 sends in a rolling hour and 2 checks per code, without a cooldown """
+
+    return OtpStore(backend, ttl=600, resend_window=WINDOW, resend_limit=3, cooldown=0, max_attempts=2)
+
+def move_sends(backend, storage, seconds: float):
+    """ a function to move the recorded sends of the email back in time """
+
+    otp = backend.get(EMAIL, storage)
+    otp.sends = [sent - seconds for sent in otp.sends]
+    backend.save(otp, storage)
+
+def test_the_resend_limit_rolls_with_each_send(otp_store, backend, storage):
+    assert all(otp_store.issue(EMAIL, storage) for _ in range(3))
+    assert otp_store.issue(EMAIL, storage) is None
+
+    # half a window later the same sends are still in the window, a fixed window would have reset here
+    move_sends(backend, storage, WINDOW / 2)
+    assert otp_store.issue(EMAIL, storage) is None
+
+    move_sends(backend, storage, WINDOW / 2 + 1)
+    assert otp_store.issue(EMAIL, storage)
+
+def test_a_code_is_used_once(otp_store, storage):
+    code = otp_store.issue(EMAIL, storage)
+
+    assert otp_store.consume(EMAIL, code, storage)
+    assert not otp_store.consume(EMAIL, code, storage)
+
+def test_wrong_codes_are_capped_per_code(otp_store, storage):
+    code = otp_store.issue(EMAIL, storage)
+    wrong = "000000" if code != "000000" else "111111"
+
+    assert not otp_store.consume(EMAIL, wrong, storage)
+    assert not otp_store.consume(EMAIL, wrong, storage)
+    # the right code no longer works once the attempts are used up
+    assert not otp_store.consume(EMAIL, code, storage)
+
+    new_code = otp_store.issue(EMAIL, storage)
+    assert otp_store.consume(EMAIL, new_code, storage)
+
+def test_an_expired_code_is_rejected(otp_store, backend, storage):
+    code = otp_store.issue(EMAIL, storage)
+    otp = backend.get(EMAIL, storage)
+    otp.sent_at = datetime.now() - timedelta(seconds=601)
+    backend.save(otp, storage)
+
+    assert not otp_store.consume(EMAIL, code, storage)
+
+def test_the_cooldown_spaces_the_sends(backend, storage):
+    otp_store = OtpStore(backend, ttl=600, resend_window=WINDOW, resend_limit=3, cooldown=60, max_attempts=2)
+
+    assert otp_store.issue(EMAIL, storage)
+    assert otp_store.issue(EMAIL, storage) is None
+
+def test_retry_after_covers_the_cooldown_and_the_window(backend, storage):
+    otp_store = OtpStore(backend, ttl=600, resend_window=WINDOW, resend_limit=2, cooldown=60, max_attempts=2)
+    assert otp_store.retry_after(EMAIL, storage) == 0
+
+    otp_store.issue(EMAIL, storage)
+    assert 59 <= otp_store.retry_after(EMAIL, storage) <= 60
+
+    otp = backend.get(EMAIL, storage)
+    otp.sent_at -= timedelta(seconds=120)
+    otp.sends = [otp.sends[0] - 600, otp.sends[0] - 120]
+    backend.save(otp, storage)
+    # both sends of the window are used, the older one leaves it 3000 seconds from now
+    assert 2999 <= otp_store.retry_after(EMAIL, storage) <= 3000
+
+def test_a_refused_code_request_is_a_rate_limit(seeded, client, monkeypatch):
+    from services.mail_queue import mail_queue
+    from tests.conftest import access_cookies
+
+    monkeypatch.setattr(mail_queue, "enqueue", lambda message: None)
+    client.cookies.update(access_cookies(seeded["user"], "user"))
+
+    assert client.get("/auth/otp/request").status_code == 200
+    response = client.get("/auth/otp/request")
+
+    assert response.status_code == 429
+    assert 0 < int(response.headers["Retry-After"]) <= 60
+    assert "wait" in response.json()["message"]
@@ -0,0 +1,40 @@
+""" the tests of the keyset cursors of the listing endpoints """
+
+from utils.pagination import encode_cursor, decode_cursor, valid_cursor
+from tests.conftest import access_cookies
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-01-02 03:04:05.000006", "row-id")
+
+    assert decode_cursor(cursor)[1] == "row-id"
+    assert valid_cursor(cursor)
+    assert valid_cursor(None) and valid_cursor("")
+
+def test_tampered_cursor_is_invalid():
+    assert decode_cursor("not-a-cursor") is None
+    assert not valid_cursor("not-a-cursor")
+    assert not valid_cursor(encode_cursor("yesterday", "row-id"))
+
+def test_cursor_pages_cover_every_booking_once(seeded, storage, client):
+    user, celeb = seeded["user"], seeded["celeb"]
+    for _ in range(5):
+        storage.create_booking(celeb.id, user.id, "MONDAY", "One-Time")
+    client.cookies.update(access_cookies(user, "user"))
+
+    seen, cursor = [], ""
+    while cursor is not None:
+        data = client.get("/user/bookings", params={"limit": 2, "cursor": cursor}).json()["data"]
+        if not isinstance(data, dict):
+            break
+        seen += [item["id"] for item in data["items"]]
+        cursor = data["next_cursor"]
+
+    assert len(seen) == 5 and len(set(seen)) == 5
+
+def test_invalid_cursor_is_rejected(seeded, client):
+    client.cookies.update(access_cookies(seeded["user"], "user"))
+
+    response = client.get("/user/bookings", params={"cursor": "tampered"})
+
+    assert response.status_code == 400
+    assert response.json()["message"] == "Invalid cursor"
@@ -0,0 +1,74 @@
+""" the tests of the connection pool metrics and the idle liveness pings """
+
+import threading
+import time
+
+from time import monotonic
+
+import pytest
+
+from sqlalchemy import create_engine, text
+
+from database.pool_metrics import InstrumentedQueuePool, ping_when_idle, pool_stats
+
+@pytest.fixture
+def pool_engine(tmp_path):
+    """ an engine on a pool of one connection which waits up to 5 seconds for it """
+
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/pool.db", poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=5
+    )
+    yield engine
+    engine.dispose()
+
+def test_a_blocked_checkout_is_recorded_in_the_wait_histogram(pool_engine):
+    before = pool_stats.snapshot(pool_engine.pool)
+    held = pool_engine.connect()
+    waited = []
+
+    def checkout():
+        with pool_engine.connect() as connection:
+            waited.append(connection.execute(text("SELECT 1")).scalar())
+
+    thread = threading.Thread(target=checkout)
+    thread.start()
+    # the second checkout waits on the only connection until it is given back
+    time.sleep(0.2)
+    held.close()
+    thread.join()
+    after = pool_stats.snapshot(pool_engine.pool)
+
+    assert waited == [1]
+    assert after["checkouts"] - before["checkouts"] == 2
+    assert after["checkout_wait_seconds_total"] - before["checkout_wait_seconds_total"] >= 0.2
+    slow = ("le_0.5", "le_1.0", "le_5.0", "le_inf")
+    assert sum(after["checkout_wait_histogram"][bucket] - before["checkout_wait_histogram"][bucket] for bucket in slow) == 1
+    assert after["size"] == 1 and after["checked_out"] == 0
+
+def test_a_connection_idle_for_too_long_is_pinged_on_checkout(pool_engine):
+    ping_when_idle(pool_engine, 30)
+
+    connection = pool_engine.connect()
+    info = connection.connection.info
+    connection.close()
+    pings = pool_stats.snapshot(pool_engine.pool)["pings"]
+
+    with pool_engine.connect():
+        pass
+    assert pool_stats.snapshot(pool_engine.pool)["pings"] == pings
+
+    # the connection was given back a minute ago
+    info["last_used"] = monotonic() - 60
+    with pool_engine.connect():
+        pass
+    after = pool_stats.snapshot(pool_engine.pool)
+
+    assert after["pings"] == pings + 1
+    assert after["stale_connections"] == 0
+
+def test_the_pool_status_route_shows_the_metrics(client):
+    response = client.get("/status/pool")
+
+    assert response.status_code == 200
+    assert {"size", "checked_out", "checkouts", "checkout_wait_histogram", "pings"} <= set(response.json())
+    assert response.json()["replicas"] == []
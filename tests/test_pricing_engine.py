@@ -0,0 +1,125 @@
+""" the tests of the booking price table and of the currency prices on the booking routes """
+
+import asyncio
+
+import pytest
+
+import routes.admin_route
+import routes.agent_route
+import routes.user_route
+from services.pricing_engine import PriceTable, PricingEngine
+from services.quote_service import QuoteUnavailable
+from tests.conftest import access_cookies
+from utils.booking_price import booking_prices
+
+RATES = {"eur": 0.5, "NGN": 1500.0}
+
+class Rates:
+    """ a rate source returning the queued rates, or raising the queued errors, one per call """
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+def test_the_table_prices_every_type_in_every_currency():
+    table = PriceTable(booking_prices, RATES)
+
+    assert table.price("One-Time", "USD") == 4372
+    assert table.price("One-Time", "eur") == 2186 and table.price("Vacation", "EUR") == 3840
+    assert table.price("Long-Meet", "ngn") == 15300000
+    assert table.price("One-Time", "XYZ") is None and table.price("Unknown", "EUR") is None
+    assert table.convert(100, "eur") == 50 and table.convert(None, "EUR") is None and table.convert(100, "XYZ") is None
+
+def test_the_table_is_rebuilt_only_when_the_rates_change(monkeypatch):
+    import services.quote_service
+
+    now = [1000.0]
+    monkeypatch.setattr(services.quote_service, "monotonic", lambda: now[0])
+    rates = Rates(RATES, {"EUR": 0.25})
+    engine = PricingEngine(booking_prices, rates, ttl=60, max_stale=600)
+
+    async def run():
+        first, again = await engine.table(), await engine.table()
+        now[0] += 61
+        # the expired rates are still served while the refresh runs in the background
+        await engine.table()
+        await asyncio.sleep(0.01)
+        return first, again, await engine.table()
+
+    first, again, refreshed = asyncio.run(run())
+
+    assert first is again and rates.calls == 2
+    assert refreshed is not first and refreshed.price("One-Time", "EUR") == 1093
+
+def test_the_stored_usd_price_is_converted_before_the_type_price():
+    engine = PricingEngine(booking_prices, Rates(RATES), ttl=60, max_stale=600)
+    bookings = [{"type": "One-Time", "price_usd": 1000}, {"type": "Vacation", "price_usd": None}]
+
+    response = asyncio.run(engine.price_bookings(bookings, "eur"))
+
+    assert response.status
+    assert [booking["price"] for booking in bookings] == [{"eur": 500}, {"eur": 3840}]
+
+def test_an_unknown_currency_or_missing_rates_fail():
+    engine = PricingEngine(booking_prices, Rates(RATES), ttl=60, max_stale=600)
+    assert not asyncio.run(engine.price_bookings([{"type": "One-Time"}], "XYZ")).status
+
+    failing = PricingEngine(booking_prices, Rates(QuoteUnavailable("down")), ttl=60, max_stale=600)
+    assert not asyncio.run(failing.price_bookings([{"type": "One-Time"}], "EUR")).status
+
+@pytest.fixture
+def priced(monkeypatch):
+    """ one pricing engine on fixed rates shared by the booking routes """
+
+    engine = PricingEngine(booking_prices, Rates(RATES), ttl=60, max_stale=600)
+    for module in (routes.user_route, routes.agent_route, routes.admin_route):
+        monkeypatch.setattr(module, "pricing_engine", engine)
+    return engine
+
+@pytest.fixture
+def booking(seeded, storage):
+    """ a booking stored with its usd and btc prices """
+
+    price = {"usd": 4372, "btc": 0.1, "quoted_at": None}
+    return storage.create_booking(seeded["celeb"].id, seeded["user"].id, "MONDAY", "One-Time", price).payload
+
+def test_the_user_bookings_are_priced_in_the_currency(client, seeded, booking, priced):
+    client.cookies.update(access_cookies(seeded["user"], "user"))
+
+    listed = client.get("/user/bookings", params={"currency": "EUR"}).json()["data"]
+    single = client.get(f"/user/bookings/{booking.id}", params={"currency": "EUR"}).json()["data"]
+    unknown = client.get("/user/bookings", params={"currency": "XYZ"})
+
+    assert [item["price"] for item in listed] == [{"eur": 2186}]
+    assert single["price"] == {"usd": 4372, "btc": 0.1, "eur": 2186}
+    assert unknown.status_code == 400
+
+def test_the_prices_are_loaded_when_the_fields_leave_them_out(client, seeded, booking, priced):
+    client.cookies.update(access_cookies(seeded["user"], "user"))
+
+    listed = client.get("/user/bookings", params={"currency": "EUR", "fields": "status"}).json()["data"]
+
+    assert [item["price"] for item in listed] == [{"eur": 2186}]
+
+def test_the_celebrity_bookings_are_priced_in_the_currency(client, seeded, booking, priced):
+    client.cookies.update(access_cookies(seeded["agent"], "agent"))
+
+    listed = client.get(f"/agent/celeb/{seeded['celeb'].id}/bookings", params={"currency": "ngn", "fields": "day"})
+
+    assert [item["price"] for item in listed.json()["data"]] == [{"ngn": 6558000}]
+
+def test_the_admin_booking_is_priced_in_the_currency(client, seeded, booking, priced):
+    client.cookies.update(access_cookies(seeded["admin"], "admin"))
+
+    found = client.get(f"/admin/bookings/{booking.id}", params={"currency": "EUR"}).json()["data"]
+    unknown = client.get(f"/admin/bookings/{booking.id}", params={"currency": "XYZ"})
+
+    assert found["booking"]["price"] == {"eur": 2186}
+    assert unknown.status_code == 400
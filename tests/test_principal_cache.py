@@ -0,0 +1,102 @@
+""" the tests of the principal cache behind the access token checks """
+
+import pytest
+
+from sqlalchemy import event
+
+import utils.principal_cache
+from utils.principal_cache import PrincipalCache
+
+@pytest.fixture
+def statements(engine):
+    """ the statements sent to the database while the test runs """
+
+    sent = []
+    capture = lambda connection, cursor, statement, *args: sent.append(statement)
+    event.listen(engine, "before_cursor_execute", capture)
+    yield sent
+    event.remove(engine, "before_cursor_execute", capture)
+
+def fresh(session_factory):
+    from database.storage_engine import DBStorage
+
+    return DBStorage(session_factory())
+
+def lookup(session_factory, role: str, principal_id: str):
+    storage = fresh(session_factory)
+    try:
+        return storage.get_principal(role, principal_id)
+    finally:
+        storage.close()
+
+def test_entries_expire_after_the_ttl_and_the_oldest_is_evicted(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(utils.principal_cache, "monotonic", lambda: now[0])
+    cache = PrincipalCache(max_size=2, ttl=30)
+
+    cache.set(("user", "a"), {"id": "a"})
+    cache.set(("user", "b"), {"id": "b"})
+    assert cache.get(("user", "a")) == {"id": "a"}
+    cache.set(("user", "c"), {"id": "c"})
+    assert cache.get(("user", "b")) is None
+
+    now[0] += 31
+    assert cache.get(("user", "a")) is None
+    assert cache.stats()["evictions"] == 2
+
+def test_a_cached_principal_is_served_without_a_query(seeded, session_factory, statements):
+    user = seeded["user"]
+    first = fresh(session_factory)
+    assert first.get_principal("user", user.id).payload.email == user.email
+    first.close()
+
+    statements.clear()
+    second = fresh(session_factory)
+    principal = second.get_principal("user", user.id).payload
+    second.close()
+
+    assert principal.id == user.id and principal.email == user.email
+    assert statements == []
+
+def test_a_password_or_level_change_is_seen_on_the_next_lookup(seeded, session_factory):
+    from models.user import UserLevel
+
+    user = seeded["user"]
+    lookup(session_factory, "user", user.id)
+
+    writer = fresh(session_factory)
+    changed = writer.get_principal("user", user.id).payload
+    changed.password = "new-hash"
+    changed.level = UserLevel.VERIFIED
+    writer.save(changed)
+    writer.close()
+
+    principal = lookup(session_factory, "user", user.id).payload
+    assert principal.password == "new-hash" and principal.level == UserLevel.VERIFIED
+
+def test_a_principal_changed_alongside_another_save_is_invalidated(seeded, session_factory):
+    from models.admin_model import Admin
+
+    agent = seeded["agent"]
+    lookup(session_factory, "agent", agent.id)
+
+    writer = fresh(session_factory)
+    changed = writer.get_principal("agent", agent.id).payload
+    changed.password = "new-hash"
+    other = Admin()
+    other.name, other.email, other.password = "second", "second@gmail.com", "password"
+    # the agent is only dirty in the session when the admin is saved
+    writer.save(other)
+    writer.close()
+
+    assert lookup(session_factory, "agent", agent.id).payload.password == "new-hash"
+
+def test_a_deleted_principal_is_not_served_from_the_cache(seeded, session_factory):
+    admin = seeded["admin"]
+    lookup(session_factory, "admin", admin.id)
+
+    writer = fresh(session_factory)
+    writer.delete(writer.get_principal("admin", admin.id).payload)
+    writer.close()
+
+    assert not lookup(session_factory, "admin", admin.id).status
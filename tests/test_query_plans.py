@@ -0,0 +1,144 @@
+""" the EXPLAIN regression suite of the DBStorage methods
+
+each method is run against a seeded schema while its statements are captured, then every
+statement is explained and the test fails on a full table scan or a sort without an index
+(sqlite reports a filesort as USE TEMP B-TREE FOR ORDER BY)
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlalchemy import event
+
+from utils.pagination import encode_cursor
+from utils.principal_cache import principal_cache
+
+# the maintenance jobs read every row by design and are left out of the suite
+FULL_SCAN_JOBS = {"rebuild_booking_stats", "backfill_booking_prices", "get_profiles_without_variants"}
+
+@pytest.fixture
+def data(seeded, storage):
+    """ the seeded principals with bookings, refresh tokens, an otp code and a stored image """
+
+    from models.refresh_token_model import RefreshToken, AgentRefresh
+    from models.otp_codes_model import OtpCode
+
+    user, celeb, agent = seeded["user"], seeded["celeb"], seeded["agent"]
+    bookings = [storage.create_booking(celeb.id, user.id, "MONDAY", "One-Time").payload for _ in range(3)]
+
+    storage.save(RefreshToken(user.id, "user-token"))
+    storage.save(RefreshToken(user.id, "user-token-2"))
+    storage.save(AgentRefresh(agent.id, "agent-token"))
+    otp = OtpCode(user.email, "123456", datetime.now() + timedelta(minutes=30))
+    storage.save(otp)
+    storage.add_media_reference("a" * 64 + ".png", 10)
+    storage.revoke_token(datetime.now() + timedelta(minutes=5), jti="revoked")
+
+    seeded["admin"].refresh_token = "admin-token"
+    storage.save(seeded["admin"])
+
+    return {**seeded, "otp": otp, "bookings": bookings, "cursor": encode_cursor(bookings[0].created_at, bookings[0].id)}
+
+def storage_cases():
+    """ a function to get the calls of every DBStorage method with its seeded arguments """
+
+    from models.agent_model import Agent
+    from models.celebrity_model import Celeb
+    from models.refresh_token_model import RefreshToken, AgentRefresh
+    from models.otp_codes_model import OtpCode
+    from models.revoked_token_model import RevokedToken
+
+    return {
+        "get_user_from_email": lambda s, d: s.get_user_from_email(d["user"].email),
+        "get_user_by_id": lambda s, d: s.get_user_by_id(d["user"].id),
+        "get_refresh_token": lambda s, d: s.get_refresh_token("user-token"),
+        "trim_refresh_tokens": lambda s, d: s.trim_refresh_tokens(d["user"].id, 1),
+        "delete_expired refresh_tokens": lambda s, d: s.delete_expired(RefreshToken, 100),
+        "delete_expired agent_refresh": lambda s, d: s.delete_expired(AgentRefresh, 100),
+        "delete_expired otp_codes": lambda s, d: s.delete_expired(OtpCode, 100),
+        "delete_expired revoked_tokens": lambda s, d: s.delete_expired(RevokedToken, 100),
+        "get_otp_object": lambda s, d: s.get_otp_object(d["user"].email),
+        "add_otp_attempt": lambda s, d: s.add_otp_attempt(d["otp"].id, 5),
+        "get_principal": lambda s, d: (principal_cache.invalidate(("user", d["user"].id)), s.get_principal("user", d["user"].id)),
+        "get_admin_from_email": lambda s, d: s.get_admin_from_email(d["admin"].email),
+        "get_admin_from_id": lambda s, d: s.get_admin_from_id(d["admin"].id),
+        "get_admin_from_refresh": lambda s, d: s.get_admin_from_refresh("admin-token"),
+        "get_agent_from_email": lambda s, d: s.get_agent_from_email(d["agent"].email),
+        "get_agent_from_id": lambda s, d: s.get_agent_from_id(d["agent"].id),
+        "get_agents": lambda s, d: s.get_agents(0, 10),
+        "get_agents cursor": lambda s, d: s.get_agents(0, 10, d["cursor"]),
+        "get_agent_id_from_refresh": lambda s, d: s.get_agent_id_from_refresh("agent-token"),
+        "delete_agent_refresh_token": lambda s, d: s.delete_agent_refresh_token(d["agent"].id),
+        "get_celebrities": lambda s, d: s.get_celebrities(d["agent"].id, 10, 0),
+        "get_celebrities one": lambda s, d: s.get_celebrities(d["agent"].id, 10, 0, d["celeb"].id),
+        "get_celebrities cursor": lambda s, d: s.get_celebrities(d["agent"].id, 10, 0, None, d["cursor"], ["name"]),
+        "get_celeb_by_id": lambda s, d: s.get_celeb_by_id(d["celeb"].id),
+        "get_celebrities_for_admin": lambda s, d: s.get_celebrities_for_admin(10, 0, d["cursor"]),
+        "get_users_for_admin": lambda s, d: s.get_users_for_admin(10, 0, d["cursor"]),
+        "get_celeb_availability": lambda s, d: s.get_celeb_availability(d["celeb"].id),
+        "get_user_bookings_info": lambda s, d: s.get_user_bookings_info(d["user"].id),
+        "get_booking user": lambda s, d: s.get_booking(None, 10, 0, d["cursor"], user_id=d["user"].id),
+        "get_booking user one": lambda s, d: s.get_booking(d["bookings"][0].id, user_id=d["user"].id),
+        "get_booking celeb": lambda s, d: s.get_booking(None, 10, 0, celeb_id=d["celeb"].id),
+        "get_booking celeb one": lambda s, d: s.get_booking(d["bookings"][0].id, celeb_id=d["celeb"].id),
+        "create_booking": lambda s, d: s.create_booking(d["celeb"].id, d["user"].id, "MONDAY", "One-Time"),
+        "get_booking_by_id": lambda s, d: s.get_booking_by_id(d["bookings"][0].id),
+        "get_celeb_bookings": lambda s, d: s.get_celeb_bookings(d["celeb"].id, 10, 0, d["cursor"]),
+        "add_media_reference": lambda s, d: s.add_media_reference("a" * 64 + ".png", 10),
+        "release_media_reference": lambda s, d: s.release_media_reference("a" * 64 + ".png"),
+        "set_profile_variants": lambda s, d: s.set_profile_variants(Celeb, d["celeb"].id, "a" * 64 + ".png", {}),
+        "set_profile_variants agent": lambda s, d: s.set_profile_variants(Agent, d["agent"].id, "a" * 64 + ".png", {}),
+        "get_revocations": lambda s, d: s.get_revocations(datetime.now()),
+    }
+
+def test_every_storage_method_is_covered():
+    from database.storage_engine import DBStorage
+
+    covered = {name.split(" ")[0] for name in storage_cases()}
+    # these only insert or write the objects given to them
+    ignored = {"save", "delete", "rollback", "close", "revoke_token"} | FULL_SCAN_JOBS
+    public = {name for name in vars(DBStorage) if not name.startswith("_") and callable(getattr(DBStorage, name))}
+
+    assert public - ignored - covered == set()
+
+def bad_steps(connection, statement: str, parameters):
+    """ a function to get the steps of a query plan which scan a whole table or sort without an index
+    Args:
+        connection: the connection to explain the statement on
+        statement: the captured sql
+        parameters: the captured parameters
+    """
+
+    if isinstance(parameters, list):
+        parameters = parameters[0]
+    steps = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()]
+    return [
+        step for step in steps
+        if (step.startswith("SCAN ") and " USING " not in step and step != "SCAN CONSTANT ROW")
+        or "TEMP B-TREE" in step
+    ]
+
+@pytest.mark.parametrize("name", sorted(storage_cases()))
+def test_storage_method_uses_an_index(name, data, session_factory, engine):
+    from database.storage_engine import DBStorage
+
+    # a new session so the seeded rows in the identity map do not hide the queries
+    storage = DBStorage(session_factory())
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        storage_cases()[name](storage, data)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+        storage.close()
+
+    assert statements, f"{name} sent no query"
+    with engine.connect() as connection:
+        problems = {statement: bad_steps(connection, statement, parameters) for statement, parameters in statements}
+    assert {statement: steps for statement, steps in problems.items() if steps} == {}
@@ -0,0 +1,90 @@
+""" the tests of the cached quote with its single flight refresh, driven by an injected fetcher """
+
+import asyncio
+
+import pytest
+
+import services.quote_service
+from services.quote_service import QuoteService, QuoteUnavailable
+
+class Fetcher:
+    """ an upstream returning the queued quotes, or raising the queued errors, one per call """
+
+    def __init__(self, *results, delay: float = 0.01):
+        self.results = list(results)
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ the monotonic clock the service reads """
+
+    now = [1000.0]
+    monkeypatch.setattr(services.quote_service, "monotonic", lambda: now[0])
+    return now
+
+def test_concurrent_gets_share_one_fetch(clock):
+    fetcher = Fetcher(100.0, delay=0.05)
+    service = QuoteService(fetcher, ttl=60, max_stale=600)
+
+    async def run():
+        return await asyncio.gather(*[service.get() for _ in range(20)])
+
+    assert asyncio.run(run()) == [100.0] * 20
+    assert fetcher.calls == 1
+
+def test_a_stale_quote_is_served_while_it_is_refreshed(clock):
+    fetcher = Fetcher(100.0, 200.0)
+    service = QuoteService(fetcher, ttl=60, max_stale=600)
+
+    async def run():
+        first = await service.get()
+        clock[0] += 30
+        fresh = await service.get()
+        clock[0] += 60
+        stale = [await service.get() for _ in range(5)]
+        await asyncio.sleep(0.05)
+        return first, fresh, stale, await service.get()
+
+    first, fresh, stale, refreshed = asyncio.run(run())
+
+    assert first == fresh == 100.0
+    assert stale == [100.0] * 5
+    # the five stale reads started a single background refresh
+    assert refreshed == 200.0 and fetcher.calls == 2
+
+def test_a_failed_refresh_keeps_the_last_quote_until_max_stale(clock):
+    fetcher = Fetcher(100.0, ConnectionError("down"), ConnectionError("still down"))
+    service = QuoteService(fetcher, ttl=60, max_stale=600)
+
+    async def run():
+        await service.get()
+        clock[0] += 90
+        kept = await service.get()
+        await asyncio.sleep(0.05)
+        # the failing upstream is not asked again before a ttl has passed
+        again = await service.get()
+        calls = fetcher.calls
+        clock[0] += 600
+        with pytest.raises(QuoteUnavailable):
+            await service.get()
+        return kept, again, calls
+
+    kept, again, calls = asyncio.run(run())
+
+    assert kept == again == 100.0 and calls == 2
+    assert fetcher.calls == 3
+
+def test_no_quote_at_all_raises(clock):
+    service = QuoteService(Fetcher(ConnectionError("down")), ttl=60, max_stale=600)
+
+    with pytest.raises(QuoteUnavailable):
+        asyncio.run(service.get())
@@ -0,0 +1,83 @@
+""" the tests of the hashed refresh tokens, the session limit and the expired token sweep """
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from models.refresh_token_model import RefreshToken, AgentRefresh, hash_token
+from models.revoked_token_model import RevokedToken
+from models.otp_codes_model import OtpCode
+
+def rows(session_factory, model):
+    with session_factory() as session:
+        return session.scalar(select(func.count()).select_from(model))
+
+def test_only_the_hash_is_saved_and_the_token_is_found_by_it(seeded, storage, session_factory):
+    from utils.cookie_token import token_manager
+
+    user = seeded["user"]
+    token = token_manager.create_refresh_token(user.id, storage).payload["refresh_token"]
+
+    with session_factory() as session:
+        saved = session.scalars(select(RefreshToken.token_hash).where(RefreshToken.user_id == user.id)).all()
+    assert saved == [hash_token(token)] and token not in saved
+    assert storage.get_refresh_token(token).payload.user_id == user.id
+    assert not storage.get_refresh_token(hash_token(token)).status
+    assert not storage.get_refresh_token("").status
+
+def test_an_expired_refresh_token_is_not_found(seeded, storage):
+    user, agent = seeded["user"], seeded["agent"]
+    user_token, agent_token = RefreshToken(user.id, "user-token"), AgentRefresh(agent.id, "agent-token")
+    user_token.expires_at = agent_token.expires_at = datetime.now() - timedelta(seconds=1)
+    storage.save(user_token)
+    storage.save(agent_token)
+
+    assert not storage.get_refresh_token("user-token").status
+    assert not storage.get_agent_id_from_refresh("agent-token").status
+
+    storage.save(AgentRefresh(agent.id, "live-agent-token"))
+    assert storage.get_agent_id_from_refresh("live-agent-token").payload == {"agent_id": agent.id}
+
+def test_the_trim_keeps_the_newest_sessions_of_the_user(seeded, storage, session_factory):
+    from models.user import User
+
+    user = seeded["user"]
+    other = User("other", "user", "other@gmail.com", datetime(2000, 1, 1), "password", "08000000001")
+    storage.save(other)
+    start = datetime.now() - timedelta(hours=1)
+    for minute in range(5):
+        token = RefreshToken(user.id, f"token-{minute}")
+        token.created_at = start + timedelta(minutes=minute)
+        storage.save(token)
+    storage.save(RefreshToken(other.id, "other-token"))
+
+    assert storage.trim_refresh_tokens(user.id, 2) == 3
+
+    assert [storage.get_refresh_token(f"token-{minute}").status for minute in range(5)] == [False, False, False, True, True]
+    assert storage.get_refresh_token("other-token").status
+    assert storage.trim_refresh_tokens(user.id, 2) == 0
+
+def test_the_sweep_deletes_every_expired_row_in_batches(seeded, storage, session_factory):
+    from services.token_sweeper import sweep_expired_tokens
+
+    user, agent = seeded["user"], seeded["agent"]
+    past, future = datetime.now() - timedelta(minutes=1), datetime.now() + timedelta(days=1)
+    for number in range(3):
+        expired = RefreshToken(user.id, f"expired-{number}")
+        expired.expires_at = past
+        storage.save(expired)
+    storage.save(RefreshToken(user.id, "live"))
+    expired_agent = AgentRefresh(agent.id, "expired-agent")
+    expired_agent.expires_at = past
+    storage.save(expired_agent)
+    storage.revoke_token(past, jti="expired-jti")
+    storage.revoke_token(future, jti="live-jti")
+    storage.save(OtpCode(user.email, "123456", past))
+
+    assert sweep_expired_tokens(session_factory, 2) == 6
+
+    assert rows(session_factory, RefreshToken) == 1 and storage.get_refresh_token("live").status
+    assert rows(session_factory, AgentRefresh) == 0
+    assert rows(session_factory, RevokedToken) == 1
+    assert rows(session_factory, OtpCode) == 0
+    assert sweep_expired_tokens(session_factory, 2) == 0
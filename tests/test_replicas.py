@@ -0,0 +1,76 @@
+""" the tests of routing the read only getters to a second sqlite database standing in for a replica """
+
+from database.replicas import ReplicaRouter
+from database.storage_engine import DBStorage
+
+def agent_names(storage):
+    return [item["name"] for item in storage.get_agents(0, 10).payload]
+
+def test_reads_go_to_the_replica(seeded, session_factory, replica_engine):
+    storage = DBStorage(session_factory(), ReplicaRouter([replica_engine]))
+    try:
+        assert agent_names(storage) == ["replica agent"]
+    finally:
+        storage.close()
+
+def test_reads_stick_to_the_primary_after_a_save(seeded, session_factory, replica_engine):
+    from models.admin_model import Admin
+
+    storage = DBStorage(session_factory(), ReplicaRouter([replica_engine]))
+    admin = Admin()
+    admin.name, admin.email, admin.password = "second", "second@gmail.com", "password"
+    try:
+        assert agent_names(storage) == ["replica agent"]
+        storage.save(admin)
+        assert agent_names(storage) == ["agent"]
+    finally:
+        storage.close()
+
+def test_reads_stick_to_the_primary_after_a_delete(seeded, session_factory, replica_engine):
+    storage = DBStorage(session_factory(), ReplicaRouter([replica_engine]))
+    try:
+        storage.delete(storage.get_celeb_by_id(seeded["celeb"].id).payload)
+        assert agent_names(storage) == ["agent"]
+    finally:
+        storage.close()
+
+def test_a_lagging_or_broken_replica_falls_back_to_the_primary(seeded, session_factory, replica_engine):
+    def failing_probe(connection):
+        raise ConnectionError("the replica is down")
+
+    for probe in (lambda connection: 30.0, lambda connection: None, failing_probe):
+        storage = DBStorage(session_factory(), ReplicaRouter([replica_engine], max_lag=5, lag_probe=probe))
+        try:
+            assert agent_names(storage) == ["agent"]
+        finally:
+            storage.close()
+
+def test_the_lag_is_measured_once_per_check_interval(replica_engine):
+    probes = []
+
+    def probe(connection):
+        probes.append(connection)
+        return 0.0
+
+    router = ReplicaRouter([replica_engine], check_interval=60, lag_probe=probe)
+    for _ in range(3):
+        router.session().close()
+
+    assert len(probes) == 1
+
+def test_replica_engines_record_their_own_pool_metrics(tmp_path):
+    from database.pool_metrics import InstrumentedQueuePool, pool_stats
+    from middlewares.session_middleware import create_replica_engine
+
+    replica, stats = create_replica_engine(f"sqlite:///{tmp_path}/replica.db")
+    primary_checkouts = pool_stats.snapshot(replica.pool)["checkouts"]
+    try:
+        with replica.connect():
+            pass
+        snapshot = stats.snapshot(replica.pool)
+    finally:
+        replica.dispose()
+
+    assert isinstance(replica.pool, InstrumentedQueuePool) and stats is not pool_stats
+    assert snapshot["checkouts"] == 1
+    assert pool_stats.snapshot(replica.pool)["checkouts"] == primary_checkouts
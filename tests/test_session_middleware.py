@@ -0,0 +1,36 @@
+""" the tests of the lazily opened request session """
+
+import pytest
+
+import middlewares.session_middleware as session_middleware
+from tests.conftest import access_cookies
+
+@pytest.fixture
+def opened_sessions(session_factory, monkeypatch):
+    """ the sessions opened by the middleware during the test """
+
+    sessions = []
+
+    def factory():
+        session = session_factory()
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(session_middleware, "SessionLocal", factory)
+    return sessions
+
+def test_status_opens_no_session(client, opened_sessions):
+    response = client.get("/status")
+
+    assert response.status_code == 200
+    assert opened_sessions == []
+
+def test_database_route_opens_and_releases_a_session(seeded, client, opened_sessions):
+    client.cookies.update(access_cookies(seeded["user"], "user"))
+
+    response = client.get("/user/me")
+
+    assert response.status_code == 200
+    assert response.json()["data"]["email"] == seeded["user"].email
+    assert len(opened_sessions) == 1
+    assert not opened_sessions[0].in_transaction()
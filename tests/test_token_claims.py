@@ -0,0 +1,70 @@
+""" the tests of the access token claims and the revocation list """
+
+from datetime import datetime, timedelta
+from time import time
+
+import jwt
+import pytest
+
+from utils.cookie_token import token_manager
+from utils.token_revocation import RevocationList
+
+def encode(payload: dict):
+    import os
+
+    payload = {"jti": "jti", "iat": int(time()), "exp": datetime.now() + timedelta(minutes=5), **payload}
+    return jwt.encode(payload, os.environ["JWT_ACCESS_KEY"], algorithm="HS256")
+
+@pytest.fixture
+def revocations(monkeypatch):
+    """ a revocation list reloaded on every check """
+
+    import utils.cookie_token
+
+    revocations = RevocationList(refresh_interval=0)
+    monkeypatch.setattr(utils.cookie_token, "revocation_list", revocations)
+    return revocations
+
+def test_a_token_without_a_role_is_rejected(seeded, storage, revocations):
+    token = encode({"user_id": seeded["admin"].id})
+
+    assert not token_manager.verify_claims(token, "admin", storage).status
+
+def test_a_token_for_another_role_is_rejected(seeded, storage, revocations):
+    token = encode({"user_id": seeded["user"].id, "role": "user"})
+
+    assert not token_manager.verify_claims(token, "admin", storage).status
+    assert token_manager.verify_claims(token, "user", storage).payload.id == seeded["user"].id
+
+def test_a_token_issued_in_the_second_of_a_revocation_is_revoked(seeded, storage, revocations):
+    from models.revoked_token_model import RevokedToken
+
+    user = seeded["user"]
+    issued = datetime.now().replace(microsecond=900000)
+    token = encode({"user_id": user.id, "role": "user", "iat": int(issued.timestamp())})
+
+    # mysql keeps the revocation to the second, earlier than the token's fractional iat
+    revocation = RevokedToken(issued + timedelta(minutes=5), subject_id=user.id)
+    revocation.created_at = issued.replace(microsecond=0)
+    storage.save(revocation)
+
+    response = token_manager.verify_claims(token, "user", storage)
+    assert response.status and not response.payload
+
+def test_a_token_issued_after_a_revocation_is_accepted(seeded, storage, revocations):
+    from models.revoked_token_model import RevokedToken
+
+    user = seeded["user"]
+    revocation = RevokedToken(datetime.now() + timedelta(minutes=5), subject_id=user.id)
+    revocation.created_at = datetime.now() - timedelta(seconds=3)
+    storage.save(revocation)
+    token = encode({"user_id": user.id, "role": "user"})
+
+    assert token_manager.verify_claims(token, "user", storage).payload.id == user.id
+
+def test_a_revoked_jti_is_treated_as_expired(seeded, storage, revocations):
+    token = token_manager.create_access_token(seeded["agent"], "agent").payload["access_token"]
+
+    assert token_manager.revoke_access_token(token, storage).status
+    response = token_manager.verify_claims(token, "agent", storage)
+    assert response.status and not response.payload
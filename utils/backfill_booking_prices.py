@@ -0,0 +1,44 @@
+""" a module to store the prices of the bookings made before the prices were saved with them
+run it with python -m utils.backfill_booking_prices, every booking is priced with one bitcoin quote
+"""
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import asyncio
+
+from os import getenv
+
+from middlewares.session_middleware import SessionLocal
+from database.storage_engine import DBStorage
+from models.booking_model import Type
+from services.http_client import http_client
+from services.quote_service import quote_service
+from utils.booking_price import booking_prices
+
+async def fetch_quote():
+    """ a function to get one bitcoin quote and release the http connections """
+
+    try:
+        return await quote_service.get()
+    finally:
+        await http_client.close()
+
+def backfill_booking_prices(batch_size: int):
+    """ a function to price every booking without a stored price
+    Args:
+        batch_size: the most bookings updated in one transaction
+    """
+
+    btc_usd = asyncio.run(fetch_quote())
+    prices = {Type(booking_type): usd for booking_type, usd in booking_prices.items()}
+
+    storage = DBStorage(SessionLocal())
+    try:
+        return storage.backfill_booking_prices(prices, btc_usd, quote_service.quoted_at, batch_size)
+    finally:
+        storage.close()
+
+if __name__ == "__main__":
+    priced = backfill_booking_prices(int(getenv("BACKFILL_BATCH_SIZE", "1000")))
+    print(f"{priced} bookings have been priced")
@@ -0,0 +1,48 @@
+""" a module to make the resized and webp copies of the profile images uploaded before the copies were made
+run it with python -m utils.backfill_profile_variants, every stored profile image without copies is sent to the image pipeline
+"""
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import asyncio
+
+from os import getenv
+
+from middlewares.session_middleware import SessionLocal
+from database.storage_engine import DBStorage
+from models.agent_model import Agent
+from models.celebrity_model import Celeb
+from services.image_pipeline import image_pipeline
+
+async def backfill_profile_variants(batch_size: int):
+    """ a function to queue the copies of every stored profile image without them, one page at a time
+    Args:
+        batch_size: the most profiles read and processed at once
+    Return the amount of images queued and the stats of the pipeline
+    """
+
+    image_pipeline.start(SessionLocal)
+    storage = DBStorage(SessionLocal())
+    submitted = 0
+    try:
+        for model in (Celeb, Agent):
+            after_id = None
+            while True:
+                rows = await asyncio.to_thread(storage.get_profiles_without_variants, model, after_id, batch_size)
+                if not rows:
+                    break
+                for object_id, key in rows:
+                    image_pipeline.submit(model, object_id, key)
+                submitted += len(rows)
+                after_id = rows[-1][0]
+                # the page is finished before the next one so the queue stays at one batch
+                await image_pipeline.drain()
+    finally:
+        await image_pipeline.stop(timeout=None)
+        storage.close()
+    return submitted, image_pipeline.stats()
+
+if __name__ == "__main__":
+    submitted, stats = asyncio.run(backfill_profile_variants(int(getenv("BACKFILL_BATCH_SIZE", "1000"))))
+    print(f"{submitted} profile images have been processed, {stats['failed']} failed")
@@ -1,7 +1,6 @@
 """ a module to define the booking prices """
 
-import requests as re
-import os
+from services.quote_service import quote_service, QuoteUnavailable
 
 booking_prices = {
     "One-Time": 4372,
@@ -9,18 +8,23 @@ booking_prices = {
     "Long-Meet": 10200
 }
 
-def price_converter(booking_type: str):
-    """ a function to convert booking prices to the appopraite bitcoin """
-
-    response = re.get("https://api.coingecko.com/api/v3/simple/price?vs_currencies=usd&ids=bitcoin&names=Bitcoin&symbols=btc", headers={"x-cg-demo-api-key": os.getenv("COIN_GECKO_API")})
-
-    data = response.json()
-
-    amount = int(data.get("bitcoin").get("usd"))
+async def price_converter(booking_type: str):
+    """ a function to convert booking prices to the appopraite bitcoin
+    the btc price is None when the booking type is unknown or no recent bitcoin quote can be fetched
+    Return the usd and btc prices with the time of the bitcoin quote
+    """
 
     price = booking_prices.get(booking_type)
+    if price is None:
+        return {"usd": None, "btc": None, "quoted_at": None}
+
+    try:
+        amount = await quote_service.get()
+    except QuoteUnavailable:
+        return {"usd": price, "btc": None, "quoted_at": None}
 
     return {
         "usd": price,
-        "btc": round(price / amount, 3)
+        "btc": round(price / amount, 8),
+        "quoted_at": quote_service.quoted_at
     }
@@ -1,11 +1,19 @@
 """ a module to check the strength of the password of the user"""
 
 import string
+from os import getenv
 from argon2 import PasswordHasher
 
 from .responses import function_response
 
-ph = PasswordHasher(salt_len=50, hash_len=10)
+# stored hashes made with other parameters are rehashed on the next successful login
+ph = PasswordHasher(
+    time_cost=int(getenv("ARGON2_TIME_COST", "3")),
+    memory_cost=int(getenv("ARGON2_MEMORY_COST", "65536")),
+    parallelism=int(getenv("ARGON2_PARALLELISM", "4")),
+    hash_len=int(getenv("ARGON2_HASH_LEN", "10")),
+    salt_len=int(getenv("ARGON2_SALT_LEN", "50")),
+)
 
 def check_password_strength(password: str):
     """ a function to check the strength of the user password
@@ -2,11 +2,22 @@
 
 from os import getenv
 import jwt
-from datetime import datetime, timedelta
+import secrets
+from datetime import datetime, timedelta, timezone
+from time import time
 
 from models.refresh_token_model import RefreshToken, AgentRefresh
+from models.token_claims import AccessClaims
+from models.user import UserLevel
+from models.agent_model import AgentTier
 from utils.responses import function_response
+from utils.id_string import uuid
+from utils.token_revocation import revocation_list, ACCESS_TOKEN_MINUTES
 from database.storage_engine import DBStorage
+from services.registry import services, LazyService
+
+# the most refresh tokens a user can hold, one for each device logged in
+REFRESH_TOKEN_MAX_SESSIONS = int(getenv("REFRESH_TOKEN_MAX_SESSIONS", "5"))
 
 class Token:
     """The token class for all my token activities"""
@@ -16,26 +27,40 @@ class Token:
         self.__access_secret = getenv("JWT_ACCESS_KEY")
         self.__refresh_secret = getenv("JWT_REFRESH_KEY")
 
-    def create_access_token(self, user_id):
+    def create_access_token(self, principal, role: str = "user"):
         """ a method to create the access token for the user
+        the token carries the role and authorization claims so it can be verified without the database
         Args:
-            user_id (ObjectId): the user id of the user which would be used in the token creation
+            principal: the user, agent or admin the token is created for
+            role: either user, agent or admin
         Return the token as part of the response
         """
 
-        token = jwt.encode({
-            "user_id": str(user_id),
-            "exp": datetime.now() + timedelta(minutes=5)
-        }, self.__access_secret, algorithm="HS256")
+        payload = {
+            "user_id": str(principal.id),
+            "role": role,
+            "jti": uuid(),
+            # whole seconds, the revocation times are compared at the precision the database keeps
+            "iat": int(time()),
+            "exp": datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_MINUTES)
+        }
+        if role == "user":
+            payload["level"] = UserLevel(principal.level).value
+            payload["is_verified"] = bool(principal.is_verified)
+        elif role == "agent":
+            payload["tier"] = AgentTier(principal.tier).value
+
+        token = jwt.encode(payload, self.__access_secret, algorithm="HS256")
 
         return function_response(True, {"access_token": token})
-    
-    def verify_access_token(self, access_token, storage: DBStorage):
-        """
-        a method to verify the access token
+
+    def verify_claims(self, access_token: str, role: str, storage: DBStorage):
+        """ a method to authorize a request from the claims of the access token alone
         Args:
             access_token (str): the access token to verify
-        Return a response containing the user object from the database
+            role: the role the route is meant for
+            storage: the storage used to reload the revoked tokens every few seconds
+        Return the claims in the response, an empty payload when the token expired or was revoked
         """
 
         if not access_token:
@@ -43,22 +68,79 @@ class Token:
 
         try:
             payload = jwt.decode(access_token, self.__access_secret, algorithms="HS256")
-            user_id = payload.get("user_id")
-            get_user_response = storage.get_user_by_id(user_id)
-            return get_user_response
         except jwt.ExpiredSignatureError:
             return function_response(True)
+        except jwt.InvalidTokenError:
+            return function_response(False)
+
+        if payload.get("role") != role:
+            return function_response(False)
+
+        # a revoked token is treated as expired so the client refreshes and gets the current claims
+        if revocation_list.is_revoked(payload, storage):
+            return function_response(True)
+
+        return function_response(True, AccessClaims(**payload))
+
+    def revoke_access_token(self, access_token: str, storage: DBStorage):
+        """ a method to revoke an access token before it expires, used when logging out
+        Args:
+            access_token (str): the access token to revoke
+            storage: the storage to save the revocation with
+        """
+
+        try:
+            payload = jwt.decode(access_token, self.__access_secret, algorithms="HS256", options={"verify_exp": False})
+        except jwt.InvalidTokenError:
+            return function_response(False)
+
+        jti = payload.get("jti")
+        if not jti:
+            return function_response(False)
+
+        storage.revoke_token(datetime.now() + timedelta(minutes=ACCESS_TOKEN_MINUTES), jti=jti)
+        revocation_list.add(jti=jti)
+        return function_response(True)
+
+    def revoke_subject(self, subject_id: str, storage: DBStorage):
+        """ a method to revoke every access token of a principal, used when its level or tier changes
+        Args:
+            subject_id: the id of the user, agent or admin
+            storage: the storage to save the revocation with
+        """
+
+        storage.revoke_token(datetime.now() + timedelta(minutes=ACCESS_TOKEN_MINUTES), subject_id=subject_id)
+        revocation_list.add(subject_id=subject_id)
+        return function_response(True)
+
+    def verify_access_token(self, access_token, storage: DBStorage):
+        """
+        a method to verify the access token
+        Args:
+            access_token (str): the access token to verify
+        Return a response containing the user object from the database
+        """
+
+        claims_response = self.verify_claims(access_token, "user", storage)
+        if not claims_response.payload:
+            return claims_response
+
+        return storage.get_principal("user", claims_response.payload.id)
         
     def create_refresh_token(self, user_id: str, storage: DBStorage):
         """ a method to create the refresh token
+        only the hash of the token is saved and the oldest sessions past the limit are dropped
         Args:
-            email: the email associated with the token
+            user_id: the id of the user the token belongs to
         """
 
+        token = secrets.token_urlsafe(32)
+
         # create the refresh token class before saving it to the database
-        refresh_object = RefreshToken(user_id)
+        refresh_object = RefreshToken(user_id, token)
         refresh_object.save(storage)
-        return function_response(True, {"refresh_token": refresh_object.id})
+        storage.trim_refresh_tokens(user_id, REFRESH_TOKEN_MAX_SESSIONS)
+        return function_response(True, {"refresh_token": token})
     
     def verify_refresh_token(self, refresh_id: str, storage: DBStorage):
         """ a method to verify the refresh token passed to the user
@@ -76,22 +158,15 @@ class Token:
             access_token (str): the access token to be verified
         """
 
-        from models.admin_model import Admin
+        claims_response = self.verify_claims(access_token, "admin", storage)
+        if not claims_response.payload:
+            return claims_response
 
-        if access_token == None:
+        admin_user_response = storage.get_principal("admin", claims_response.payload.id)
+        if not admin_user_response.status:
             return function_response(False)
-        try:
-            payload = jwt.decode(access_token, self.__access_secret, algorithms="HS256")
-            admin_id = payload.get("user_id")
-            admin_user_response = storage.get_admin_from_id(admin_id)
-            if not admin_user_response.status:
-                return function_response(False)
-        
-            AdminUser = admin_user_response.payload
 
-            return function_response(True, AdminUser)
-        except jwt.ExpiredSignatureError:
-            return function_response(True)
+        return admin_user_response
         
     def verify_agent_access_token(self, access_token: str, storage: DBStorage):
         """ a method to verify the agents access token and ensure that the agent is valid
@@ -99,17 +174,11 @@ class Token:
             access_token (str): the access token of the agent
         """
 
-        if not access_token:
-            return function_response(False)
-
-        try:
-            payload = jwt.decode(access_token, self.__access_secret, algorithms="HS256")
-            agent_id = payload.get("user_id")
+        claims_response = self.verify_claims(access_token, "agent", storage)
+        if not claims_response.payload:
+            return claims_response
 
-            agent_response = storage.get_agent_from_id(agent_id)
-            return agent_response
-        except jwt.ExpiredSignatureError:
-            return function_response(True)
+        return storage.get_principal("agent", claims_response.payload.id)
         
     def create_agent_refresh(self, agent_id, storage: DBStorage):
         """ a method to create the refresh token for the agent id"""
@@ -119,10 +188,11 @@ class Token:
         storage.delete_agent_refresh_token(agent_id)
 
         try:
-            refresh_token = AgentRefresh(agent_id)
+            token = secrets.token_urlsafe(32)
+            refresh_token = AgentRefresh(agent_id, token)
             refresh_token.save(storage)
             
-            return function_response(True, refresh_token.to_dict())
+            return function_response(True, {"refresh_token": token})
         except Exception:
             return function_response(False)
         
@@ -137,4 +207,6 @@ class Token:
         return storage.get_agent_id_from_refresh(token)
         
 
-token_manager = Token()
\ No newline at end of file
+# the keys are read on first use so they are taken after the environment is loaded
+services.register("token_manager", Token)
+token_manager = LazyService(services, "token_manager")
\ No newline at end of file
@@ -2,15 +2,27 @@
 
 
 def create_tables():
+    from sqlalchemy import inspect
     from  middlewares.session_middleware import engine
     from models.base_model import Base
     from models.user import User
     from models.refresh_token_model import RefreshToken, AgentRefresh
     from models.otp_codes_model import OtpCode
     from models.celebrity_model import Celeb
-    from models.booking_model import Booking
+    from models.booking_model import Booking, UserBookingStats
     from models.avalilability_model import Availability
     from models.agent_model import Agent
     from models.admin_model import Admin
+    from models.revoked_token_model import RevokedToken
+    from models.media_model import MediaFile
+    from utils.migrate import apply_migrations, stamp_migrations
 
-    Base.metadata.create_all(engine)
\ No newline at end of file
+    if not inspect(engine).has_table("users"):
+        # a fresh database already matches the models so the migrations are only recorded
+        Base.metadata.create_all(engine)
+        stamp_migrations(engine)
+        return
+
+    # an existing database is brought up to the models before any new table is created
+    apply_migrations(engine)
+    Base.metadata.create_all(engine)
@@ -0,0 +1,29 @@
+""" a module to define the sparse fieldset helpers for the listing endpoints """
+
+# columns which are never sent to a client even when they are asked for
+SENSITIVE_FIELDS = {"password", "refresh_token"}
+
+def parse_fields(fields: str | None):
+    """ a function to get the list of fields from the fields query parameter
+    Args:
+        fields: the comma separated field names e.g name,email,level
+    Return None when no field is requested so the full object is returned
+    """
+
+    if not fields:
+        return None
+
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    return names or None
+
+def include_fields(fields: list | None, names):
+    """ a function to add the columns a route needs to the fields requested by the client
+    Args:
+        fields: the parsed field names, None when the full object is requested
+        names: the column names which must be loaded
+    """
+
+    if fields is None:
+        return None
+
+    return fields + [name for name in names if name not in fields]
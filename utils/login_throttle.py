@@ -0,0 +1,225 @@
+""" a module to limit the login attempts by email and by client address before any password work """
+
+from os import getenv
+from time import time
+
+def sliding_count(previous: int, current: int, now: float, window: float):
+    """ a function to estimate the attempts made in the last window from two fixed windows
+    Args:
+        previous: the attempts counted in the previous fixed window
+        current: the attempts counted in the current fixed window
+        now: the current time in seconds
+        window: the length of the window in seconds
+    """
+
+    elapsed = now % window
+    return previous * (window - elapsed) / window + current
+
+class MemoryThrottleBackend:
+    """ a backend keeping the counters of this worker in a dictionary """
+
+    def __init__(self, window: float):
+        """ the class initializer
+        Args:
+            window: the length of the window in seconds
+        """
+
+        self.__window = window
+        # each key holds [window index, previous count, current count]
+        self.__buckets = {}
+        self.__evicted_at = time()
+
+    def __evict(self, now: float):
+        """ a method to drop the keys which have not been hit for two windows
+        Args:
+            now: the current time in seconds
+        """
+
+        if now - self.__evicted_at < self.__window:
+            return
+
+        oldest = int(now // self.__window) - 1
+        for key in [key for key, bucket in self.__buckets.items() if bucket[0] < oldest]:
+            del self.__buckets[key]
+        self.__evicted_at = now
+
+    def __bucket(self, key: str, index: int):
+        """ a method to get the counters of a key moved to the current window
+        Args:
+            key: the email or address of the counters
+            index: the index of the current fixed window
+        """
+
+        bucket = self.__buckets.get(key)
+        if bucket is None or bucket[0] < index - 1:
+            return [index, 0, 0]
+        if bucket[0] == index - 1:
+            return [index, bucket[2], 0]
+        return bucket
+
+    async def acquire(self, limits: dict):
+        """ a method to count an attempt on every key when all of them are under their limits
+        nothing is awaited between the check and the count so no other attempt of this worker runs in between
+        Args:
+            limits: the attempts allowed in a window by key
+        Return False without counting anything when a key is at its limit
+        """
+
+        now = time()
+        self.__evict(now)
+        index = int(now // self.__window)
+
+        buckets = {key: self.__bucket(key, index) for key in limits}
+        for key, limit in limits.items():
+            if sliding_count(buckets[key][1], buckets[key][2], now, self.__window) >= limit:
+                return False
+
+        for key, bucket in buckets.items():
+            bucket[2] += 1
+            self.__buckets[key] = bucket
+        return True
+
+    async def reset(self, key: str):
+        """ a method to forget the attempts of a key
+        Args:
+            key: the email or address to forget
+        """
+
+        self.__buckets.pop(key, None)
+
+class RedisThrottleBackend:
+    """ a backend keeping the counters in a redis compatible store shared by every worker """
+
+    def __init__(self, client, window: float, prefix: str = "login_throttle"):
+        """ the class initializer
+        Args:
+            client: an async redis compatible client
+            window: the length of the window in seconds
+            prefix: the prefix of the keys in the store
+        """
+
+        self.__client = client
+        self.__window = window
+        self.__prefix = prefix
+
+    def __key(self, key: str, index: int):
+        """ a method to get the store key of a fixed window """
+
+        return f"{self.__prefix}:{key}:{index}"
+
+    async def acquire(self, limits: dict):
+        """ a method to count an attempt on every key when all of them are under their limits
+        the counters are watched while they are checked and counted in one MULTI, so when another
+        worker counts an attempt in between the transaction is dropped and the check runs again
+        Args:
+            limits: the attempts allowed in a window by key
+        Return False without counting anything when a key is at its limit
+        """
+
+        from redis.exceptions import WatchError
+
+        async with self.__client.pipeline(transaction=True) as pipe:
+            while True:
+                now = time()
+                index = int(now // self.__window)
+                keys = [(self.__key(key, index), self.__key(key, index - 1)) for key in limits]
+                try:
+                    await pipe.watch(*[store_key for pair in keys for store_key in pair])
+                    values = await pipe.mget([store_key for pair in keys for store_key in pair])
+                    for position, limit in enumerate(limits.values()):
+                        current, previous = values[position * 2], values[position * 2 + 1]
+                        if sliding_count(int(previous or 0), int(current or 0), now, self.__window) >= limit:
+                            await pipe.unwatch()
+                            return False
+
+                    pipe.multi()
+                    for current_key, _ in keys:
+                        pipe.incr(current_key)
+                        pipe.expire(current_key, int(self.__window * 2))
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    async def reset(self, key: str):
+        """ a method to forget the attempts of a key
+        Args:
+            key: the email or address to forget
+        """
+
+        index = int(time() // self.__window)
+        await self.__client.delete(self.__key(key, index), self.__key(key, index - 1))
+
+class LoginThrottle:
+    """ a class which decides if a login attempt can go on to the password check """
+
+    def __init__(self, backend, email_limit: int, ip_limit: int, account_limit: int):
+        """ the class initializer
+        Args:
+            backend: the backend holding the counters
+            email_limit: the attempts allowed on one account from one client address in a window
+            ip_limit: the attempts allowed from one client address in a window
+            account_limit: the attempts allowed on one account from every address together in a window
+        """
+
+        self.__backend = backend
+        self.__email_limit = email_limit
+        self.__ip_limit = ip_limit
+        self.__account_limit = account_limit
+
+    def __limits(self, role: str, email: str, ip: str | None):
+        """ a method to get the keys of an attempt with their limits
+        the account is counted per client address so attempts from elsewhere cannot lock its owner out
+        quickly, and across every address with a higher limit so guesses spread over many addresses stop too
+        Args:
+            role: either user, agent or admin
+            email: the email the attempt is made on
+            ip: the address of the client
+        """
+
+        limits = {
+            f"email:{role}:{email.lower()}:{ip}": self.__email_limit,
+            f"account:{role}:{email.lower()}": self.__account_limit,
+        }
+        if ip:
+            limits[f"ip:{ip}"] = self.__ip_limit
+        return limits
+
+    async def allow(self, role: str, email: str, ip: str | None):
+        """ a method to count a login attempt and check it is under the limits
+        a rejected attempt is not counted so the counters fall back under the limits as the window slides
+        Args:
+            role: either user, agent or admin
+            email: the email the attempt is made on
+            ip: the address of the client
+        """
+
+        return await self.__backend.acquire(self.__limits(role, email, ip))
+
+    async def succeeded(self, role: str, email: str, ip: str | None):
+        """ a method to clear the attempts on an account from this client address after a successful login
+        the attempts from every address are kept so a login of the owner does not reset the guesses made elsewhere
+        Args:
+            role: either user, agent or admin
+            email: the email which logged in
+            ip: the address of the client
+        """
+
+        await self.__backend.reset(f"email:{role}:{email.lower()}:{ip}")
+
+LOGIN_THROTTLE_WINDOW = float(getenv("LOGIN_THROTTLE_WINDOW", "300"))
+LOGIN_THROTTLE_REDIS_URL = getenv("LOGIN_THROTTLE_REDIS_URL")
+
+if LOGIN_THROTTLE_REDIS_URL:
+    from redis.asyncio import Redis
+
+    throttle_backend = RedisThrottleBackend(Redis.from_url(LOGIN_THROTTLE_REDIS_URL), LOGIN_THROTTLE_WINDOW)
+else:
+    throttle_backend = MemoryThrottleBackend(LOGIN_THROTTLE_WINDOW)
+
+login_throttle = LoginThrottle(
+    throttle_backend,
+    int(getenv("LOGIN_THROTTLE_EMAIL_LIMIT", "5")),
+    int(getenv("LOGIN_THROTTLE_IP_LIMIT", "30")),
+    int(getenv("LOGIN_THROTTLE_ACCOUNT_LIMIT", "50")),
+)
@@ -0,0 +1,96 @@
+""" a module to apply the numbered sql migrations in migrations/ to an existing database
+
+a fresh database is created from the models and every migration is recorded as applied,
+a database created before a migration has it run once and recorded in schema_migrations
+
+    python -m utils.migrate
+"""
+
+import os
+
+from datetime import datetime
+from sqlalchemy import MetaData, Table, Column, String, DateTime, select, insert, text
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", String(128), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+def migration_files(directory: str = MIGRATIONS_DIR):
+    """ a function to get the names of the migrations in the order they are applied
+    Args:
+        directory: the folder of the .sql files, named 001_name.sql, 002_name.sql and so on
+    """
+
+    return sorted(name for name in os.listdir(directory) if name.endswith(".sql"))
+
+def statements(sql: str):
+    """ a function to split a migration into its statements
+    Args:
+        sql: the content of the migration file, each statement ends with a semicolon at the end of a line
+    """
+
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    parts = (part.strip().rstrip(";").strip() for part in "\n".join(lines).split(";\n"))
+    return [part for part in parts if part]
+
+def applied_migrations(connection):
+    """ a function to get the versions already recorded in schema_migrations
+    Args:
+        connection: the connection to the database
+    """
+
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.scalars(select(schema_migrations.c.version)).all())
+
+def stamp_migrations(engine, directory: str = MIGRATIONS_DIR):
+    """ a function to record every migration as applied, used after the tables are created from the models
+    Args:
+        engine: the engine of the database
+        directory: the folder of the migrations
+    """
+
+    with engine.begin() as connection:
+        applied = applied_migrations(connection)
+        for name in migration_files(directory):
+            if name not in applied:
+                connection.execute(insert(schema_migrations).values(version=name, applied_at=datetime.now()))
+
+def apply_migrations(engine, directory: str = MIGRATIONS_DIR):
+    """ a function to run the migrations not applied yet, in order
+    each migration is recorded once all of its statements ran so a failed one is run again next time,
+    mysql commits every ALTER on its own so the statements which did run have to be undone by hand first
+    Args:
+        engine: the engine of the database
+        directory: the folder of the migrations
+    Return the names of the migrations applied
+    """
+
+    with engine.begin() as connection:
+        applied = applied_migrations(connection)
+
+    ran = []
+    for name in migration_files(directory):
+        if name in applied:
+            continue
+        with open(os.path.join(directory, name)) as migration:
+            sql = migration.read()
+        with engine.begin() as connection:
+            for statement in statements(sql):
+                connection.execute(text(statement))
+            connection.execute(insert(schema_migrations).values(version=name, applied_at=datetime.now()))
+        ran.append(name)
+    return ran
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from middlewares.session_middleware import engine
+
+    for name in apply_migrations(engine):
+        print(f"applied {name}")
@@ -0,0 +1,68 @@
+""" a module to define the page and cursor helpers used by the listing endpoints """
+
+import base64
+import json
+
+from datetime import datetime
+
+def page_offset(page: int, limit: int):
+    """ a function to get the amount of rows to skip for a page starting from page 1
+    Args:
+        page: the current page
+        limit: the amount of data on each page
+    """
+
+    return (page - 1 if page > 1 else 0) * limit
+
+def encode_cursor(created_at, row_id: str):
+    """ a function to create an opaque cursor pointing after the given row
+    Args:
+        created_at: the created_at value of the last row on the page
+        row_id: the id of the last row on the page
+    """
+
+    raw = json.dumps([str(created_at), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str | None):
+    """ a function to get the created_at and id position stored in a cursor
+    Args:
+        cursor: the cursor sent by the client
+    Return None when the cursor is empty or not valid, the routes reject invalid ones with valid_cursor
+    """
+
+    if not cursor:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(row_id)
+    except (ValueError, TypeError):
+        return None
+
+def valid_cursor(cursor: str | None):
+    """ a function to check a cursor sent by a client before the listing is run
+    Args:
+        cursor: the cursor sent by the client
+    Return False when a non empty cursor was malformed or tampered with
+    """
+
+    return not cursor or decode_cursor(cursor) is not None
+
+def page_data(items: list, limit: int, cursor: str | None):
+    """ a function to build the response data of a listing endpoint
+    page callers keep getting the plain list while cursor callers get the next cursor with it
+    Args:
+        items: the dictionaries of the rows on this page
+        limit: the amount of data requested
+        cursor: the cursor sent by the client, None when the page parameter is used
+    """
+
+    if cursor is None:
+        return items
+
+    next_cursor = None
+    if items and len(items) == limit:
+        next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["id"])
+    return {"items": items, "next_cursor": next_cursor}
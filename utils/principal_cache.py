@@ -0,0 +1,93 @@
+""" a module to cache the users, agents and admins identified by the access tokens """
+
+import threading
+
+from collections import OrderedDict
+from os import getenv
+from time import monotonic
+
+class PrincipalCache:
+    """ an in process TTL and LRU cache of principal rows keyed by (role, id)
+
+    A save or delete through DBStorage only invalidates the cache of the process which made it.
+    The other workers keep serving their copy of the row, e.g the old password hash or level,
+    until it is older than the ttl, so PRINCIPAL_CACHE_TTL bounds how long a change takes to reach them
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 30):
+        """ the class initializer
+        Args:
+            max_size: the amount of principals kept before the least recently used is evicted
+            ttl: the seconds a cached row is trusted for
+        """
+
+        self.__max_size = max_size
+        self.__ttl = ttl
+        self.__items = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__invalidations = 0
+
+    def get(self, key: tuple):
+        """ a method to get the cached column values of a principal
+        Args:
+            key: the (role, id) of the principal
+        """
+
+        with self.__lock:
+            item = self.__items.get(key)
+            if item is None or monotonic() - item[0] > self.__ttl:
+                if item is not None:
+                    del self.__items[key]
+                    self.__evictions += 1
+                self.__misses += 1
+                return None
+            self.__items.move_to_end(key)
+            self.__hits += 1
+            return item[1]
+
+    def set(self, key: tuple, values: dict):
+        """ a method to cache the column values of a principal
+        Args:
+            key: the (role, id) of the principal
+            values: the column values of the row
+        """
+
+        with self.__lock:
+            self.__items[key] = (monotonic(), values)
+            self.__items.move_to_end(key)
+            while len(self.__items) > self.__max_size:
+                self.__items.popitem(last=False)
+                self.__evictions += 1
+
+    def invalidate(self, key: tuple):
+        """ a method to drop a principal after its row is saved or deleted
+        Args:
+            key: the (role, id) of the principal
+        """
+
+        with self.__lock:
+            if self.__items.pop(key, None) is not None:
+                self.__invalidations += 1
+
+    def stats(self):
+        """ a method to get the hit rate and eviction metrics of the cache """
+
+        with self.__lock:
+            lookups = self.__hits + self.__misses
+            return {
+                "size": len(self.__items),
+                "max_size": self.__max_size,
+                "hits": self.__hits,
+                "misses": self.__misses,
+                "hit_rate": round(self.__hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.__evictions,
+                "invalidations": self.__invalidations,
+            }
+
+principal_cache = PrincipalCache(
+    int(getenv("PRINCIPAL_CACHE_SIZE", "1024")),
+    float(getenv("PRINCIPAL_CACHE_TTL", "30")),
+)
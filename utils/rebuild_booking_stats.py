@@ -0,0 +1,22 @@
+""" a module to rebuild the per user booking counters from the bookings table
+run it with python -m utils.rebuild_booking_stats after enabling BOOKING_STATS_COUNTERS
+"""
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from middlewares.session_middleware import SessionLocal
+from database.storage_engine import DBStorage
+
+def rebuild_booking_stats():
+    """ a function to reconcile the user_booking_stats table with the bookings """
+
+    storage = DBStorage(SessionLocal())
+    try:
+        storage.rebuild_booking_stats()
+    finally:
+        storage.close()
+
+if __name__ == "__main__":
+    rebuild_booking_stats()
+    print("The booking counters have been rebuilt")
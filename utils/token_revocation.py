@@ -0,0 +1,82 @@
+""" a module to keep a compact in process copy of the revoked access tokens """
+
+import threading
+
+from datetime import datetime
+from os import getenv
+from time import monotonic
+
+from database.storage_engine import DBStorage
+
+# the access tokens expire after this many minutes so older revocations are not needed
+ACCESS_TOKEN_MINUTES = 5
+
+# mysql keeps DATETIME to the second, so a token issued within this many seconds after a
+# revocation is revoked as well rather than letting one issued just before it through
+REVOCATION_SLACK_SECONDS = 1
+
+class RevocationList:
+    """ a class which holds the revoked jtis and subjects refreshed from the database every few seconds """
+
+    def __init__(self, refresh_interval: float = 5):
+        """ the class initializer
+        Args:
+            refresh_interval: the seconds between two reloads of the revocations
+        """
+
+        self.__refresh_interval = refresh_interval
+        self.__jtis = set()
+        self.__subjects = {}
+        self.__refreshed_at = None
+        self.__lock = threading.Lock()
+
+    def __refresh(self, storage: DBStorage):
+        """ a method to reload the revocations of the last token lifetime from the database
+        Args:
+            storage: the storage of the current request
+        """
+
+        revocations = storage.get_revocations(datetime.now())
+
+        jtis, subjects = set(), {}
+        for jti, subject_id, revoked_at in revocations:
+            if jti:
+                jtis.add(jti)
+            if subject_id:
+                subjects[subject_id] = max(subjects.get(subject_id, 0), int(revoked_at.timestamp()))
+
+        with self.__lock:
+            self.__jtis = jtis
+            self.__subjects = subjects
+            self.__refreshed_at = monotonic()
+
+    def add(self, jti: str | None = None, subject_id: str | None = None):
+        """ a method to apply a revocation made by this worker without waiting for the next reload
+        Args:
+            jti: the id of the revoked token
+            subject_id: the id of the principal whose tokens are revoked
+        """
+
+        with self.__lock:
+            if jti:
+                self.__jtis.add(jti)
+            if subject_id:
+                self.__subjects[subject_id] = int(datetime.now().timestamp())
+
+    def is_revoked(self, payload: dict, storage: DBStorage):
+        """ a method to check the claims of an access token against the revocations
+        Args:
+            payload: the decoded access token
+            storage: the storage used when the revocations need to be reloaded
+        """
+
+        if self.__refreshed_at is None or monotonic() - self.__refreshed_at > self.__refresh_interval:
+            self.__refresh(storage)
+
+        with self.__lock:
+            if payload.get("jti") in self.__jtis:
+                return True
+            revoked_at = self.__subjects.get(payload.get("user_id"))
+        return revoked_at is not None and int(payload.get("iat", 0)) <= revoked_at + REVOCATION_SLACK_SECONDS
+
+revocation_list = RevocationList(float(getenv("TOKEN_REVOCATION_REFRESH", "5")))